@@ -0,0 +1,84 @@
+"""Measure internal-document prompt size with and without relevance selection.
+
+Builds a synthetic user with --documents documents spread over several domains,
+then compares the internal_documents block a prompt used to receive (every
+document) with the one selected for the topic and for each section. It reports
+estimated tokens, how many selected documents come from the topic's domain,
+and the time to build the index and to run one selection.
+
+Usage:
+    python -m benchmarks.document_selection_bench --documents 50 200 800
+"""
+import argparse
+import os
+import random
+import statistics
+import time
+
+os.environ.setdefault("GEMINI_API_KEY_BETA", "benchmark")
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark")
+
+from report_writer.context import DocumentIndex, count_tokens
+from report_writer.utils import format_documents
+from services.models import Document
+
+DOMAINS = {
+    "semiconductors": ["wafer", "foundry", "lithography", "chip", "node", "fab", "yield"],
+    "retail": ["store", "inventory", "shopper", "apparel", "footfall", "merchandise", "ecommerce"],
+    "energy": ["oil", "refinery", "pipeline", "solar", "grid", "barrel", "upstream"],
+    "banking": ["deposit", "loan", "credit", "interest", "capital", "branch", "mortgage"],
+    "pharma": ["drug", "clinical", "trial", "molecule", "fda", "therapy", "patent"],
+}
+COMMON = ["revenue", "margin", "growth", "quarter", "outlook", "market", "company", "annual", "report", "guidance"]
+
+
+def synthetic_document(index: int, domain: str, rng: random.Random) -> Document:
+    def text(words: int) -> str:
+        return " ".join(rng.choice(DOMAINS[domain] + COMMON) for _ in range(words))
+
+    return Document(
+        user_id="benchmark",
+        name=f"{domain}-{index}",
+        summary=text(120),
+        highlights=[text(12) for _ in range(5)],
+        document_type="report",
+        domain=f"{domain} {text(20)}",
+        queries=[text(8) for _ in range(6)],
+        entity_types=["company"],
+        description=text(60),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, nargs="+", default=[50, 200, 800])
+    parser.add_argument("--token-budget", type=int, default=4000)
+    parser.add_argument("--top-k", type=int, default=10)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    topic = "Outlook for semiconductor foundry capacity and chip yield"
+    sections = ["Foundry capacity expansion", "Lithography node roadmap", "Wafer yield and margin"]
+    print(f"{'documents':>10}{'all tokens':>12}{'topic tokens':>14}{'section tokens':>16}{'on-domain':>11}{'build ms':>10}{'select ms':>11}")
+    for count in args.documents:
+        documents = [synthetic_document(index, list(DOMAINS)[index % len(DOMAINS)], rng) for index in range(count)]
+        started = time.perf_counter()
+        index = DocumentIndex(documents)
+        build_ms = (time.perf_counter() - started) * 1000
+
+        def select(query):
+            return index.select(query, args.token_budget, args.top_k, lambda document: format_documents([document]))
+
+        started = time.perf_counter()
+        selected = select(topic)
+        select_ms = (time.perf_counter() - started) * 1000
+        section_tokens = statistics.mean(count_tokens(format_documents(select(f"{topic} {section}"))) for section in sections)
+        on_domain = sum(document.name.startswith("semiconductors") for document in selected)
+        print(
+            f"{count:>10}{count_tokens(format_documents(documents)):>12}{count_tokens(format_documents(selected)):>14}"
+            f"{section_tokens:>16.0f}{f'{on_domain}/{len(selected)}':>11}{build_ms:>10.1f}{select_ms:>11.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+"""Stand-in models and search backends for offline benchmarks.
+
+The fakes mirror the call surface the report_writer nodes use: invoke/ainvoke,
+with_structured_output and astream on models, and google_search_async and
+retrieve_subqueries for search. Each call sleeps for a latency drawn from a
+configurable distribution and returns a schema-valid payload.
+"""
+import asyncio
+import random
+import time
+from dataclasses import dataclass, field
+from langchain_core.messages import AIMessage, AIMessageChunk
+from report_writer.state import (
+    Feedback,
+    HybridQueries,
+    Queries,
+    SearchQuery,
+    Section,
+    Sections,
+    SectionSources,
+    SectionWriter,
+    Source,
+    SourceLabel,
+)
+
+FILLER = (
+    "Revenue grew steadily while operating margins expanded on the back of services mix, "
+    "cost discipline and pricing power across the core product lines. "
+)
+
+
+@dataclass
+class Latency:
+    """Latency distribution in seconds: ``fixed``, ``uniform`` (median +/- spread) or ``lognormal``."""
+
+    median: float = 0.5
+    kind: str = "lognormal"
+    spread: float = 0.35
+    rng: random.Random = field(default_factory=lambda: random.Random(7))
+
+    @classmethod
+    def parse(cls, spec: str, seed: int = 7) -> "Latency":
+        """Parse ``kind:median[:spread]``, e.g. ``lognormal:0.8:0.4`` or ``fixed:0.2``."""
+        parts = spec.split(":")
+        kind = parts[0]
+        median = float(parts[1]) if len(parts) > 1 else 0.5
+        spread = float(parts[2]) if len(parts) > 2 else 0.35
+        return cls(median=median, kind=kind, spread=spread, rng=random.Random(seed))
+
+    def sample(self) -> float:
+        if self.kind == "fixed":
+            return self.median
+        if self.kind == "uniform":
+            return max(0.0, self.rng.uniform(self.median - self.spread, self.median + self.spread))
+        return self.rng.lognormvariate(0, self.spread) * self.median
+
+
+class FakeChatModel:
+    """Chat model stand-in that fabricates schema-valid answers after a simulated delay."""
+
+    def __init__(self, name: str, latency: Latency, section_count: int = 3, fail_rate: float = 0.0, content_words: int = 250):
+        self.model = name
+        self.latency = latency
+        self.section_count = section_count
+        self.fail_rate = fail_rate
+        self.content_words = content_words
+        self.calls = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self._rng = random.Random(11)
+
+    def with_structured_output(self, schema, **kwargs):
+        return FakeStructuredModel(self, schema)
+
+    def _content(self) -> str:
+        words = FILLER.split()
+        return " ".join(words[i % len(words)] for i in range(self.content_words))
+
+    def count(self, messages, output) -> None:
+        self.calls += 1
+        self.input_tokens += sum(len(str(getattr(message, "content", message))) for message in messages) // 4
+        self.output_tokens += len(output) // 4
+
+    def _message(self) -> AIMessage:
+        content = self._content()
+        return AIMessage(
+            content=content,
+            usage_metadata={"input_tokens": 2000, "output_tokens": len(content) // 4, "total_tokens": 2000 + len(content) // 4},
+        )
+
+    def invoke(self, messages, *args, **kwargs):
+        time.sleep(self.latency.sample())
+        message = self._message()
+        self.count(messages, message.content)
+        return message
+
+    async def ainvoke(self, messages, *args, **kwargs):
+        await asyncio.sleep(self.latency.sample())
+        message = self._message()
+        self.count(messages, message.content)
+        return message
+
+    async def astream(self, messages, *args, **kwargs):
+        self.calls += 1
+        delay = self.latency.sample()
+        words = self._content().split(" ")
+        for index in range(0, len(words), 20):
+            await asyncio.sleep(delay / max(1, len(words) // 20))
+            yield AIMessageChunk(content=" ".join(words[index:index + 20]) + " ")
+
+    def build(self, schema):
+        tag = self._rng.randrange(10 ** 6)
+        if schema is Sections:
+            sections = [Section(name="Introduction", description="Overview of the topic", research=False, internal_search=False, content="", sources=[])]
+            sections += [
+                Section(name=f"Section {i + 1}", description=f"Analysis of sub-topic {i + 1}", research=True, internal_search=True, content="", sources=[])
+                for i in range(self.section_count)
+            ]
+            sections.append(Section(name="Conclusion", description="Summary of the report", research=False, internal_search=False, content="", sources=[]))
+            return Sections(description="Benchmark report plan", sections=sections)
+        if schema is Queries:
+            return Queries(queries=[SearchQuery(search_query=f"benchmark query {tag} {i}") for i in range(3)])
+        if schema is HybridQueries:
+            return HybridQueries(
+                internal_search_queries=[SearchQuery(search_query=f"internal query {tag} {i}") for i in range(3)],
+                web_search_queries=[SearchQuery(search_query=f"web query {tag} {i}") for i in range(3)],
+            )
+        if schema is Feedback:
+            if self._rng.random() < self.fail_rate:
+                return Feedback(grade="fail", follow_up_queries=[SearchQuery(search_query=f"follow up {tag}")])
+            return Feedback(grade="pass", follow_up_queries=[])
+        if schema is SectionWriter:
+            return SectionWriter(
+                content=self._content(),
+                sources=[Source(index="1", confidence_scores=[0.9], segment_text="Revenue grew", sources=[SourceLabel(title="Benchmark source")])],
+            )
+        if schema is SectionSources:
+            return SectionSources(
+                sources=[Source(index="1", confidence_scores=[0.9], segment_text="Revenue grew", sources=[SourceLabel(title="Benchmark source")])],
+            )
+        raise ValueError(f"FakeChatModel cannot build {schema}")
+
+
+class FakeStructuredModel:
+    def __init__(self, model: FakeChatModel, schema):
+        self.model = model
+        self.schema = schema
+
+    def invoke(self, messages, *args, **kwargs):
+        time.sleep(self.model.latency.sample())
+        result = self.model.build(self.schema)
+        self.model.count(messages, result.model_dump_json())
+        return result
+
+    async def ainvoke(self, messages, *args, **kwargs):
+        await asyncio.sleep(self.model.latency.sample())
+        result = self.model.build(self.schema)
+        self.model.count(messages, result.model_dump_json())
+        return result
+
+    async def astream(self, messages, *args, **kwargs):
+        yield await self.ainvoke(messages, *args, **kwargs)
+
+
+class FakeSearch:
+    """google_search_async and retrieve_subqueries stand-ins sharing one latency distribution."""
+
+    def __init__(self, latency: Latency):
+        self.latency = latency
+        self.web_calls = 0
+        self.internal_calls = 0
+
+    async def google_search_async(self, query, with_sources=True, prompt=None):
+        self.web_calls += 1
+        await asyncio.sleep(self.latency.sample())
+        text = f"{FILLER * 6}\n\n##Sources##\nSegment Text: {FILLER.strip()} - Confidence: [0.9]\nSources: [Benchmark source]"
+        if not with_sources:
+            return text
+        return text, [{"title": "Benchmark source", "uri": "https://example.com/benchmark"}]
+
+    async def retrieve_subqueries(self, queries, user_id, project_id):
+        self.internal_calls += 1
+        await asyncio.sleep(self.latency.sample())
+        for query in queries:
+            yield {"type": "response", "query": query, "response": FILLER * 4}
+
+
+MODEL_ATTRIBUTES = ("planner_query_writer", "planner_llm", "report_writer_llm", "gemini_flash", "gemini_pro")
+
+
+def install_fakes(llm_latency: Latency, search_latency: Latency, section_count: int, fail_rate: float = 0.0) -> dict:
+    """Swap every model and search backend the report graph uses for fakes.
+
+    Returns the installed fakes so callers can read their call counters.
+    """
+    import report_writer
+    import report_writer.graph  # noqa: F401  (imports the node modules in a safe order)
+    import report_writer.utils as utils
+    from report_writer.dedup import HashingEmbedder, set_query_embedder
+    from report_writer.nodes.compiler import report_compiler
+    from report_writer.nodes.planner import report_planner
+    from report_writer.nodes.writer import section_writer
+
+    models = {name: FakeChatModel(name, llm_latency, section_count, fail_rate) for name in MODEL_ATTRIBUTES}
+    for module in (report_writer, report_planner, section_writer, report_compiler):
+        for name, model in models.items():
+            if hasattr(module, name):
+                setattr(module, name, model)
+
+    search = FakeSearch(search_latency)
+    utils.google_search_async = search.google_search_async
+    utils.retrieve_subqueries = search.retrieve_subqueries
+    set_query_embedder(HashingEmbedder())
+    return {"models": models, "search": search}
@@ -0,0 +1,108 @@
+"""Measure per-request graph setup: a fresh checkpointer and compile versus the shared ones.
+
+For each graph a request can touch (report, section, executor, maestro,
+deepdive) the benchmark times what a request pays before it can run the graph:
+- per-request: what every call used to do, which is to open
+  AsyncMongoDBSaver.from_conn_string (a new Motor client plus index checks) and
+  compile the StateGraph or rebuild the react agent.
+- shared: get_compiled_graph with the process-wide checkpointer, after a warm-up
+  call that represents the compile done by the first request.
+
+With MONGODB_URI set, the per-request mode opens real savers against it. Use
+--no-mongo to swap in a MemorySaver, which times only compilation.
+
+Usage:
+    python -m benchmarks.graph_setup_bench --requests 20
+    python -m benchmarks.graph_setup_bench --requests 20 --no-mongo
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+from contextlib import asynccontextmanager
+
+
+def graph_builders() -> dict:
+    from report_writer.graph import builder, section_builder
+    from report_writer.agent import build_deepdive_agent
+    from cortex.executor import build_executor
+    from cortex.interface import build_maestro
+
+    return {
+        "report": lambda saver: builder.compile(checkpointer=saver),
+        "section": lambda saver: section_builder.compile(checkpointer=saver),
+        "executor": build_executor,
+        "maestro": build_maestro,
+        "deepdive": build_deepdive_agent,
+    }
+
+
+@asynccontextmanager
+async def fresh_saver(use_mongo: bool):
+    if use_mongo:
+        from langgraph.checkpoint.mongodb import AsyncMongoDBSaver
+        async with AsyncMongoDBSaver.from_conn_string(os.getenv("MONGODB_URI")) as saver:
+            yield saver
+    else:
+        from langgraph.checkpoint.memory import MemorySaver
+        yield MemorySaver()
+
+
+async def measure(args) -> dict:
+    from services.checkpoint import aclose_checkpointer, get_compiled_graph
+    from services.mongo import aclose_mongo_client
+
+    builders = graph_builders()
+    results = {}
+    shared_saver = None
+    if args.no_mongo:
+        from langgraph.checkpoint.memory import MemorySaver
+        shared_saver = MemorySaver()
+    for name, build in builders.items():
+        per_request = []
+        for _ in range(args.requests):
+            started = time.perf_counter()
+            async with fresh_saver(not args.no_mongo) as saver:
+                build(saver)
+            per_request.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        first = get_compiled_graph(name, build) if shared_saver is None else build(shared_saver)
+        first_s = time.perf_counter() - started
+        shared = []
+        for _ in range(args.requests):
+            started = time.perf_counter()
+            graph = get_compiled_graph(name, build) if shared_saver is None else first
+            shared.append(time.perf_counter() - started)
+        results[name] = {
+            "per_request_ms": statistics.median(per_request) * 1000,
+            "first_ms": first_s * 1000,
+            "shared_ms": statistics.median(shared) * 1000,
+        }
+    if shared_saver is None:
+        await aclose_checkpointer()
+        await aclose_mongo_client()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--no-mongo", action="store_true", help="Time compilation only, with an in-memory checkpointer")
+    args = parser.parse_args()
+    if not args.no_mongo and not os.getenv("MONGODB_URI"):
+        parser.error("MONGODB_URI must point at a reachable MongoDB, or pass --no-mongo")
+    os.environ.setdefault("GEMINI_API_KEY_BETA", "benchmark")
+    os.environ.setdefault("GOOGLE_API_KEY", "benchmark")
+
+    results = asyncio.run(measure(args))
+    print(f"{'graph':<10}{'per-request ms':>16}{'first shared ms':>17}{'shared ms':>11}")
+    for name, result in results.items():
+        print(f"{name:<10}{result['per_request_ms']:>16.2f}{result['first_ms']:>17.2f}{result['shared_ms']:>11.4f}")
+    print(f"{'total':<10}{sum(r['per_request_ms'] for r in results.values()):>16.2f}"
+          f"{sum(r['first_ms'] for r in results.values()):>17.2f}{sum(r['shared_ms'] for r in results.values()):>11.4f}")
+
+
+if __name__ == "__main__":
+    main()
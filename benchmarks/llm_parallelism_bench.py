@@ -0,0 +1,47 @@
+"""Show that sections research and write in parallel under the per-model LLM limit.
+
+Runs the end-to-end report benchmark once per LLM_CONCURRENCY value. With a limit
+of 1, every model call is serialized and the research phase grows linearly with
+the section count. With the default limit, write_section and perform_research
+runs overlap across sections.
+
+Usage:
+    python -m benchmarks.llm_parallelism_bench --sections 10 --limits 1 8
+"""
+import argparse
+import asyncio
+import logging
+import os
+from benchmarks.report_writer_bench import run_report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sections", type=int, default=10)
+    parser.add_argument("--limits", type=int, nargs="+", default=[1, 8])
+    parser.add_argument("--llm-latency", default="fixed:0.3")
+    parser.add_argument("--search-latency", default="fixed:0.2")
+    args = parser.parse_args()
+    args.fail_rate = 0.0
+    args.max_search_iterations = 1
+    args.stream = False
+
+    from logger import cortex_logger, runner_logger
+    runner_logger.setLevel(logging.WARNING)
+    cortex_logger.setLevel(logging.WARNING)
+
+    print(f"{'LLM_CONCURRENCY':>16}{'research+compile s':>20}{'write_section in flight':>25}{'perform_research in flight':>28}")
+    for limit in args.limits:
+        # Schedulers are created per event loop, so each asyncio.run picks up the new limit
+        os.environ["LLM_CONCURRENCY"] = str(limit)
+        summary = asyncio.run(run_report(args.sections, args))
+        nodes = summary["nodes"]
+        print(
+            f"{limit:>16}{summary['critical_path_s']:>20.2f}"
+            f"{nodes['write_section']['peak_in_flight']:>25}"
+            f"{nodes['perform_research']['peak_in_flight']:>28}"
+        )
+
+
+if __name__ == "__main__":
+    main()
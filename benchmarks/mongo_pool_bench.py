@@ -0,0 +1,134 @@
+"""Compare a MongoClient per service instance with the shared process-wide pool.
+
+Each simulated request makes the reads continue_research makes: it loads a
+deep_research document, lists the user's documents and reads the distinct report
+types. In ``per-instance`` mode every request builds its own MongoClient, as each
+DeepResearch(), DocumentService() and WorkflowService() used to. In ``shared``
+mode every request goes through services.mongo.get_database(). Requests run on a
+thread pool at the given concurrency. The benchmark reports latency percentiles
+and the open-connection count from a pymongo pool listener.
+
+Needs a reachable MongoDB at MONGODB_URI. Only reads are issued, against
+--database (default cortex_bench).
+
+Usage:
+    python -m benchmarks.mongo_pool_bench --requests 400 --concurrency 32
+"""
+import argparse
+import os
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from bson.objectid import ObjectId
+from pymongo import MongoClient, monitoring
+
+
+class ConnectionCounter(monitoring.ConnectionPoolListener):
+    """Counts connections opened and closed by every client created after registration."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.open = 0
+        self.peak = 0
+        self.created = 0
+
+    def reset(self):
+        with self.lock:
+            self.peak = self.open
+            self.created = 0
+
+    def connection_created(self, event):
+        with self.lock:
+            self.open += 1
+            self.created += 1
+            self.peak = max(self.peak, self.open)
+
+    def connection_closed(self, event):
+        with self.lock:
+            self.open -= 1
+
+    def pool_created(self, event): pass
+    def pool_ready(self, event): pass
+    def pool_cleared(self, event): pass
+    def pool_closed(self, event): pass
+    def connection_ready(self, event): pass
+    def connection_check_out_started(self, event): pass
+    def connection_check_out_failed(self, event): pass
+    def connection_checked_out(self, event): pass
+    def connection_checked_in(self, event): pass
+
+
+def simulated_request(db, user_id: str):
+    db["deep_research"].find_one({"_id": ObjectId()})
+    list(db["documents"].find({"user_id": user_id}).limit(10))
+    db["deep_research"].distinct("type", {"user_id": user_id})
+
+
+def run_mode(mode: str, args, counter: ConnectionCounter) -> dict:
+    from services.mongo import close_mongo_client, get_mongo_client
+
+    uri = os.getenv("MONGODB_URI")
+    clients = []
+    clients_lock = threading.Lock()
+    if mode == "shared":
+        client = get_mongo_client()
+        client.admin.command("ping")
+
+    def one(index):
+        started = time.perf_counter()
+        if mode == "shared":
+            db = get_mongo_client()[args.database]
+        else:
+            # Mirrors the old MongoDBConfig().connect(): a new client that is never closed
+            per_request = MongoClient(uri)
+            with clients_lock:
+                clients.append(per_request)
+            db = per_request[args.database]
+        simulated_request(db, f"bench-user-{index % 20}")
+        return time.perf_counter() - started
+
+    counter.reset()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        latencies = sorted(pool.map(one, range(args.requests)))
+    wall = time.perf_counter() - started
+    result = {
+        "mode": mode,
+        "wall_s": wall,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1] * 1000,
+        "open_after": counter.open,
+        "peak_open": counter.peak,
+        "created": counter.created,
+    }
+    for client in clients:
+        client.close()
+    if mode == "shared":
+        close_mongo_client()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--database", default="cortex_bench")
+    args = parser.parse_args()
+    if not os.getenv("MONGODB_URI"):
+        parser.error("MONGODB_URI must point at a reachable MongoDB")
+
+    counter = ConnectionCounter()
+    monitoring.register(counter)
+
+    print(f"{'mode':<14}{'wall s':>8}{'p50 ms':>9}{'p95 ms':>9}{'connections created':>21}{'peak open':>11}{'open after':>12}")
+    for mode in ("per-instance", "shared"):
+        result = run_mode(mode, args, counter)
+        print(
+            f"{result['mode']:<14}{result['wall_s']:>8.2f}{result['p50_ms']:>9.1f}{result['p95_ms']:>9.1f}"
+            f"{result['created']:>21}{result['peak_open']:>11}{result['open_after']:>12}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Compare separate and hybrid per-section query generation.
+
+Runs generate_queries for every section of a report that needs both internal and
+web search, once with hybrid_query_generation disabled (two structured calls per
+section) and once enabled (one HybridQueries call). Reports wall time, per-section
+latency, LLM calls and prompt/output tokens. Token counts are estimated from the
+characters sent to and returned by the fake model.
+
+Usage:
+    python -m benchmarks.query_generation_bench --sections 10 --llm-latency lognormal:0.8:0.4
+"""
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import time
+
+os.environ.setdefault("GEMINI_API_KEY_BETA", "benchmark")
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark")
+
+from benchmarks.fakes import FILLER, Latency, install_fakes
+
+
+async def run_mode(hybrid: bool, args) -> dict:
+    fakes = install_fakes(Latency.parse(args.llm_latency), Latency.parse("fixed:0"), args.sections)
+    from report_writer.nodes.writer.section_writer import generate_queries
+    from report_writer.state import Section
+
+    internal_documents = FILLER * args.internal_document_repeats
+    config = {"configurable": {"number_of_queries": 3, "hybrid_query_generation": hybrid}}
+    latencies = []
+
+    async def one(index):
+        section = Section(name=f"Section {index + 1}", description=f"Analysis of sub-topic {index + 1}", research=True, internal_search=True, content="", sources=[])
+        started = time.perf_counter()
+        await generate_queries({"topic": "Benchmark topic", "section": section, "internal_documents": internal_documents}, config)
+        latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(index) for index in range(args.sections)))
+    wall = time.perf_counter() - started
+    model = fakes["models"]["planner_query_writer"]
+    return {
+        "mode": "hybrid" if hybrid else "separate",
+        "wall_s": wall,
+        "median_section_s": statistics.median(latencies),
+        "calls": model.calls,
+        "input_tokens": model.input_tokens,
+        "output_tokens": model.output_tokens,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sections", type=int, default=10)
+    parser.add_argument("--llm-latency", default="lognormal:0.8:0.4", help="kind:median[:spread] in seconds")
+    parser.add_argument("--internal-document-repeats", type=int, default=40, help="Size of the internal_documents block, in filler paragraphs")
+    args = parser.parse_args()
+
+    from logger import cortex_logger, runner_logger
+    runner_logger.setLevel(logging.WARNING)
+    cortex_logger.setLevel(logging.WARNING)
+
+    print(f"{'mode':<10}{'wall s':>9}{'median section s':>18}{'calls':>7}{'input tokens':>14}{'output tokens':>15}")
+    for hybrid in (False, True):
+        result = asyncio.run(run_mode(hybrid, args))
+        print(
+            f"{result['mode']:<10}{result['wall_s']:>9.2f}{result['median_section_s']:>18.2f}"
+            f"{result['calls']:>7}{result['input_tokens']:>14}{result['output_tokens']:>15}"
+        )
+
+
+if __name__ == "__main__":
+    main()
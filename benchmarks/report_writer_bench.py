@@ -0,0 +1,234 @@
+"""End-to-end benchmark of the report_writer graph with stand-in backends.
+
+Drives run_deepdive through plan, approve, research and compile against fake
+LLMs and fake search with configurable latency, on an in-memory checkpointer.
+For each section count it reports:
+- per-node wall time (calls, total and max)
+- phase wall times, where research+compile is the critical path after approval
+- how many sections, and runs of each node, were actually in flight at once
+- peak Python heap
+- checkpoint and pending-write volume, measured as the MongoDB saver would
+  serialize it (the full checkpoint on every step). With --blob-store local,
+  large state strings are kept out of line as they are in production.
+
+Usage:
+    python -m benchmarks.report_writer_bench --sections 3 10 30 \
+        --llm-latency lognormal:0.8:0.4 --search-latency lognormal:0.5:0.3
+    python -m benchmarks.report_writer_bench --sections 10 --blob-store off --internal-document-kb 500
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import time
+import tracemalloc
+from collections import defaultdict
+from typing import Any, Dict, List
+from uuid import UUID
+
+os.environ.setdefault("GEMINI_API_KEY_BETA", "benchmark")
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark")
+os.environ["SEARCH_CACHE_ENABLED"] = "false"
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langgraph.checkpoint.memory import MemorySaver
+from langgraph.types import Command
+from benchmarks.fakes import FILLER, Latency, install_fakes
+
+SECTION_NODES = ("build_section_with_research",)
+
+
+class NodeTimer(BaseCallbackHandler):
+    """Callback handler recording a start/end interval for every graph node run."""
+
+    run_inline = True
+
+    def __init__(self):
+        self.started: Dict[UUID, tuple[str, float]] = {}
+        self.intervals: List[tuple[str, float, float]] = []
+
+    def on_chain_start(self, serialized, inputs, *, run_id, metadata=None, **kwargs):
+        node = (metadata or {}).get("langgraph_node")
+        if node and kwargs.get("name") == node:
+            self.started[run_id] = (node, time.perf_counter())
+
+    def _finish(self, run_id):
+        if run_id in self.started:
+            node, start = self.started.pop(run_id)
+            self.intervals.append((node, start, time.perf_counter()))
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self._finish(run_id)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self._finish(run_id)
+
+
+class MeasuringSaver(MemorySaver):
+    """MemorySaver that tallies what a MongoDB saver would write.
+
+    MemorySaver stores each channel version once, but AsyncMongoDBSaver
+    serializes the whole checkpoint on every step, so that size is counted.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.checkpoints = 0
+        self.checkpoint_bytes = 0
+        self.write_bytes = 0
+        self.serialize_s = 0.0
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        started = time.perf_counter()
+        self.checkpoint_bytes += len(self.serde.dumps_typed(checkpoint)[1])
+        self.serialize_s += time.perf_counter() - started
+        self.checkpoints += 1
+        return super().put(config, checkpoint, metadata, new_versions)
+
+    def put_writes(self, config, writes, task_id, task_path=""):
+        started = time.perf_counter()
+        self.write_bytes += sum(len(self.serde.dumps_typed(value)[1]) for _, value in writes)
+        self.serialize_s += time.perf_counter() - started
+        return super().put_writes(config, writes, task_id, task_path)
+
+
+def max_overlap(intervals: List[tuple[float, float]]) -> int:
+    events = sorted([(start, 1) for start, _ in intervals] + [(end, -1) for _, end in intervals])
+    current = peak = 0
+    for _, delta in events:
+        current += delta
+        peak = max(peak, current)
+    return peak
+
+
+def summarize(timer: NodeTimer) -> Dict[str, Any]:
+    per_node = defaultdict(lambda: {"calls": 0, "total_s": 0.0, "max_s": 0.0, "peak_in_flight": 0})
+    for node, start, end in timer.intervals:
+        stats = per_node[node]
+        stats["calls"] += 1
+        stats["total_s"] += end - start
+        stats["max_s"] = max(stats["max_s"], end - start)
+    for node, stats in per_node.items():
+        stats["peak_in_flight"] = max_overlap([(start, end) for name, start, end in timer.intervals if name == node])
+    section_intervals = [(start, end) for node, start, end in timer.intervals if node in SECTION_NODES]
+    concurrency = {"peak_sections_in_flight": max_overlap(section_intervals), "average_sections_in_flight": 0.0}
+    if section_intervals:
+        span = max(end for _, end in section_intervals) - min(start for start, _ in section_intervals)
+        busy = sum(end - start for start, end in section_intervals)
+        concurrency["average_sections_in_flight"] = busy / span if span else 0.0
+    return {"nodes": {node: {k: round(v, 4) for k, v in stats.items()} for node, stats in per_node.items()}, "concurrency": concurrency}
+
+
+async def run_report(section_count: int, args) -> Dict[str, Any]:
+    from report_writer.graph import run_deepdive
+
+    fakes = install_fakes(Latency.parse(args.llm_latency), Latency.parse(args.search_latency), section_count, args.fail_rate)
+    timer = NodeTimer()
+    checkpointer = MeasuringSaver()
+    internal_documents = (FILLER * (args.internal_document_kb * 1024 // len(FILLER) + 1))[:args.internal_document_kb * 1024]
+    config = {
+        "configurable": {
+            "user_id": "benchmark",
+            "project_id": "benchmark",
+            "thread_id": f"benchmark-{section_count}-{time.time_ns()}",
+            "report_structure": "Introduction, research sections, conclusion",
+            "number_of_queries": 3,
+            "mode": "hybrid_rag",
+            "max_search_iterations": args.max_search_iterations,
+            "max_follow_up_queries": 3,
+            # The fakes have no document store; sections use the report's documents
+            "select_internal_documents": False,
+        },
+        "callbacks": [timer],
+        "recursion_limit": 100,
+    }
+
+    streamed = {"events": 0, "first_s": None}
+
+    async def on_stream(event):
+        streamed["events"] += 1
+        if streamed["first_s"] is None:
+            streamed["first_s"] = time.perf_counter()
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    await run_deepdive({"topic": "Benchmark topic", "internal_documents": internal_documents}, config, checkpointer)
+    planned = time.perf_counter()
+    report = await run_deepdive(Command(resume=True), config, checkpointer, on_stream if args.stream else None)
+    finished = time.perf_counter()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    if not isinstance(report, str):
+        raise RuntimeError(f"Benchmark run did not produce a final report: {report}")
+
+    summary = summarize(timer)
+    summary.update({
+        "sections": section_count,
+        "plan_s": round(planned - started, 4),
+        "critical_path_s": round(finished - planned, 4),
+        "total_s": round(finished - started, 4),
+        "peak_memory_mb": round(peak / 2 ** 20, 2),
+        "llm_calls": sum(model.calls for model in fakes["models"].values()),
+        "web_searches": fakes["search"].web_calls,
+        "internal_searches": fakes["search"].internal_calls,
+        "checkpoints": checkpointer.checkpoints,
+        "checkpoint_mb": round(checkpointer.checkpoint_bytes / 2 ** 20, 3),
+        "pending_write_mb": round(checkpointer.write_bytes / 2 ** 20, 3),
+        "serialize_s": round(checkpointer.serialize_s, 4),
+    })
+    if args.stream:
+        summary["stream_events"] = streamed["events"]
+        summary["first_content_s"] = round(streamed["first_s"] - planned, 4) if streamed["first_s"] else None
+    return summary
+
+
+def print_summary(summary: Dict[str, Any]):
+    print(f"\n=== {summary['sections']} research sections ===")
+    print(f"plan {summary['plan_s']:.2f}s | research+compile (critical path) {summary['critical_path_s']:.2f}s | total {summary['total_s']:.2f}s")
+    concurrency = summary["concurrency"]
+    print(f"sections in flight: peak {concurrency['peak_sections_in_flight']}, average {concurrency['average_sections_in_flight']:.2f}")
+    if "first_content_s" in summary:
+        print(f"first streamed content after approval {summary['first_content_s']}s ({summary['stream_events']} stream events)")
+    print(f"peak memory {summary['peak_memory_mb']} MB | LLM calls {summary['llm_calls']} | web searches {summary['web_searches']} | internal searches {summary['internal_searches']}")
+    print(f"checkpoints {summary['checkpoints']} ({summary['checkpoint_mb']} MB) | pending writes {summary['pending_write_mb']} MB | serialization {summary['serialize_s']:.3f}s")
+    print(f"{'node':<30}{'calls':>7}{'total s':>10}{'max s':>9}{'in flight':>11}")
+    for node, stats in sorted(summary["nodes"].items(), key=lambda item: -item[1]["total_s"]):
+        print(f"{node:<30}{stats['calls']:>7}{stats['total_s']:>10.2f}{stats['max_s']:>9.2f}{stats['peak_in_flight']:>11}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sections", type=int, nargs="+", default=[3, 10, 30])
+    parser.add_argument("--llm-latency", default="lognormal:0.8:0.4", help="kind:median[:spread] in seconds")
+    parser.add_argument("--search-latency", default="lognormal:0.5:0.3", help="kind:median[:spread] in seconds")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Probability the grader asks for a follow-up search")
+    parser.add_argument("--max-search-iterations", type=int, default=2)
+    parser.add_argument("--stream", action="store_true", help="Stream section content and report time to first content")
+    parser.add_argument("--internal-document-kb", type=int, default=200, help="Size of the internal documents passed to the report")
+    parser.add_argument("--blob-store", choices=["local", "off"], default="local", help="Keep large state strings out of line (local) or inline (off)")
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+    os.environ["STATE_BLOB_STORE"] = args.blob_store
+    blob_dir = tempfile.TemporaryDirectory()
+    os.environ["STATE_BLOB_DIR"] = blob_dir.name
+
+    # Node logging would dominate the timings; keep warnings only
+    from logger import cortex_logger, runner_logger
+    runner_logger.setLevel(logging.WARNING)
+    cortex_logger.setLevel(logging.WARNING)
+
+    results = []
+    for section_count in args.sections:
+        summary = asyncio.run(run_report(section_count, args))
+        print_summary(summary)
+        results.append(summary)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Measure how long a worker takes to import the app and to start serving.
+
+Each run starts a fresh interpreter, so nothing is shared between samples:
+- import: time to ``import main``, plus which heavy libraries that import loaded.
+- first model: time to build the first chat model afterwards, which is the cost
+  the lazy registry moves from startup to the first request that needs it.
+- ready: time from spawning a single uvicorn worker until ``GET /`` answers.
+
+Usage:
+    python -m benchmarks.startup_bench --runs 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import httpx
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ["langchain_google_genai", "google.genai", "pandas", "yfinance", "matplotlib", "mplfinance", "reportlab", "sec_api"]
+
+IMPORT_PROBE = f"""
+import json, sys, time
+started = time.perf_counter()
+import main
+imported = time.perf_counter() - started
+loaded = [m for m in {HEAVY_MODULES!r} if m in sys.modules]
+from services.lazy import get_chat_model
+started = time.perf_counter()
+get_chat_model("gemini-2.0-flash")
+first_model = time.perf_counter() - started
+print(json.dumps({{"import_s": imported, "first_model_s": first_model, "loaded": loaded}}))
+"""
+
+
+def probe_env() -> dict:
+    env = dict(os.environ)
+    env.setdefault("GEMINI_API_KEY_BETA", "benchmark")
+    env.setdefault("GOOGLE_API_KEY", "benchmark")
+    return env
+
+
+def measure_import() -> dict:
+    output = subprocess.run([sys.executable, "-c", IMPORT_PROBE], cwd=PROJECT_ROOT, env=probe_env(), capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def measure_ready(port: int, timeout: float) -> float:
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=PROJECT_ROOT, env=probe_env(), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            if server.poll() is not None:
+                raise RuntimeError(f"uvicorn exited with code {server.returncode}")
+            try:
+                if httpx.get(f"http://127.0.0.1:{port}/", timeout=0.5).status_code == 200:
+                    return time.perf_counter() - started
+            except httpx.TransportError:
+                pass
+            time.sleep(0.02)
+        raise TimeoutError(f"Worker was not ready after {timeout}s")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--port", type=int, default=9137)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    args = parser.parse_args()
+
+    imports = [measure_import() for _ in range(args.runs)]
+    ready = [measure_ready(args.port, args.timeout) for _ in range(args.runs)]
+
+    print(f"{'metric':<14}{'median s':>10}{'min s':>8}{'max s':>8}")
+    for name, samples in (
+        ("import", [sample["import_s"] for sample in imports]),
+        ("first model", [sample["first_model_s"] for sample in imports]),
+        ("ready", ready),
+    ):
+        print(f"{name:<14}{statistics.median(samples):>10.2f}{min(samples):>8.2f}{max(samples):>8.2f}")
+    print(f"Heavy modules loaded by import: {', '.join(imports[-1]['loaded']) or 'none'}")
+
+
+if __name__ == "__main__":
+    main()
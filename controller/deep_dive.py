@@ -1,5 +1,6 @@
 
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from services.research import start_planner, continue_research
 from report_writer.model import DeepResearch
@@ -11,6 +12,9 @@ import uuid
 
 api_router = APIRouter()    
 
+# Keeps streamed research tasks referenced until they finish, even if their client disconnects
+_research_tasks = set()
+
 class ResearchRequest(BaseModel):
     conversation_id: str = ""
     message: str = ""
@@ -44,15 +48,54 @@ async def continue_deepdive(user_id: str, project_id: str, report_id: str, reque
         researcher.id = report_id
         if isinstance(request.feedback, bool) and request.feedback is True:
             asyncio.create_task(continue_research(user_id, project_id, report_id, request.feedback))
-            researcher.update_status("in_progress")
+            await researcher.aupdate_status("in_progress")
             return {"report_id": report_id, "response": "starting-research"}
         else:
             response = await continue_research(user_id, project_id, report_id, request.feedback)
-            researcher.update_plan(response["plan"] , response["description"])
+            await researcher.aupdate_plan(response["plan"] , response["description"])
             return response
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@api_router.post("/deepdive/{user_id}/{project_id}/{report_id}/continue/stream")
+async def continue_deepdive_stream(user_id: str, project_id: str, report_id: str, request: ResearchRequest):
+    """Approve a report plan and stream section content as server-sent events while the report is written.
+
+    Emits section_token events (section, iteration, content) as each section is
+    generated, section_complete when a section is final, and then either complete
+    (with the report) or error. Plan feedback is not streamed; send it to /continue.
+    """
+    if not (isinstance(request.feedback, bool) and request.feedback is True):
+        raise HTTPException(status_code=400, detail="Only plan approval can be streamed; send feedback to /continue")
+    try:
+        researcher = DeepResearch()
+        researcher.id = report_id
+        await researcher.aupdate_status("in_progress")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    queue = asyncio.Queue()
+
+    async def on_stream(event):
+        await queue.put(event)
+
+    async def research():
+        try:
+            report = await continue_research(user_id, project_id, report_id, request.feedback, on_stream=on_stream)
+            await queue.put({"event": "complete", "report_id": report_id, "report": report})
+        except Exception as e:
+            await queue.put({"event": "error", "message": str(e)})
+
+    # Research keeps running if the client disconnects, as it does for /continue
+    task = asyncio.create_task(research())
+    _research_tasks.add(task)
+    task.add_done_callback(_research_tasks.discard)
 
+    async def event_generator():
+        while True:
+            event = await queue.get()
+            yield f"data: {json.dumps(event)}\n\n"
+            if event["event"] in ("complete", "error"):
+                break
 
-  
\ No newline at end of file
+    return StreamingResponse(event_generator(), media_type="text/event-stream")
@@ -46,7 +46,7 @@ async def run_maestro_api(request: MaestroRequest):
             
             # Get or create workflow
             if request.workflow_id:
-                workflow = workflow_service.get_workflow_by_id(request.workflow_id)
+                workflow = await workflow_service.aget_workflow_by_id(request.workflow_id)
                 if not workflow:
                     error_event = json.dumps({"error": f"Workflow with ID {request.workflow_id} not found"})
                     yield f"data: {error_event}\n\n"
@@ -58,7 +58,7 @@ async def run_maestro_api(request: MaestroRequest):
                     name=request.workflow_name,
                     messages=[]
                 )
-                workflow = workflow_service.insert_workflow(workflow)
+                workflow = await workflow_service.ainsert_workflow(workflow)
                 logger.info(f"Created new workflow with ID {workflow.id}")
                 
                 # Send initial workflow created event
@@ -73,7 +73,7 @@ async def run_maestro_api(request: MaestroRequest):
                 tool_execution=None
             )
             workflow.messages.append(user_message)
-            workflow_service.update_workflow(workflow)
+            await workflow_service.aappend_messages(workflow.id, [user_message])
             
             # Configure runnable config with workflow_id
             config = RunnableConfig(
@@ -98,7 +98,7 @@ async def run_maestro_api(request: MaestroRequest):
                         tool_execution=None
                     )
                     workflow.messages.append(cortex_message)
-                    workflow_service.update_workflow(workflow)
+                    await workflow_service.aappend_messages(workflow.id, [cortex_message])
                     
         
         except Exception as e:
@@ -1,24 +1,23 @@
 from langgraph.prebuilt import create_react_agent
 import os
-from langchain_google_genai import ChatGoogleGenerativeAI
+from functools import cache
+from services.lazy import lazy_chat_model, resolve
 from langchain_core.prompts import ChatPromptTemplate
 from cortex.state import Plan, Act
-from zone.utilities import FmpUtils
 from dotenv import load_dotenv
 from langchain_core.messages import ToolMessage , AIMessage
 from typing import Annotated
 from pydantic import Field
 from langchain_core.tools import tool
 from report_writer.search import google_search
-from langgraph.checkpoint.mongodb import AsyncMongoDBSaver
+from services.checkpoint import get_compiled_graph
 from zone.tools.financial_analysis_tools import analyze_balance_sheet, analyze_cash_flow, analyze_income_stmt, analyze_segment_stmt, income_summarization, get_risk_assessment, get_competitors_analysis, get_key_data
 from zone.tools.writing_tools import report_writer_tool
 
 load_dotenv()
 
 def get_gemini(model):
-    llm = ChatGoogleGenerativeAI(model=model, google_api_key = os.getenv("GEMINI_API_KEY_BETA"))
-    return llm
+    return lazy_chat_model(model)
 
 gemini_flash = get_gemini("gemini-2.0-flash")
 gemini_pro = get_gemini("gemini-2.5-pro-preview-03-25")
@@ -30,9 +29,7 @@ async def internet_search(query: GoogleSearchQuery):
     """Search the internet for the query."""
     return google_search(query) 
 
-async def run_executor(task, config):
-    # Choose the LLM that will drive the agent
-    prompt = (
+executor_prompt = (
     "You are a focused and capable assistant designed to complete structured tasks using a fixed set of tools.\n\n"
     "You have access to the following tools:\n"
     "- analyze_balance_sheet\n"
@@ -56,7 +53,25 @@ async def run_executor(task, config):
     
     "Think carefully. Be efficient. Complete the task with precision."
 )
-    
+
+def build_executor(checkpointer):
+    return create_react_agent(
+        resolve(gemini_flash),
+        [
+            analyze_balance_sheet,
+            analyze_cash_flow,
+            analyze_income_stmt,
+            analyze_segment_stmt,
+            income_summarization,
+            get_risk_assessment,
+            get_competitors_analysis,
+            report_writer_tool
+        ],
+        prompt=executor_prompt,
+        checkpointer=checkpointer
+    )
+
+async def run_executor(task, config, checkpointer=None):
     # Set a custom config with reduced recursion limit and appropriate settings
     agent_config = {
         "recursion_limit": 30,  # Lower recursion limit to fail faster if it loops
@@ -69,46 +84,32 @@ async def run_executor(task, config):
     if config:
         agent_config.update(config)
     
-    async with AsyncMongoDBSaver.from_conn_string(os.getenv("MONGODB_URI")) as checkpointer:
-        agent_executor = create_react_agent(
-            gemini_flash,
-            [
-                analyze_balance_sheet,
-                analyze_cash_flow,
-                analyze_income_stmt,
-                analyze_segment_stmt,
-                income_summarization,
-                get_risk_assessment,
-                get_competitors_analysis,
-                report_writer_tool
+    # Compiled once per process against the shared checkpointer
+    agent_executor = get_compiled_graph("executor", build_executor, checkpointer)
+
+    try:
+        last_message = None
+        # Note: Setting stream_mode to "custom" lets your tools stream custom data.
+        async for mode,  chunk in agent_executor.astream(
+            {"messages": [{"role": "user", "content": task}]},
+            config,
+            stream_mode=["messages","custom"
             ],
-            prompt=prompt,
-            checkpointer=checkpointer 
-        )
+        ):
+            # if mode == "messages":
+            if "messages" in chunk:
+                last_message = chunk["messages"][-1]  # Update with the latest content
+                # elif mode == "custom":
+                #     print("Custom Data:", chunk)
         
-        try:
-            last_message = None
-            # Note: Setting stream_mode to "custom" lets your tools stream custom data.
-            async for mode,  chunk in agent_executor.astream(
-                {"messages": [{"role": "user", "content": task}]},
-                config,
-                stream_mode=["messages","custom"
-                ],
-            ):
-                # if mode == "messages":
-                if "messages" in chunk:
-                    last_message = chunk["messages"][-1]  # Update with the latest content
-                    # elif mode == "custom":
-                    #     print("Custom Data:", chunk)
-            
-            if last_message is None:
-                raise ValueError("No message was streamed from the agent.")
-            return last_message.content
-        
-        except Exception as e:
-            error_message = f"Error during execution: {str(e)}"
-            print(f"\n{error_message}")
-            return error_message
+        if last_message is None:
+            raise ValueError("No message was streamed from the agent.")
+        return last_message.content
+    
+    except Exception as e:
+        error_message = f"Error during execution: {str(e)}"
+        print(f"\n{error_message}")
+        return error_message
 
 planner_prompt = ChatPromptTemplate.from_template(
     """
@@ -173,7 +174,9 @@ planner_prompt = ChatPromptTemplate.from_template(
     """
 )
 
-planner = planner_prompt | gemini_flash.with_structured_output(Plan)
+@cache
+def get_planner():
+    return planner_prompt | gemini_flash.with_structured_output(Plan)
 
 replanner_prompt = ChatPromptTemplate.from_template(
     """
@@ -250,6 +253,8 @@ replanner_prompt = ChatPromptTemplate.from_template(
 )
 
 
-replanner = replanner_prompt | gemini_pro.with_structured_output(Act)
+@cache
+def get_replanner():
+    return replanner_prompt | gemini_pro.with_structured_output(Act)
 
-__all__ = ["gemini_flash", "gemini_pro", "run_executor", "planner", "replanner"]
+__all__ = ["gemini_flash", "gemini_pro", "run_executor", "get_planner", "get_replanner"]
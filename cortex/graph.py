@@ -1,6 +1,6 @@
 from langgraph.graph import END
 from langgraph.graph import StateGraph, START
-from cortex.executor import run_executor, planner, replanner
+from cortex.executor import run_executor, get_planner, get_replanner
 from cortex.state import PlanExecute
 from cortex.state import Plan
 from langchain_core.runnables import RunnableConfig
@@ -69,7 +69,7 @@ async def plan_step(state: PlanExecute):
         "Write three paragraphs (150–160 words each) for:\n- Business Overview\n- Market Position\n- Operating Results \n using insights from Steps 1 and 2."
     ]
     plan_text = "\n".join(f"{i+1}. {step}" for i, step in enumerate(plan))
-    plan = await planner.ainvoke({"objective": state["input"], "plan": plan_text}) 
+    plan = await get_planner().ainvoke({"objective": state["input"], "plan": plan_text}) 
     print(plan)
     print("\n------------\n")
     return {"plan": plan.steps} 
@@ -80,7 +80,7 @@ async def replan_step(state: PlanExecute):
     writer = get_stream_writer()
     writer({"status" : "Reasoning"})
     try:
-        output = await replanner.ainvoke(state)
+        output = await get_replanner().ainvoke(state)
         if output is None:
             error_msg = "Replanner returned None. Using default plan continuation."
             logger.error(error_msg)
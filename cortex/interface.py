@@ -1,9 +1,9 @@
-import os
 import datetime
 from langchain_core.messages import SystemMessage
 from langchain_core.runnables import RunnableConfig
-from langgraph.checkpoint.mongodb import AsyncMongoDBSaver
+from services.checkpoint import get_compiled_graph
 from zone import gemini_flash
+from services.lazy import resolve
 from langchain_core.tools import tool
 from langgraph.prebuilt import create_react_agent
 from cortex.state import WorkflowMessage, ToolExecution
@@ -29,9 +29,7 @@ async def workflow_tool(task: workflow_task, name: workflow_name, config : Runna
     """
     workflow_id = config["configurable"]["workflow_id"]
     workflow_service = WorkflowService()
-    workflow = workflow_service.get_workflow_by_id(workflow_id)
-    workflow.name = name
-    workflow_service.update_workflow(workflow)
+    await workflow_service.aappend_messages(workflow_id, [], {"name": name})
     print(f"Workflow {workflow_id} updated with name {name}")
     inputs = {"input": task}
     config["recursion_limit"] = 50
@@ -83,6 +81,18 @@ workflow_agent_prompt = (
 
 PROMPT = workflow_agent_prompt
 
+def maestro_prompt(state):
+    # Formatted per model call, so the agent can be compiled once and still see the current time
+    return [SystemMessage(PROMPT.format(current_date_time=datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"))), *state["messages"]]
+
+def build_maestro(checkpointer):
+    return create_react_agent(
+        model=resolve(gemini_flash),
+        tools=[workflow_tool],
+        prompt=maestro_prompt,
+        checkpointer=checkpointer,
+    )
+
 async def run_maestro(inputs, config, workflow: Workflow, workflow_service: WorkflowService):
     """Run the Maestro agent and stream results asynchronously.
     
@@ -93,19 +103,15 @@ async def run_maestro(inputs, config, workflow: Workflow, workflow_service: Work
     Yields:
         Chunks of data from the agent's execution
     """
-    async with AsyncMongoDBSaver.from_conn_string(os.getenv("MONGODB_URI")) as checkpointer:
-        maestro = create_react_agent(
-                        model=gemini_flash,
-                        tools=[workflow_tool],
-                        prompt=SystemMessage(PROMPT.format(current_date_time=datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"))),
-                        checkpointer=checkpointer,
-                    )
-        last_message = None
-        message_type = None
-        tool_execution = None  
-        tool_calls = []
-        current_task = None
-        messages = workflow.messages
+    maestro = get_compiled_graph("maestro", build_maestro)
+    last_message = None
+    message_type = None
+    tool_execution = None  
+    tool_calls = []
+    current_task = None
+    messages = workflow.messages
+    # New messages are pushed in batches rather than rewriting the whole workflow per chunk
+    async with workflow_service.writer(workflow.id) as writer:
         async for _, chunk in maestro.astream(
             {"messages": [{"role": "user", "content": inputs.get('input', str(inputs))}]},
             config,
@@ -118,15 +124,17 @@ async def run_maestro(inputs, config, workflow: Workflow, workflow_service: Work
             print(type(chunk))
             if "agent" in chunk:
                 last_message = chunk["agent"]["messages"][-1]  # Update with the latest content
-                
+            
                 if last_message is None:
                     continue
-                    
+                
                 if isinstance(last_message, AIMessage):
+                    # The controller appends its own message after this event, so ours must land first
+                    await writer.flush()
                     yield {"event": "complete", "is_cortex_output": True, "content": last_message.content}
                 else:
                     yield {"event": "message", "is_cortex_output": False, "content": last_message.content}
-                
+            
             elif isinstance(chunk, dict):
                 # Handle tuple case (likely a key-value pair)
                 for k, v in chunk.items():
@@ -141,6 +149,7 @@ async def run_maestro(inputs, config, workflow: Workflow, workflow_service: Work
                         elif k == "instructor_update":
                             message = WorkflowMessage(type=message_type, content=v, task=None, tool_execution=None)
                             messages.append(message)
+                            writer.append(message)
                             yield {"event": "message", "type": message_type, "content": v}
                         elif k == "executor_task":
                             tool_calls = []
@@ -158,9 +167,8 @@ async def run_maestro(inputs, config, workflow: Workflow, workflow_service: Work
                         elif k == "executor_update":
                             message = WorkflowMessage(type=message_type, content=v, task=current_task, tool_execution=tool_calls)
                             messages.append(message)
+                            writer.append(message)
                             yield {"event": "message", "type": message_type, "content": v, "task": current_task, "tool_execution": [instance.model_dump() for instance in tool_calls]}
 
                 logger.info(f"{k} - {v}")
-                workflow.messages = messages
-                workflow = workflow_service.update_workflow(workflow)
-        
+    
@@ -1,13 +1,38 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from controller.deep_dive import api_router
 from controller.maestro import router as maestro_api_router
+from report_writer.clients import aclose_genai_clients
+from services.checkpoint import aclose_checkpointer, asetup_checkpointer
+from services.retention import start_retention_task
+from services.mongo import aclose_mongo_client, close_mongo_client, get_async_mongo_client, get_mongo_client
 import uvicorn
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One MongoDB connection pool per worker, shared by every service; request
+    # handlers use the async client bound to this event loop
+    get_mongo_client()
+    get_async_mongo_client()
+    # One LangGraph checkpointer on that client; graphs and agents compile against it on first use
+    await asetup_checkpointer()
+    # Prunes checkpoints of completed and idle threads in the background
+    retention = start_retention_task()
+    yield
+    if retention is not None:
+        retention.cancel()
+    await aclose_checkpointer()
+    await aclose_mongo_client()
+    close_mongo_client()
+    # Release pooled connections held by shared clients
+    await aclose_genai_clients()
+
 app = FastAPI(
     title="Cortex",
     description="Knowledge workers second brain",
-    version="0.1.0"
+    version="0.1.0",
+    lifespan=lifespan
 )
 
 # Configure CORS
@@ -1,22 +1,22 @@
 import os
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
+from services.lazy import lazy_chat_model
 from dotenv import load_dotenv
 
 load_dotenv()
 
 def get_gemini(model):
-    llm = ChatGoogleGenerativeAI(model=model, google_api_key = os.getenv("GEMINI_API_KEY_BETA"))
-    return llm
+    return lazy_chat_model(model)
 
 def initialize_langchain_embedding_model():
+    from services.cassette_models import CassetteGoogleGenerativeAIEmbeddings as GoogleGenerativeAIEmbeddings
     embeddings = GoogleGenerativeAIEmbeddings(model="models/embedding-001", google_api_key = os.getenv("GEMINI_API_KEY_BETA"))
     return embeddings
 
+# Models are built on first use; see services.lazy
 planner_query_writer = get_gemini("gemini-2.0-flash")
 planner_llm = get_gemini("gemini-2.0-flash")
 report_writer_llm = get_gemini("gemini-2.0-flash-thinking-exp")
 gemini_flash = get_gemini("gemini-2.0-flash")
 gemini_pro = get_gemini("gemini-2.0-pro-exp-02-05")
 
-__all__ = ["planner_query_writer", "planner_llm", "report_writer_llm", "gemini_flash", "gemini_pro"]
\ No newline at end of file
+__all__ = ["planner_query_writer", "planner_llm", "report_writer_llm", "gemini_flash", "gemini_pro"]
@@ -2,10 +2,10 @@ from langchain_core.runnables import RunnableConfig
 from langgraph.prebuilt import create_react_agent
 from langchain_core.tools import tool
 from services.research import start_planner
-from langgraph.checkpoint.mongodb import AsyncMongoDBSaver   
+from services.checkpoint import get_compiled_graph
 from report_writer import gemini_flash
+from services.lazy import resolve
 from langchain_core.messages import SystemMessage
-import os
 import datetime
 from logger import agent_logger as logger
 from report_writer.model import DeepResearch
@@ -51,15 +51,15 @@ async def search(topic: ResearchTopic, config: RunnableConfig) -> str:
         user_id = config["configurable"]["user_id"]
         project_id = config["configurable"]["project_id"]
         researcher = DeepResearch()
-        researcher.create_report(user_id, project_id, topic)
+        await researcher.acreate_report(user_id, project_id, topic)
         report_id = researcher.id
         response = await start_planner(user_id, project_id, topic, report_id)
         print("Deep research plan Response:", response)
         plan = response["generate_report_plan"]["sections"]
         description = response["generate_report_plan"]["description"]
         plan_dicts = [section.model_dump() for section in plan]
-        researcher.update_plan(plan_dicts, description)
-        researcher.update_status("in_planning")
+        await researcher.aupdate_plan(plan_dicts, description)
+        await researcher.aupdate_status("in_planning")
 
         result = {
             "report_id": report_id,
@@ -76,23 +76,28 @@ async def search(topic: ResearchTopic, config: RunnableConfig) -> str:
         logger.error(f"Error in search: {str(e)}")
         return json.dumps({"error": "There was an error while calling the Deep Research tool try again later: " + str(e)})
 
-async def run_deepdive(inputs, config):
-    async with AsyncMongoDBSaver.from_conn_string(os.getenv("MONGODB_URI")) as checkpointer:
-            cortex = create_react_agent(
-                        model=gemini_flash,
-                        tools=[search],
-                        prompt=SystemMessage(PROMPT.format(current_date_time=datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"))),
-                        checkpointer=checkpointer,
-                    )
+def deepdive_prompt(state):
+    # Dated on each call; the agent itself is built once per process
+    return [SystemMessage(PROMPT.format(current_date_time=datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"))), *state["messages"]]
+
+def build_deepdive_agent(checkpointer):
+    return create_react_agent(
+        model=resolve(gemini_flash),
+        tools=[search],
+        prompt=deepdive_prompt,
+        checkpointer=checkpointer,
+    )
 
+async def run_deepdive(inputs, config):
+    cortex = get_compiled_graph("deepdive", build_deepdive_agent)
+    response = await cortex.ainvoke(inputs, config)
+    last_message = response["messages"][-1] 
+    print("Response:", last_message)
+    if isinstance(last_message, ToolMessage):
+        if "error" in last_message.content:
             response = await cortex.ainvoke(inputs, config)
-            last_message = response["messages"][-1] 
-            print("Response:", last_message)
-            if isinstance(last_message, ToolMessage):
-                if "error" in last_message.content:
-                    response = await cortex.ainvoke(inputs, config)
-                else:
-                    return json.loads(last_message.content)
+        else:
+            return json.loads(last_message.content)
 
-            return {"reply": response["messages"][-1].content, "type": "cortex", "conversation_id": config["configurable"]["thread_id"]}
+    return {"reply": response["messages"][-1].content, "type": "cortex", "conversation_id": config["configurable"]["thread_id"]}
 
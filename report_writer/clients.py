@@ -0,0 +1,105 @@
+"""Process-wide registry of google-genai clients.
+
+Clients are created lazily on first use, one per API key, and reused by every sync
+and async search so HTTP connections stay alive between calls. Pool sizing comes
+from GENAI_MAX_CONNECTIONS, GENAI_MAX_KEEPALIVE_CONNECTIONS and
+GENAI_KEEPALIVE_EXPIRY.
+"""
+import os
+import threading
+from typing import TYPE_CHECKING
+import httpx
+from logger import runner_logger as logger
+
+if TYPE_CHECKING:
+    # google.genai takes a while to import, so it is loaded with the first client
+    from google import genai
+    from google.genai.types import Tool
+
+DEFAULT_MAX_CONNECTIONS = 20
+DEFAULT_MAX_KEEPALIVE_CONNECTIONS = 10
+DEFAULT_KEEPALIVE_EXPIRY = 30.0
+
+_clients: dict[str, "genai.Client"] = {}
+_lock = threading.Lock()
+_google_search_tool = None
+
+
+def _pool_limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=int(os.getenv("GENAI_MAX_CONNECTIONS", DEFAULT_MAX_CONNECTIONS)),
+        max_keepalive_connections=int(os.getenv("GENAI_MAX_KEEPALIVE_CONNECTIONS", DEFAULT_MAX_KEEPALIVE_CONNECTIONS)),
+        keepalive_expiry=float(os.getenv("GENAI_KEEPALIVE_EXPIRY", DEFAULT_KEEPALIVE_EXPIRY)),
+    )
+
+
+def get_genai_client(api_key: str | None = None) -> "genai.Client":
+    """Return the shared client for api_key (GOOGLE_API_KEY by default), creating it once.
+
+    The same client serves blocking calls and its ``aio`` side serves async ones.
+    """
+    api_key = api_key or os.getenv("GOOGLE_API_KEY")
+    if not api_key:
+        raise EnvironmentError("GOOGLE_API_KEY environment variable not set.")
+    client = _clients.get(api_key)
+    if client is None:
+        with _lock:
+            client = _clients.get(api_key)
+            if client is None:
+                from google import genai
+                from google.genai.types import HttpOptions
+                limits = _pool_limits()
+                client = genai.Client(
+                    api_key=api_key,
+                    http_options=HttpOptions(
+                        client_args={"limits": limits},
+                        async_client_args={"limits": limits},
+                    ),
+                )
+                _clients[api_key] = client
+                logger.info(f"Created shared genai client (max_connections={limits.max_connections})")
+    return client
+
+
+def get_google_search_tool() -> "Tool":
+    global _google_search_tool
+    if _google_search_tool is None:
+        from google.genai.types import GoogleSearch, Tool
+        _google_search_tool = Tool(google_search=GoogleSearch())
+    return _google_search_tool
+
+
+def _take_clients() -> list["genai.Client"]:
+    with _lock:
+        clients = list(_clients.values())
+        _clients.clear()
+    return clients
+
+
+def close_genai_clients():
+    """Close the HTTP pools of every registered client; later calls create fresh ones."""
+    for client in _take_clients():
+        if hasattr(client, "close"):
+            client.close()
+            continue
+        api_client = getattr(client, "_api_client", None)
+        httpx_client = getattr(api_client, "_httpx_client", None)
+        if httpx_client is not None:
+            httpx_client.close()
+
+
+async def aclose_genai_clients():
+    """Async variant of close_genai_clients that also closes the aio connection pools."""
+    for client in _take_clients():
+        if hasattr(client, "close") and hasattr(client.aio, "aclose"):
+            client.close()
+            await client.aio.aclose()
+            continue
+        api_client = getattr(client, "_api_client", None)
+        httpx_client = getattr(api_client, "_httpx_client", None)
+        async_httpx_client = getattr(api_client, "_async_httpx_client", None)
+        if httpx_client is not None:
+            httpx_client.close()
+        if async_httpx_client is not None:
+            await async_httpx_client.aclose()
+    logger.info("Closed shared genai clients")
@@ -0,0 +1,268 @@
+"""Token-budgeted packing of research context for section writing.
+
+Results that already fit the budget are passed through unchanged. Otherwise they
+are split into snippets: answer paragraphs, and one snippet per grounded segment
+of the ``##Sources##`` block. Duplicate snippets are dropped and the rest are
+ranked by lexical relevance to the section. The top snippets that fit a token
+budget are kept and re-emitted in their original order, under the sub-query
+header they were answering.
+
+The user's internal documents are selected the same way: DocumentIndex ranks
+them by their extracted features, and only the most relevant that fit a budget
+are shown to the planner and query writers.
+"""
+import math
+import re
+from collections import Counter
+from typing import Callable, List
+
+DEFAULT_SECTION_CONTEXT_TOKEN_BUDGET = 12000
+
+_MARKER = re.compile(r"^-{5,}.*-{5,}$")
+_SOURCES_HEADER = "##Sources##"
+_WORD = re.compile(r"\w+")
+
+
+def approximate_token_count(text: str) -> int:
+    """Rough Gemini token estimate (about four characters per token)."""
+    return math.ceil(len(text) / 4)
+
+
+_token_counter: Callable[[str], int] = approximate_token_count
+
+
+def set_token_counter(counter: Callable[[str], int] | None):
+    """Use a different token counter, e.g. a model's get_num_tokens; None restores the estimate."""
+    global _token_counter
+    _token_counter = counter or approximate_token_count
+
+
+def count_tokens(text: str) -> int:
+    return _token_counter(text)
+
+
+def split_queries(text: str) -> List[tuple[str, str]]:
+    """Split formatted search results into (header, response) pairs, one per sub-query.
+
+    The header is the SUB-QUERY marker, the query and the RESPONSE marker as they
+    appear in text. Text before the first marker gets an empty header.
+    """
+    parts = [["", []]]
+    awaiting_query = False
+    for line in text.splitlines():
+        stripped = line.strip()
+        if awaiting_query:
+            parts[-1][0] += "\n" + line
+            awaiting_query = False
+        elif _MARKER.match(stripped):
+            if "RESPONSE" in stripped:
+                parts[-1][0] = (parts[-1][0] + "\n" + line).lstrip("\n")
+            else:
+                parts.append([line, []])
+                # The line after a SUB-QUERY marker is the query itself
+                awaiting_query = True
+        else:
+            parts[-1][1].append(line)
+    return [(header, "\n".join(lines)) for header, lines in parts if header or any(line.strip() for line in lines)]
+
+
+def split_snippets(text: str) -> List[str]:
+    """Split formatted search results into self-contained snippets.
+
+    Sub-query markers and the queries that follow them are dropped. Each
+    ``Segment Text``/``Sources`` pair becomes one snippet so that citations keep
+    their confidence scores and source titles.
+    """
+    snippets = []
+    paragraph = []
+    in_sources = False
+    skip_next = False
+
+    def flush():
+        if paragraph:
+            snippets.append("\n".join(paragraph).strip())
+            paragraph.clear()
+
+    for line in text.splitlines():
+        stripped = line.strip()
+        if skip_next:
+            skip_next = False
+            continue
+        if _MARKER.match(stripped):
+            flush()
+            in_sources = False
+            # The line after a SUB-QUERY marker is the query itself
+            skip_next = "RESPONSE" not in stripped
+            continue
+        if stripped == _SOURCES_HEADER:
+            flush()
+            in_sources = True
+            continue
+        if in_sources:
+            if stripped.startswith("Segment Text:"):
+                flush()
+                paragraph.append(stripped)
+            elif stripped.startswith("Sources:") and paragraph:
+                paragraph.append(stripped)
+                flush()
+            elif stripped:
+                paragraph.append(stripped)
+            continue
+        if not stripped:
+            flush()
+        else:
+            paragraph.append(line)
+    flush()
+    return [snippet for snippet in snippets if snippet]
+
+
+def _terms(text: str) -> List[str]:
+    return [term for term in _WORD.findall(text.lower()) if len(term) > 2]
+
+
+def _is_duplicate(terms: set, seen: List[set], threshold: float = 0.9) -> bool:
+    for other in seen:
+        union = terms | other
+        if union and len(terms & other) / len(union) >= threshold:
+            return True
+    return False
+
+
+def _bm25(query_terms: set, frequencies: Counter, length: int, document_frequency: Counter, document_count: int, average_length: float) -> float:
+    score = 0.0
+    for term in query_terms:
+        if term not in frequencies:
+            continue
+        idf = math.log(1 + (document_count - document_frequency[term] + 0.5) / (document_frequency[term] + 0.5))
+        tf = frequencies[term]
+        score += idf * tf * 2.2 / (tf + 1.2 * (0.25 + 0.75 * length / average_length))
+    return score
+
+
+def rank_snippets(snippets: List[str], query: str) -> List[int]:
+    """Order snippet indexes by BM25 relevance to query, best first."""
+    query_terms = set(_terms(query))
+    documents = [_terms(snippet) for snippet in snippets]
+    if not documents:
+        return []
+    average_length = sum(len(doc) for doc in documents) / len(documents) or 1.0
+    document_frequency = Counter(term for doc in documents for term in set(doc))
+    scores = []
+    for index, doc in enumerate(documents):
+        score = _bm25(query_terms, Counter(doc), len(doc), document_frequency, len(documents), average_length)
+        scores.append((score, -index))
+    return [-index for _, index in sorted(scores, reverse=True)]
+
+
+def pack_context(text: str, query: str, token_budget: int) -> str:
+    """Return the most relevant, de-duplicated snippets of text that fit in token_budget.
+
+    Text within the budget is returned as it is.
+    """
+    if not text or count_tokens(text) <= token_budget:
+        return text
+    parts = split_queries(text)
+    unique = []
+    owners = []
+    seen_terms = []
+    for part_index, (_, response) in enumerate(parts):
+        for snippet in split_snippets(response):
+            terms = set(_terms(snippet))
+            if terms and _is_duplicate(terms, seen_terms):
+                continue
+            seen_terms.append(terms)
+            unique.append(snippet)
+            owners.append(part_index)
+
+    selected = set()
+    headed = set()
+    used = 0
+    for index in rank_snippets(unique, query):
+        # The first snippet kept for a sub-query also pays for its header
+        cost = count_tokens(unique[index])
+        if owners[index] not in headed:
+            cost += count_tokens(parts[owners[index]][0])
+        if used + cost > token_budget:
+            continue
+        selected.add(index)
+        headed.add(owners[index])
+        used += cost
+
+    packed = []
+    current = None
+    for index, snippet in enumerate(unique):
+        if index not in selected:
+            continue
+        if owners[index] != current:
+            current = owners[index]
+            if parts[current][0]:
+                packed.append(parts[current][0])
+        packed.append(snippet)
+    return "\n\n".join(packed)
+
+
+def pack_section_context(search_results: str, internal_search_results: str, query: str, token_budget: int = DEFAULT_SECTION_CONTEXT_TOKEN_BUDGET) -> tuple[str, str]:
+    """Pack web and internal results into one shared budget.
+
+    Each side is guaranteed half the budget. Whatever one side does not need is
+    handed to the other.
+    """
+    search_results = search_results or ""
+    internal_search_results = internal_search_results or ""
+    half = token_budget // 2
+    web_need = count_tokens(search_results)
+    internal_need = count_tokens(internal_search_results)
+    web_budget = max(half, token_budget - min(internal_need, half))
+    internal_budget = max(half, token_budget - min(web_need, half))
+    return (
+        pack_context(search_results, query, web_budget),
+        pack_context(internal_search_results, query, internal_budget),
+    )
+
+
+class DocumentIndex:
+    """BM25 index over a user's documents, built from their extracted features.
+
+    Term statistics are computed once, so each topic or section query only
+    scores against them.
+    """
+
+    FIELDS = ("name", "document_type", "domain", "summary", "highlights", "queries")
+
+    def __init__(self, documents: list):
+        self.documents = documents
+        self._frequencies = []
+        self._lengths = []
+        for document in documents:
+            terms = []
+            for field in self.FIELDS:
+                value = getattr(document, field, None) or ""
+                terms.extend(_terms(" ".join(value) if isinstance(value, list) else str(value)))
+            self._frequencies.append(Counter(terms))
+            self._lengths.append(len(terms))
+        self._document_frequency = Counter(term for frequencies in self._frequencies for term in frequencies)
+        self._average_length = sum(self._lengths) / len(self._lengths) if documents else 1.0
+        self._average_length = self._average_length or 1.0
+
+    def rank(self, query: str) -> List[int]:
+        """Order document indexes by relevance to query, best first; ties keep their original order."""
+        query_terms = set(_terms(query))
+        scores = [
+            (_bm25(query_terms, frequencies, length, self._document_frequency, len(self.documents), self._average_length), -index)
+            for index, (frequencies, length) in enumerate(zip(self._frequencies, self._lengths))
+        ]
+        return [-index for _, index in sorted(scores, reverse=True)]
+
+    def select(self, query: str, token_budget: int, top_k: int, render: Callable[[object], str]) -> list:
+        """The top_k most relevant documents whose rendered text fits in token_budget, best first."""
+        selected = []
+        used = 0
+        for index in self.rank(query):
+            if len(selected) >= top_k:
+                break
+            cost = count_tokens(render(self.documents[index]))
+            if used + cost > token_budget:
+                continue
+            selected.append(self.documents[index])
+            used += cost
+        return selected
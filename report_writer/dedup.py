@@ -0,0 +1,114 @@
+"""Report-wide semantic deduplication of section search queries.
+
+Every section writes its own queries, and across a report many of them are
+paraphrases. The queries are embedded together and greedily clustered by cosine
+similarity. Each section's queries are then rewritten to their cluster's
+representative, so the search cache and single-flight layer serve one search to
+every section that asked.
+"""
+import hashlib
+import math
+import re
+from typing import Dict, List
+from logger import runner_logger as logger
+
+DEFAULT_DEDUP_THRESHOLD = 0.92
+
+_query_embedder = None
+
+
+class HashingEmbedder:
+    """Dependency-free embedder over hashed word unigrams and bigrams.
+
+    Implements the embed_documents/aembed_documents part of the LangChain
+    Embeddings interface, for tests and offline runs.
+    """
+
+    def __init__(self, dimensions: int = 512):
+        self.dimensions = dimensions
+
+    def _embed(self, text: str) -> List[float]:
+        tokens = re.findall(r"\w+", text.lower())
+        features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+        vector = [0.0] * self.dimensions
+        for feature in features:
+            digest = hashlib.md5(feature.encode("utf-8")).digest()
+            vector[int.from_bytes(digest[:4], "little") % self.dimensions] += 1.0
+        return vector
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embed_documents(texts)
+
+
+def set_query_embedder(embedder):
+    """Swap the embedder used for deduplication (None restores the Gemini default)."""
+    global _query_embedder
+    _query_embedder = embedder
+
+
+def get_query_embedder():
+    global _query_embedder
+    if _query_embedder is None:
+        from report_writer import initialize_langchain_embedding_model
+        _query_embedder = initialize_langchain_embedding_model()
+    return _query_embedder
+
+
+def cosine_similarity(a: List[float], b: List[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+def cluster_queries(queries: List[str], embeddings: List[List[float]], threshold: float) -> Dict[str, str]:
+    """Map every query to its cluster representative.
+
+    Queries are visited in order. A query joins the first representative it is at
+    least threshold-similar to; otherwise it becomes a new representative.
+    """
+    representatives: List[tuple[str, List[float]]] = []
+    mapping = {}
+    for query, embedding in zip(queries, embeddings):
+        for representative, rep_embedding in representatives:
+            if cosine_similarity(embedding, rep_embedding) >= threshold:
+                mapping[query] = representative
+                break
+        else:
+            representatives.append((query, embedding))
+            mapping[query] = query
+    return mapping
+
+
+def _unique(items: List[str]) -> List[str]:
+    return list(dict.fromkeys(items))
+
+
+async def deduplicate_report_queries(section_queries: Dict[str, Dict[str, List[str]]], threshold: float = DEFAULT_DEDUP_THRESHOLD, embedder=None) -> Dict[str, Dict[str, List[str]]]:
+    """Rewrite every section's queries to their report-wide cluster representatives.
+
+    Args:
+        section_queries: Section name mapped to its "search_queries" and
+            "internal_search_queries" lists.
+        threshold: Cosine similarity at or above which two queries are merged.
+        embedder: Anything with aembed_documents; defaults to get_query_embedder().
+
+    Returns:
+        The same structure with paraphrases replaced and duplicates removed. Web
+        and internal queries are clustered separately because they hit different
+        backends.
+    """
+    embedder = embedder or get_query_embedder()
+    deduplicated = {name: dict(queries) for name, queries in section_queries.items()}
+    for field in ("search_queries", "internal_search_queries"):
+        pending = _unique([query for queries in section_queries.values() for query in queries.get(field, [])])
+        if len(pending) < 2:
+            continue
+        embeddings = await embedder.aembed_documents(pending)
+        mapping = cluster_queries(pending, embeddings, threshold)
+        for name, queries in section_queries.items():
+            deduplicated[name][field] = _unique([mapping[query] for query in queries.get(field, [])])
+        logger.info(f"Deduplicated {len(pending)} {field} into {len(set(mapping.values()))} distinct queries")
+    return deduplicated
@@ -7,11 +7,12 @@ from report_writer.state import (
     SectionOutputState,
 )
 from .nodes.planner.report_planner import generate_report_plan, human_feedback, rewrite_report_plan
-from .nodes.writer.section_writer import generate_queries, search_web, write_section, perform_research
+from .nodes.writer.section_writer import generate_queries, search_web, write_section, perform_research, prepare_section_research, route_section_start
 from .nodes.compiler.report_compiler import gather_completed_sections, write_final_sections, compile_final_report, initiate_final_section_writing
-from langgraph.checkpoint.mongodb import AsyncMongoDBSaver   
-import os
+from services.blob_store import aput_blob
+from services.checkpoint import get_compiled_graph
 from logger import cortex_logger as logger 
+from report_writer.usage import usage_callback
 # Add nodes 
 section_builder = StateGraph(SectionState, output=SectionOutputState)
 section_builder.add_node("generate_queries", generate_queries)
@@ -20,7 +21,7 @@ section_builder.add_node("write_section", write_section)
 section_builder.add_node("perform_research", perform_research)
 
 # Add edges
-section_builder.add_edge(START, "generate_queries")
+section_builder.add_conditional_edges(START, route_section_start, ["generate_queries", "perform_research"])
 section_builder.add_edge("generate_queries", "perform_research")
 section_builder.add_edge("perform_research", "write_section")
 section_builder.add_edge("search_web", "write_section")
@@ -32,6 +33,7 @@ builder = StateGraph(ReportState, input=ReportStateInput, output=ReportStateOutp
 builder.add_node("generate_report_plan", generate_report_plan)
 builder.add_node("human_feedback", human_feedback)
 builder.add_node("rewrite_report_plan", rewrite_report_plan)
+builder.add_node("prepare_section_research", prepare_section_research)
 builder.add_node("build_section_with_research", section_builder.compile())
 builder.add_node("gather_completed_sections", gather_completed_sections)
 builder.add_node("write_final_sections", write_final_sections)
@@ -46,36 +48,61 @@ builder.add_conditional_edges("gather_completed_sections", initiate_final_sectio
 builder.add_edge("write_final_sections", "compile_final_report")
 builder.add_edge("compile_final_report", END)
 
-async def run_deepdive(input, config):
-    async with AsyncMongoDBSaver.from_conn_string(os.getenv("MONGODB_URI")) as checkpointer:
-        graph = builder.compile(checkpointer=checkpointer)
-        final_result = None
-        # Use streaming mode "updates" to capture intermediate events (including interrupts)
-        async for event in graph.astream(input, config, stream_mode="updates"):
-            logger.info("Graph event:", str(event))
-            # If an interrupt event is present, you can capture its payload:
-            if "__interrupt__" in event:
-                interrupt_payload = event["__interrupt__"]
-                print("Interrupt encountered:", interrupt_payload)
-                # Optionally, you can decide to break or resume the graph using a Command.
-                # For now, we'll break out of the stream.
-                break
-            if "compile_final_report" in event:
-                event = event["compile_final_report"]["final_report"]
-            # Optionally, if the event represents a final result, store it.
-            # (The final event may include a key like "final_result" or simply be the last state.)
-            final_result = event
+def get_report_graph(checkpointer=None):
+    """The report graph, compiled once against the shared checkpointer unless one is given."""
+    return get_compiled_graph("report", lambda saver: builder.compile(checkpointer=saver), checkpointer)
 
-        return final_result
+def get_section_graph(checkpointer=None):
+    """The section subgraph, compiled once against the shared checkpointer unless one is given."""
+    return get_compiled_graph("section", lambda saver: section_builder.compile(checkpointer=saver), checkpointer)
 
-async def get_completed_sections(config):
-    async with AsyncMongoDBSaver.from_conn_string(os.getenv("MONGODB_URI")) as checkpointer:
-        graph = builder.compile(checkpointer=checkpointer)
-        state = await graph.aget_state(config=config)
-        return state.values["sections"]
+async def run_deepdive(input, config, checkpointer=None, on_stream=None):
+    """Run or resume the report graph and return its final report, or the last update before an interrupt.
+
+    With on_stream, section writers stream their content and every
+    section_token/section_complete event is awaited through on_stream as it is
+    produced.
+    """
+    graph = get_report_graph(checkpointer)
+    if isinstance(input, dict) and "internal_documents" in input:
+        # Checkpoints and section payloads carry a reference instead of the documents
+        input = {**input, "internal_documents": await aput_blob(input["internal_documents"], config["configurable"].get("thread_id"))}
+    # Account every model call made by the run against its report
+    config = {**config, "callbacks": [*(config.get("callbacks") or []), usage_callback]}
+    stream_mode = "updates"
+    if on_stream is not None:
+        config["configurable"] = {**config["configurable"], "stream_sections": True}
+        stream_mode = ["updates", "custom"]
+    final_result = None
+    # Use streaming mode "updates" to capture intermediate events (including interrupts)
+    async for event in graph.astream(input, config, stream_mode=stream_mode):
+        if on_stream is not None:
+            mode, event = event
+            if mode == "custom":
+                await on_stream(event)
+                continue
+        logger.info(f"Graph event: {event}")
+        # If an interrupt event is present, you can capture its payload:
+        if "__interrupt__" in event:
+            interrupt_payload = event["__interrupt__"]
+            print("Interrupt encountered:", interrupt_payload)
+            # Optionally, you can decide to break or resume the graph using a Command.
+            # For now, we'll break out of the stream.
+            break
+        if "compile_final_report" in event:
+            event = event["compile_final_report"]["final_report"]
+        # Optionally, if the event represents a final result, store it.
+        # (The final event may include a key like "final_result" or simply be the last state.)
+        final_result = event
+
+    return final_result
+
+async def get_completed_sections(config, checkpointer=None):
+    graph = get_report_graph(checkpointer)
+    state = await graph.aget_state(config=config)
+    return state.values["sections"]
         
-async def run_section_builder(input, config):
-    async with AsyncMongoDBSaver.from_conn_string(os.getenv("MONGODB_URI")) as checkpointer:
-        graph = section_builder.compile(checkpointer=checkpointer)
-        result = await graph.ainvoke(input, config)
-        return result
\ No newline at end of file
+async def run_section_builder(input, config, checkpointer=None):
+    graph = get_section_graph(checkpointer)
+    result = await graph.ainvoke(input, config)
+    return result
@@ -0,0 +1,107 @@
+"""Non-blocking model calls routed through the model scheduler.
+
+Graph nodes run on the uvicorn worker's event loop, so a synchronous invoke()
+stalls every other request and serializes the sections fanned out with Send().
+ainvoke_llm awaits the model instead, under services.scheduler's per-model rate
+limits, adaptive concurrency (at most LLM_CONCURRENCY in flight, overridable per
+model with e.g. LLM_CONCURRENCY_GEMINI_2_0_PRO_EXP_02_05=4) and retries.
+"""
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from typing import Any, Callable, Sequence
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.messages import BaseMessage
+from langchain_core.tracers.context import register_configure_hook
+from services.llm_cache import bypass_llm_cache
+from services.scheduler import Priority, get_scheduler
+from report_writer.context import count_tokens
+
+# Output allowance added to the prompt size when reserving tokens per minute
+ESTIMATED_OUTPUT_TOKENS = 1024
+
+
+def estimate_tokens(messages: Sequence[BaseMessage]) -> int:
+    return sum(count_tokens(str(message.content)) for message in messages) + ESTIMATED_OUTPUT_TOKENS
+
+
+class TokenMeter(BaseCallbackHandler):
+    """Counts the billed tokens of the chat model calls made while it is metering.
+
+    tokens stays None when no call reported usage; cached answers count as zero.
+    """
+
+    run_inline = True
+
+    def __init__(self):
+        self.tokens: int | None = None
+
+    def on_llm_end(self, response, **kwargs):
+        for generations in response.generations:
+            for generation in generations:
+                message = getattr(generation, "message", None)
+                if getattr(message, "response_metadata", {}).get("from_cache"):
+                    self.tokens = self.tokens or 0
+                elif usage := getattr(message, "usage_metadata", None):
+                    self.tokens = (self.tokens or 0) + usage.get("input_tokens", 0) + usage.get("output_tokens", 0)
+
+
+_meter: ContextVar[TokenMeter | None] = ContextVar("llm_token_meter", default=None)
+register_configure_hook(_meter, inheritable=True)
+
+
+@contextmanager
+def metered(meter: TokenMeter):
+    """Attach meter to every chat model call made inside this block."""
+    token = _meter.set(meter)
+    try:
+        yield meter
+    finally:
+        _meter.reset(token)
+
+
+async def ainvoke_llm(llm, messages: Sequence[BaseMessage], schema=None, use_cache: bool = True, priority: Priority | None = None) -> Any:
+    """Await llm on messages, optionally with structured output, through the model's scheduler.
+
+    Pass use_cache=False to skip the LLM response cache for this call. priority
+    defaults to the one set by scheduling_priority.
+    """
+    runnable = llm.with_structured_output(schema) if schema is not None else llm
+    messages = list(messages)
+    meter = TokenMeter()
+
+    async def call():
+        meter.tokens = None
+        with metered(meter), nullcontext() if use_cache else bypass_llm_cache():
+            return await runnable.ainvoke(messages)
+
+    return await get_scheduler(llm.model).run(call, priority, estimate_tokens(messages), used_tokens=lambda: meter.tokens)
+
+
+async def astream_llm(llm, messages: Sequence[BaseMessage], on_delta: Callable[[str], Any], use_cache: bool = True, priority: Priority | None = None) -> Any:
+    """Stream llm's text answer on messages through the model's scheduler, passing each new piece of text to on_delta.
+
+    Structured output is not streamed: Gemini sends function-call arguments in
+    one piece, so callers stream plain text and extract structure with a
+    separate call. Cached and cassette answers are replayed as a stream by the
+    model. Returns the complete message, as ainvoke_llm would.
+
+    A failed attempt is retried only while nothing has been passed to on_delta;
+    once text has gone out, a retry would send it again, so the error is raised.
+    """
+    messages = list(messages)
+    emitted = False
+    meter = TokenMeter()
+
+    async def call():
+        nonlocal emitted
+        final = None
+        meter.tokens = None
+        with metered(meter), nullcontext() if use_cache else bypass_llm_cache():
+            async for chunk in llm.astream(messages):
+                final = chunk if final is None else final + chunk
+                if isinstance(chunk.content, str) and chunk.content:
+                    emitted = True
+                    on_delta(chunk.content)
+        return final
+
+    return await get_scheduler(llm.model).run(call, priority, estimate_tokens(messages), retryable=lambda: not emitted, used_tokens=lambda: meter.tokens)
@@ -2,7 +2,7 @@ from pydantic import BaseModel
 from typing import List, Any
 from report_writer.state import Section
 from typing import Literal
-from services.mongo import MongoDBConfig
+from services.mongo import get_async_database, get_database
 from bson.objectid import ObjectId
 import pytz
 from datetime import datetime
@@ -21,6 +21,7 @@ class DeepResearch(BaseModel):
     created_at: str = ""
     insights: List[str] = []
     type: str = ""    
+    usage: dict = {}
     # This will be excluded from serialization
     db: any = None
 
@@ -31,9 +32,13 @@ class DeepResearch(BaseModel):
 
     def __init__(self, **data):
         super().__init__(**data)
-        # Connect to database
-        db_config = MongoDBConfig()
-        self.db = db_config.connect()
+        # Use the process-wide connection pool
+        self.db = get_database()
+
+    @property
+    def adb(self):
+        """The database on the running event loop's async client, for the a-prefixed methods."""
+        return get_async_database()
 
     def create_report(self, user_id: str, project_id: str, topic: str):
         self.user_id = user_id
@@ -44,13 +49,15 @@ class DeepResearch(BaseModel):
         self.id = str(result.inserted_id)
         return self.id
 
-    def update_status(self, status: Literal["in_planning","in_progress", "completed"]):
+    def _status_fields(self, status: Literal["in_planning","in_progress", "completed"]) -> dict:
         self.status = status
         if status == "in_progress":
             self.created_at = datetime.now(pytz.utc).isoformat()
-            self.db["deep_research"].update_one({"_id": ObjectId(self.id)}, {"$set": {"status": status, "created_at": self.created_at}})
-        else:
-            self.db["deep_research"].update_one({"_id": ObjectId(self.id)}, {"$set": {"status": status}})
+            return {"status": status, "created_at": self.created_at}
+        return {"status": status}
+
+    def update_status(self, status: Literal["in_planning","in_progress", "completed"]):
+        self.db["deep_research"].update_one({"_id": ObjectId(self.id)}, {"$set": self._status_fields(status)})
         
     def update_report(self, report: str):
         self.report = report
@@ -93,6 +100,33 @@ class DeepResearch(BaseModel):
             }}
         )
 
+    def add_usage(self, usage: dict):
+        """Add a run's token, latency and call counters to the stored usage totals.
+
+        Args:
+            usage: Nested counters as returned by UsageTracker.pop. Counters are
+                incremented, so planning and research runs handled by different
+                workers add up in the same document.
+        """
+        increments = self._usage_increments(usage)
+        if increments:
+            self.db["deep_research"].update_one({"_id": ObjectId(self.id)}, {"$inc": increments})
+
+    @staticmethod
+    def _usage_increments(usage: dict) -> dict:
+        increments = {}
+
+        def flatten(prefix, value):
+            if isinstance(value, dict):
+                for key, item in value.items():
+                    # Mongo field names cannot contain dots or start with $
+                    flatten(f"{prefix}.{str(key).replace('.', '_').lstrip('$')}", item)
+            elif isinstance(value, (int, float)):
+                increments[prefix] = value
+
+        flatten("usage", usage)
+        return increments
+
     def update_plan(self, plan, description):
         """Update the plan for this research report.
         
@@ -100,6 +134,9 @@ class DeepResearch(BaseModel):
             plan: Can be either a list of Section objects or a list of dictionaries
                  representing serialized Section objects.
         """
+        self.db["deep_research"].update_one({"_id": ObjectId(self.id)}, {"$set": self._plan_fields(plan, description)})
+
+    def _plan_fields(self, plan, description) -> dict:
         self.plan = plan
         self.description = description
         # Ensure we're storing serializable data in MongoDB
@@ -109,8 +146,7 @@ class DeepResearch(BaseModel):
         else:
             # Convert Section objects to dictionaries
             plan_data = [section.model_dump() if hasattr(section, 'model_dump') else section for section in plan]
-            
-        self.db["deep_research"].update_one({"_id": ObjectId(self.id)}, {"$set": {"plan": plan_data, "description": description}})
+        return {"plan": plan_data, "description": description}
         
     def update_sources(self, sources: List[Any]):
         self.sources = sources
@@ -138,9 +174,8 @@ class DeepResearch(BaseModel):
         Returns:
             List[str]: A list of unique types found in the DeepResearch documents for the user
         """
-        # Initialize the database connection
-        db_config = MongoDBConfig()
-        db = db_config.connect()
+        # Use the process-wide connection pool
+        db = get_database()
         
         # Query the database to find all distinct types for the given user_id
         # The distinct method returns a list of unique values for the specified field
@@ -148,5 +183,71 @@ class DeepResearch(BaseModel):
         
         # Return the list of unique types
         return unique_types
-        
-        
\ No newline at end of file
+
+    # Async variants for request handlers. They go through the running event loop's
+    # AsyncMongoClient, so database round-trips do not block other requests.
+
+    async def acreate_report(self, user_id: str, project_id: str, topic: str):
+        self.user_id = user_id
+        self.project_id = project_id
+        self.topic = topic
+        result = await self.adb["deep_research"].insert_one(self.model_dump(exclude={"db"}))
+        self.id = str(result.inserted_id)
+        return self.id
+
+    async def aupdate_status(self, status: Literal["in_planning","in_progress", "completed"]):
+        await self.adb["deep_research"].update_one({"_id": ObjectId(self.id)}, {"$set": self._status_fields(status)})
+
+    async def aupdate_report(self, report: str):
+        self.report = report
+        await self.adb["deep_research"].update_one({"_id": ObjectId(self.id)}, {"$set": {"report": report}})
+
+    async def aupdate_metadata(self, metadata: ReportMetadata):
+        self.insights = metadata.insights
+        self.type = metadata.type
+        await self.adb["deep_research"].update_one({"_id": ObjectId(self.id)}, {"$set": {"insights": self.insights, "type": self.type}})
+
+    async def aupdate_report_completion(self, report: str, sources: List[Any], metadata: ReportMetadata, status: Literal["in_planning","in_progress", "completed"] = "completed"):
+        self.report = report
+        self.sources = sources
+        self.insights = metadata.insights
+        self.type = metadata.type
+        self.status = status
+        await self.adb["deep_research"].update_one(
+            {"_id": ObjectId(self.id)},
+            {"$set": {
+                "report": report,
+                "sources": sources,
+                "insights": self.insights,
+                "type": self.type,
+                "status": status
+            }}
+        )
+
+    async def aadd_usage(self, usage: dict):
+        increments = self._usage_increments(usage)
+        if increments:
+            await self.adb["deep_research"].update_one({"_id": ObjectId(self.id)}, {"$inc": increments})
+
+    async def aupdate_plan(self, plan, description):
+        await self.adb["deep_research"].update_one({"_id": ObjectId(self.id)}, {"$set": self._plan_fields(plan, description)})
+
+    async def aupdate_sources(self, sources: List[Any]):
+        self.sources = sources
+        await self.adb["deep_research"].update_one({"_id": ObjectId(self.id)}, {"$set": {"sources": sources}})
+
+    async def adelete(self):
+        await self.adb["deep_research"].delete_one({"_id": ObjectId(self.id)})
+
+    async def aload_report_by_id(self, report_id: str):
+        report = await self.adb["deep_research"].find_one({"_id": ObjectId(report_id)})
+        if not report:
+            raise ValueError(f"Report with id {report_id} not found")
+        loaded = DeepResearch(**report)
+        loaded.id = str(report["_id"])
+        return loaded
+
+    @staticmethod
+    async def aget_unique_types_by_user_id(user_id: str):
+        """Async variant of get_unique_types_by_user_id."""
+        return await get_async_database()["deep_research"].distinct("type", {"user_id": user_id})
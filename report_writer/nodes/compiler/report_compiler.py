@@ -4,10 +4,15 @@ Report compilation nodes for combining sections and generating the final report.
 from typing import Dict, List
 from langgraph.constants import Send
 from langgraph.types import Command
+from langgraph.config import get_stream_writer
+from langchain_core.runnables import RunnableConfig
 
 from report_writer.state import ReportState, SectionState, SectionOutputState
 from report_writer.state import Section
 from report_writer import report_writer_llm
+from report_writer.llm import ainvoke_llm, astream_llm
+from report_writer.usage import track_section
+from services.blob_store import aput_blob, aresolve_blob
 from langchain_core.messages import HumanMessage, SystemMessage
 from report_writer.nodes.compiler.prompt import final_section_writer_instructions
 from logger import cortex_logger as logger
@@ -31,7 +36,7 @@ def format_sections(sections: list[Section]) -> str:
     """
     return formatted_str
 
-def gather_completed_sections(state: ReportState):
+async def gather_completed_sections(state: ReportState, config: RunnableConfig):
     """Format completed sections as context for writing final sections.
     
     This node takes all completed research sections and formats them into
@@ -50,7 +55,8 @@ def gather_completed_sections(state: ReportState):
     # Format completed section to str to use as context for final sections
     completed_report_sections = format_sections(completed_sections)
 
-    return {"report_sections_from_research": completed_report_sections}
+    # Stored out of line, since every final section's Send payload carries it
+    return {"report_sections_from_research": await aput_blob(completed_report_sections, config["configurable"].get("thread_id"))}
 
 def initiate_final_section_writing(state: ReportState):
     """Create parallel tasks for writing non-research sections.
@@ -72,11 +78,12 @@ def initiate_final_section_writing(state: ReportState):
         if not s.research and not s.internal_search
     ]
 
-async def write_final_sections(state: SectionState):
+@track_section
+async def write_final_sections(state: SectionState, config: RunnableConfig):
     """Write sections that don't require research using completed sections as context."""
     topic = state["topic"]
     section = state["section"]
-    context = state.get("report_sections_from_research", "")
+    context = await aresolve_blob(state.get("report_sections_from_research", ""))
     
     system_instructions = final_section_writer_instructions.format(
         topic=topic,
@@ -85,10 +92,20 @@ async def write_final_sections(state: SectionState):
         context=context
     )
     
-    section_content = report_writer_llm.invoke([
+    messages = [
         SystemMessage(content=system_instructions),
         HumanMessage(content="Generate a report section based on the provided sources.")
-    ])
+    ]
+    if config["configurable"].get("stream_sections"):
+        stream_writer = get_stream_writer()
+        section_content = await astream_llm(
+            report_writer_llm,
+            messages,
+            lambda delta: stream_writer({"event": "section_token", "section": section.name, "iteration": 0, "content": delta})
+        )
+        stream_writer({"event": "section_complete", "section": section.name})
+    else:
+        section_content = await ainvoke_llm(report_writer_llm, messages)
     section.content = section_content.content
     return {"completed_sections": [section]}
 
@@ -4,12 +4,14 @@ Report planning nodes for generating and managing report structure.
 from typing import Literal
 from langchain_core.messages import HumanMessage, SystemMessage
 from langchain_core.runnables import RunnableConfig
-from langgraph.constants import Send
 from langgraph.types import interrupt, Command
 from report_writer import planner_llm, planner_query_writer, gemini_flash
 
 from report_writer.state import ReportState, Sections, Queries, HybridQueries
-from report_writer.utils import perform_internal_knowledge_search, perform_web_search
+from report_writer.utils import perform_internal_knowledge_search, perform_web_search_async
+from report_writer.llm import ainvoke_llm
+from services.blob_store import aput_blob, aresolve_blob
+from services.scheduler import Priority, with_priority
 from .prompt import (
     report_planner_query_writer_instructions_only_web_search,
     report_planner_instructions_only_web_search,
@@ -23,28 +25,29 @@ from .prompt import (
 from logger import runner_logger as logger
 
 
-async def retrieve_query_responses(query_list, mode, user_id, project_id):
+async def retrieve_query_responses(query_list, mode, user_id, project_id, report_id=None):
     """Retrieve responses for the given search queries."""
     if mode == "hybrid_rag": 
         internal_query_list = [query.search_query for query in query_list.internal_search_queries]
         web_query_list = [query.search_query for query in query_list.web_search_queries]
         if len(internal_query_list) > 0:
-            internal_search_results = await perform_internal_knowledge_search(internal_query_list, user_id, project_id)
+            internal_search_results = await perform_internal_knowledge_search(internal_query_list, user_id, project_id, report_id)
         else:
             internal_search_results = "No new internal search queries generated"
         if len(web_query_list) > 0:
-            web_search_results, _ = perform_web_search(web_query_list)
+            web_search_results, _ = await perform_web_search_async(web_query_list, report_id=report_id)
         else:
             web_search_results = "No new web search queries generated"
         return {"internal_search_results": internal_search_results, "web_search_results": web_search_results}
     else:
         query_list = [query.search_query for query in query_list.queries]
         if len(query_list) > 0:
-            search_results , _ = perform_web_search(query_list)
+            search_results , _ = await perform_web_search_async(query_list, report_id=report_id)
         else:
             search_results = "No new web search queries generated"
         return {"web_search_results": search_results}
 
+@with_priority(Priority.INTERACTIVE)
 async def generate_report_plan(state: ReportState, config: RunnableConfig):
     """Generate the initial report plan with sections."""
     topic = state["topic"]
@@ -62,15 +65,15 @@ async def generate_report_plan(state: ReportState, config: RunnableConfig):
         report_structure = str(report_structure)
 
     if mode == "hybrid_rag":
-        structured_llm = gemini_flash.with_structured_output(HybridQueries)
+        query_schema = HybridQueries
         system_instructions_query = report_planner_query_writer_instructions_hybrid_rag.format(
             topic=topic, 
             report_organization=report_structure, 
             number_of_queries=number_of_queries,
-            internal_documents=state["internal_documents"]
+            internal_documents=await aresolve_blob(state["internal_documents"])
         )
     else:
-        structured_llm = gemini_flash.with_structured_output(Queries)
+        query_schema = Queries
         system_instructions_query = report_planner_query_writer_instructions_only_web_search.format(
             topic=topic, 
             report_organization=report_structure, 
@@ -78,12 +81,12 @@ async def generate_report_plan(state: ReportState, config: RunnableConfig):
         )
 
     logger.info("Calling structured llm for query generation")
-    results = structured_llm.invoke([
+    results = await ainvoke_llm(gemini_flash, [
         SystemMessage(content=system_instructions_query),
         HumanMessage(content="Generate search queries that will help with planning the sections of the report.")
-    ])
+    ], schema=query_schema)
     logger.info(f"Generated search queries: {results}")
-    query_results = await retrieve_query_responses(results, mode, user, project_id)
+    query_results = await retrieve_query_responses(results, mode, user, project_id, config["configurable"].get("thread_id"))
     
 
     if mode == "hybrid_rag":
@@ -106,18 +109,18 @@ async def generate_report_plan(state: ReportState, config: RunnableConfig):
     planner_message = """Generate the sections of the report. Your response must include a 'sections' field containing a list of sections. 
                         Each section must have: name, description, research, internal_search, and content fields."""
 
-    structured_llm = planner_llm.with_structured_output(Sections)
-    report_sections = structured_llm.invoke([
+    report_sections = await ainvoke_llm(planner_llm, [
         SystemMessage(content=system_instructions_sections),
         HumanMessage(content=planner_message)
-    ])
+    ], schema=Sections)
     logger.info(f"Generated report sections: {report_sections}")
     if mode != "hybrid_rag":
         for section in report_sections.sections:
             section.internal_search = False
 
-    return {"sections": report_sections.sections, "plan_context": source_str, "description": report_sections.description}
+    return {"sections": report_sections.sections, "plan_context": await aput_blob(source_str, config["configurable"].get("thread_id")), "description": report_sections.description}
 
+@with_priority(Priority.INTERACTIVE)
 async def rewrite_report_plan(state: ReportState, config: RunnableConfig): 
     topic = state["topic"]
     sections = state['sections']
@@ -125,7 +128,7 @@ async def rewrite_report_plan(state: ReportState, config: RunnableConfig):
     feedback = state["feedback_on_report_plan"]
     user_id = config["configurable"]["user_id"]
     project_id = config["configurable"]["project_id"]
-    plan_context = state["plan_context"]
+    plan_context = await aresolve_blob(state["plan_context"])
     sections_str = "\n\n".join(
         f"Section: {section.name}\n"
         f"Description: {section.description}\n"
@@ -135,17 +138,17 @@ async def rewrite_report_plan(state: ReportState, config: RunnableConfig):
     )
 
     if mode == "hybrid_rag":
-        structured_llm = planner_query_writer.with_structured_output(HybridQueries)
+        query_schema = HybridQueries
         system_instructions_query = report_planner_query_writer_instructions_hybrid_rag_feedback.format(
             topic=topic, 
             report_organization=config["configurable"]["report_structure"], 
             number_of_queries=config["configurable"]["number_of_queries"],
-            internal_documents=state["internal_documents"],
+            internal_documents=await aresolve_blob(state["internal_documents"]),
             sections=sections_str,
             feedback=feedback
         )
     else:
-        structured_llm = planner_query_writer.with_structured_output(Queries)
+        query_schema = Queries
         system_instructions_query = report_planner_query_writer_instructions_only_web_search_feedback.format(
             topic=topic, 
             report_organization=config["configurable"]["report_structure"], 
@@ -154,19 +157,18 @@ async def rewrite_report_plan(state: ReportState, config: RunnableConfig):
             feedback=feedback
         )
 
-    results = structured_llm.invoke([
+    results = await ainvoke_llm(planner_query_writer, [
         SystemMessage(content=system_instructions_query),
         HumanMessage(content="Regenerate search queries that will help with planning the sections of the report based on the feedback. Only generate queries if needed. Do not generate queries that cover the same topics as the current report plan. Do not generate unnecessary queries or duplicates.")
-    ])
+    ], schema=query_schema)
     logger.info(f"Generated search queries after feedback: {results}")
-    query_results = await retrieve_query_responses(results, mode, user_id, project_id)
+    query_results = await retrieve_query_responses(results, mode, user_id, project_id, config["configurable"].get("thread_id"))
 
     if mode == "hybrid_rag":
         source_str = query_results["internal_search_results"] +"\n\n"+ query_results["web_search_results"]
     else:
         source_str = query_results["web_search_results"]
 
-    structured_llm = planner_llm.with_structured_output(Sections)
     system_instructions = rewrite_report_plan_instructions.format(
             topic=topic,
             report_organization=config["configurable"]["report_structure"],
@@ -175,16 +177,15 @@ async def rewrite_report_plan(state: ReportState, config: RunnableConfig):
             feedback=feedback,
             new_context=source_str
         )
-    report_sections = structured_llm.invoke([
+    report_sections = await ainvoke_llm(planner_llm, [
         SystemMessage(content=system_instructions),
         HumanMessage(content="Rewrite the report plan based on the feedback.")
-    ])
+    ], schema=Sections)
 
     return {"sections": report_sections.sections, "description": report_sections.description}
 
-def human_feedback(state: ReportState) -> Command[Literal["rewrite_report_plan", "build_section_with_research"]]:
+def human_feedback(state: ReportState) -> Command[Literal["rewrite_report_plan", "prepare_section_research"]]:
     """Get human feedback on the report plan and route to next steps."""
-    topic = state["topic"]
     sections = state['sections']
 
     interrupt_message = sections
@@ -193,11 +194,7 @@ def human_feedback(state: ReportState) -> Command[Literal["rewrite_report_plan",
     logger.info(f"Human feedback response: {feedback}")
 
     if isinstance(feedback, bool) and feedback is True:
-        return Command(goto=[
-            Send("build_section_with_research", {"topic": topic, "section": s, "internal_documents": state["internal_documents"], "search_iterations": 0}) 
-            for s in sections 
-            if s.research or s.internal_search
-        ])
+        return Command(goto="prepare_section_research")
     elif isinstance(feedback, str):
         return Command(goto="rewrite_report_plan", update={"feedback_on_report_plan": feedback})
     else:
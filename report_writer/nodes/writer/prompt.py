@@ -68,6 +68,51 @@ Call the Queries tool
 </Format>
 """
 
+query_writer_instructions_hybrid="""
+Roles:
+Act as a PhD-level scientist, demonstrating rigorous analytical thinking, precision, and thoroughness in your approach. 
+Your queries should reflect deep academic insight, mastery of foundational principles, and meticulous attention to detail. 
+Ensure your approach is methodical and scholarly, designed to uncover nuanced insights, verify assumptions, and uphold 
+academic standards of research quality.
+
+You are an expert technical writer crafting targeted search queries that will gather comprehensive information for writing a technical report section.
+You write two sets of queries: internal search queries run against the internal documents, and web search queries run on the internet.
+
+<Report topic>
+{topic}
+</Report topic>
+
+<Section topic> 
+{section_topic}
+</Section topic>
+
+<Internal documents>
+{internal_documents}
+</Internal documents>
+
+<Task>
+Your goal is to generate {number_of_queries} internal search queries and {number_of_queries} web search queries that will help gather comprehensive information above the section topic.
+
+The internal search queries should:
+
+1. Refer to the internal documents for relevant context
+2. Be related to the topic 
+3. Examine different aspects of the topic
+
+The web search queries should:
+
+1. Be related to the topic 
+2. Examine different aspects of the topic
+3. Look for information the internal documents are unlikely to contain
+
+Do not generate unnecessary queries or duplicates. Make the queries specific enough to find high-quality, relevant sources.
+</Task>
+
+<Format>
+Call the HybridQueries tool 
+</Format>
+"""
+
 section_writer_instructions = """
 Roles:
 Act as a PhD-level scientist, demonstrating rigorous analytical thinking, precision, and thoroughness in your approach. 
@@ -116,6 +161,35 @@ Write one section of a research report.
 </Final Check>
 """
 
+section_writer_stream_format = """
+<Format>
+Output only the section content in Markdown, starting with the ## section title.
+Cite sources by their index numbers in the text as per Citation Rules, but do not add a source list; sources are collected separately.
+</Format>
+"""
+
+section_sources_instructions = """
+List the sources cited in a report section.
+
+<Section content>
+{section}
+</Section content>
+
+<Task>
+1. Find every citation index number used in the section content.
+2. For each index, identify the source material it refers to among the Online and Internal source material provided by the user.
+3. Return one source per index, in index order, following these rules:
+- Include a document name whenever provided eg. AMZN-Q4-2024-Earnings-Release.pdf, internal or simply internal when not provided as the source title when citing internal documents from internal sources
+- add confidence scores on your own for internal sources and as given for external sources
+- add not more than 3 sources titles for a single source, and always include internal as one of the labels if it is present in the internal sources
+- keep segment_text to a short excerpt of the section content the source supports
+</Task>
+
+<Format>
+Call the SectionSources tool
+</Format>
+"""
+
 section_grader_instructions = """
 Roles:
 Act as a PhD-level scientist, demonstrating rigorous analytical thinking, precision, and thoroughness in your approach. 
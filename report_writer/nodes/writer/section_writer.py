@@ -1,41 +1,64 @@
 """
 Section writing nodes for generating and managing individual report sections.
 """
+import asyncio
+from typing import Literal
 from langchain_core.messages import HumanMessage, SystemMessage
 from langchain_core.runnables import RunnableConfig
+from langgraph.constants import Send
 from langgraph.types import Command
+from langgraph.config import get_stream_writer
 from report_writer import planner_query_writer, gemini_pro
-from report_writer.state import SectionState, Queries, Feedback, SectionWriter
+from report_writer.state import ReportState, SectionState, Queries, HybridQueries, Feedback, SectionWriter, SectionSources
 from report_writer.graph import END
-from report_writer.utils import perform_web_search, perform_internal_knowledge_search
+from report_writer.utils import perform_web_search_async, perform_internal_knowledge_search
+from report_writer.dedup import deduplicate_report_queries, DEFAULT_DEDUP_THRESHOLD
+from report_writer.context import pack_section_context, DEFAULT_SECTION_CONTEXT_TOKEN_BUDGET
+from report_writer.llm import ainvoke_llm, astream_llm
+from report_writer.usage import track_section
+from services.blob_store import aput_blob, aresolve_blob
+from services.document_index import aselect_internal_documents
 from .prompt import (
     query_writer_instructions_internal,
     query_writer_instructions_web,
+    query_writer_instructions_hybrid,
     section_writer_instructions,
+    section_writer_stream_format,
+    section_sources_instructions,
     section_grader_instructions,
     section_writer_inputs
 )
 from logger import runner_logger as logger
 
+DEFAULT_WEB_SEARCH_TIMEOUT = 120
+DEFAULT_INTERNAL_SEARCH_TIMEOUT = 120
+
+@track_section
 async def perform_research(state: SectionState, config: RunnableConfig):
     search_iterations = state["search_iterations"]
     user_id = config["configurable"]["user_id"]
     project_id = config["configurable"]["project_id"]
+    report_id = config["configurable"].get("thread_id")
+    web_search_timeout = config["configurable"].get("web_search_timeout", DEFAULT_WEB_SEARCH_TIMEOUT)
+    internal_search_timeout = config["configurable"].get("internal_search_timeout", DEFAULT_INTERNAL_SEARCH_TIMEOUT)
     
     logger.info(f"Performing research for section: {state['section'].name}")
     logger.info(f"Search queries: {state['search_queries']}")
     logger.info(f"Internal search queries: {state['internal_search_queries']}")
     
-    # Initialize variables before conditional blocks
-    search_response = ""
-    internal_search_response = ""
     error_messages = []
-    search_sources = []
-    
-    # Perform web search if queries exist
-    if "search_queries" in state and len(state["search_queries"]) > 0:
+
+    async def web_research():
+        # Perform web search if queries exist
+        if not state.get("search_queries"):
+            return "", []
         try:
-            search_response, search_sources = perform_web_search(state["search_queries"])           
+            search_response, search_sources = await asyncio.wait_for(
+                perform_web_search_async(
+                    state["search_queries"], config["configurable"].get("web_search_concurrency"), report_id
+                ),
+                web_search_timeout
+            )
             # Check if the search response indicates an error
             if search_response and (search_response.startswith("Error:") or 
                                 search_response.startswith("An error occurred")):
@@ -44,16 +67,23 @@ async def perform_research(state: SectionState, config: RunnableConfig):
                 error_messages.append(error_message)
                 # Provide a fallback message for the section writer
                 search_response = "Web search could not be completed. Please rely on internal knowledge or proceed with limited information."
+            return search_response, search_sources
         except Exception as e:
-            error_message = f"Exception during web search: {str(e)}"
+            reason = f"timed out after {web_search_timeout}s" if isinstance(e, asyncio.TimeoutError) else str(e)
+            error_message = f"Exception during web search: {reason}"
             logger.error(error_message)
             error_messages.append(error_message)
-            search_response = "Web search encountered an error. Please proceed with available information."
-    
-    # Perform internal search if queries exist
-    if "internal_search_queries" in state and len(state["internal_search_queries"]) > 0:
+            return "Web search encountered an error. Please proceed with available information.", []
+
+    async def internal_research():
+        # Perform internal search if queries exist
+        if not state.get("internal_search_queries"):
+            return ""
         try:
-            internal_search_response = await perform_internal_knowledge_search(state["internal_search_queries"], user_id, project_id)
+            internal_search_response = await asyncio.wait_for(
+                perform_internal_knowledge_search(state["internal_search_queries"], user_id, project_id, report_id),
+                internal_search_timeout
+            )
             
             # Check if internal search response is empty or indicates an error
             if not internal_search_response or (isinstance(internal_search_response, str) and 
@@ -63,11 +93,16 @@ async def perform_research(state: SectionState, config: RunnableConfig):
                 logger.warning(error_message)
                 error_messages.append(error_message)
                 internal_search_response = "Internal knowledge search could not be completed. Please rely on web search or proceed with limited information."
+            return internal_search_response
         except Exception as e:
-            error_message = f"Exception during internal search: {str(e)}"
+            reason = f"timed out after {internal_search_timeout}s" if isinstance(e, asyncio.TimeoutError) else str(e)
+            error_message = f"Exception during internal search: {reason}"
             logger.error(error_message)
             error_messages.append(error_message)
-            internal_search_response = "Internal knowledge search encountered an error. Please proceed with available information."
+            return "Internal knowledge search encountered an error. Please proceed with available information."
+
+    # Web and internal retrieval are independent; the section waits for the slower of the two
+    (search_response, search_sources), internal_search_response = await asyncio.gather(web_research(), internal_research())
     
     # If both searches failed, add a note to the section content
     if error_messages and not search_response and not internal_search_response:
@@ -76,70 +111,154 @@ async def perform_research(state: SectionState, config: RunnableConfig):
             section.content = ""
         section.content += "\n\nNote: Research for this section encountered technical difficulties. The content is based on limited information."
         
+    # Results are kept out of line; state and checkpoints hold only their references
     return {
-        "search_results": search_response,
-        "internal_search_results": internal_search_response,
+        "search_results": await aput_blob(search_response, report_id),
+        "internal_search_results": await aput_blob(internal_search_response, report_id),
         "search_iterations": search_iterations + 1,
         "search_sources": search_sources
     }
     
+async def section_internal_documents(state: SectionState, config: RunnableConfig) -> str:
+    """The user's documents most relevant to this section, or the report's selection when per-section selection is off."""
+    user_id = config["configurable"].get("user_id")
+    if user_id and config["configurable"].get("select_internal_documents", True):
+        section = state["section"]
+        try:
+            return await aselect_internal_documents(
+                user_id,
+                f"{state['topic']} {section.name} {section.description}",
+                config["configurable"].get("internal_documents_token_budget"),
+                config["configurable"].get("internal_documents_top_k"),
+            )
+        except Exception as e:
+            logger.warning(f"Per-section document selection failed, using the report's documents: {str(e)}")
+    return await aresolve_blob(state["internal_documents"])
+
+@track_section
 async def generate_queries(state: SectionState, config: RunnableConfig):
-    """Generate search queries for researching a specific section."""
+    """Generate search queries for researching a specific section.
+
+    A section that needs both internal and web search gets both lists from one
+    HybridQueries call, unless hybrid_query_generation is disabled.
+    """
     topic = state["topic"]
     section = state["section"]
     number_of_queries = config["configurable"]["number_of_queries"]
-    search_queries = []
-    internal_search_queries = []
-    structured_llm = planner_query_writer.with_structured_output(Queries)
-    if section.internal_search:
-        system_instructions = query_writer_instructions_internal.format(
+    internal_documents = await section_internal_documents(state, config) if section.internal_search else None
+
+    if section.internal_search and section.research and config["configurable"].get("hybrid_query_generation", True):
+        results = await ainvoke_llm(planner_query_writer, [
+            SystemMessage(content=query_writer_instructions_hybrid.format(
+                topic=topic,
+                section_topic=section.name,
+                internal_documents=internal_documents,
+                number_of_queries=number_of_queries
+            )),
+            HumanMessage(content="Generate internal and web search queries for this section.")
+        ], schema=HybridQueries)
+        return {
+            "search_queries": [query.search_query for query in results.web_search_queries],
+            "internal_search_queries": [query.search_query for query in results.internal_search_queries],
+        }
+
+    async def write_queries(system_instructions):
+        results = await ainvoke_llm(planner_query_writer, [
+            SystemMessage(content=system_instructions),
+            HumanMessage(content="Generate search queries for this section.")
+        ], schema=Queries)
+        return [query.search_query for query in results.queries]
+
+    async def no_queries():
+        return []
+
+    # The internal and web query prompts are independent, so write both at once
+    internal_search_queries, search_queries = await asyncio.gather(
+        write_queries(query_writer_instructions_internal.format(
             topic=topic,
             section_topic=section.name,
-            internal_documents=state["internal_documents"],
+            internal_documents=internal_documents,
             number_of_queries=number_of_queries
-        )
-        results = structured_llm.invoke([
-        SystemMessage(content=system_instructions),
-        HumanMessage(content="Generate search queries for this section.")
-    ])
-        internal_search_queries = [query.search_query for query in results.queries]
-    
-    if section.research:
-        system_instructions = query_writer_instructions_web.format(
+        )) if section.internal_search else no_queries(),
+        write_queries(query_writer_instructions_web.format(
             topic=topic,
             section_topic=section.name,
             number_of_queries=number_of_queries
-        )
-        results = structured_llm.invoke([
-            SystemMessage(content=system_instructions),
-            HumanMessage(content="Generate search queries for this section.")
-        ])
-        search_queries = [query.search_query for query in results.queries]
+        )) if section.research else no_queries(),
+    )
 
     return {"search_queries": search_queries, "internal_search_queries": internal_search_queries}
 
-def search_web(state: SectionState):
+async def prepare_section_research(state: ReportState, config: RunnableConfig) -> Command[Literal["build_section_with_research"]]:
+    """Generate every research section's queries up front and deduplicate them report-wide.
+
+    Sections then start straight at perform_research with their rewritten queries.
+    Internal searches are coalesced per query and kept for the report, so a
+    representative shared by several sections is searched once whenever they
+    run. With dedup_queries disabled, sections are sent as before and generate their own.
+    """
+    topic = state["topic"]
+    sections = [s for s in state["sections"] if s.research or s.internal_search]
+    section_inputs = [
+        {"topic": topic, "section": s, "internal_documents": state["internal_documents"], "search_iterations": 0}
+        for s in sections
+    ]
+    if config["configurable"].get("dedup_queries", True) and sections:
+        generated = await asyncio.gather(*(generate_queries(section_input, config) for section_input in section_inputs))
+        section_queries = {str(index): queries for index, queries in enumerate(generated)}
+        try:
+            section_queries = await deduplicate_report_queries(
+                section_queries,
+                threshold=config["configurable"].get("query_dedup_threshold", DEFAULT_DEDUP_THRESHOLD)
+            )
+        except Exception as e:
+            logger.warning(f"Query deduplication failed, using per-section queries: {str(e)}")
+        for index, section_input in enumerate(section_inputs):
+            section_input.update(section_queries[str(index)])
+
+    return Command(goto=[Send("build_section_with_research", section_input) for section_input in section_inputs])
+
+def route_section_start(state: SectionState) -> Literal["generate_queries", "perform_research"]:
+    """Skip query generation for sections whose queries were prepared report-wide."""
+    if state.get("search_queries") or state.get("internal_search_queries"):
+        return "perform_research"
+    return "generate_queries"
+
+@track_section
+async def search_web(state: SectionState, config: RunnableConfig):
     """Execute web searches for the section queries."""
     queries = state["search_queries"]
     search_iterations = state["search_iterations"]
     queries = [query.search_query for query in queries]
-    search_results, search_sources = perform_web_search(queries)
+    search_results, search_sources = await perform_web_search_async(
+        queries, config["configurable"].get("web_search_concurrency"), config["configurable"].get("thread_id")
+    )
     return {
-        "search_results": search_results,
+        "search_results": await aput_blob(search_results, config["configurable"].get("thread_id")),
         "search_iterations": search_iterations + 1,
         "search_sources": search_sources
     }
 
+@track_section
 async def write_section(state: SectionState, config: RunnableConfig):
     """Write a section of the report and evaluate if more research is needed."""
     topic = state["topic"]
     section = state["section"]
-    search_results = state["search_results"]
+    search_results = await aresolve_blob(state["search_results"])
     search_sources = state["search_sources"]
-    internal_search_results = state["internal_search_results"]
+    internal_search_results = await aresolve_blob(state["internal_search_results"])
     search_iterations = state["search_iterations"]
     max_search_iterations = config["configurable"]["max_search_iterations"]
     max_follow_up_queries = config["configurable"]["max_follow_up_queries"]
+    token_budget = config["configurable"].get("section_context_token_budget", DEFAULT_SECTION_CONTEXT_TOKEN_BUDGET)
+
+    # Keep only the most relevant research that fits the prompt budget
+    search_results, internal_search_results = pack_section_context(
+        search_results,
+        internal_search_results,
+        f"{section.name} {section.description}",
+        token_budget
+    )
 
     section_writer_inputs_formatted = section_writer_inputs.format(topic=topic, 
                                                              section_name=section.name, 
@@ -148,12 +267,49 @@ async def write_section(state: SectionState, config: RunnableConfig):
                                                              internal_context=internal_search_results, 
                                                              section_content=section.content)
     
+    section_grader_message = ("Grade the report and consider follow-up questions for missing information. "
+                              "If the grade is 'pass', return empty strings for all follow-up queries. "
+                              "If the grade is 'fail', provide specific search queries to gather missing information.")
+
+    async def grade(section_to_grade):
+        grader_instructions = section_grader_instructions.format(
+            topic=topic,
+            section_topic=section.description,
+            section=section_to_grade,
+            number_of_follow_up_queries=max_follow_up_queries
+        )
+        return await ainvoke_llm(planner_query_writer, [
+            SystemMessage(content=grader_instructions),
+            HumanMessage(content=section_grader_message)
+        ], schema=Feedback)
+
     system_instructions = section_writer_instructions
-    section_writer = gemini_pro.with_structured_output(SectionWriter)
-    section_content = section_writer.invoke([
-        SystemMessage(content=system_instructions),
-        HumanMessage(content=section_writer_inputs_formatted)
-    ])
+    if config["configurable"].get("stream_sections"):
+        # Gemini returns structured output in one piece, so the text is streamed
+        # plainly and its sources are listed by a separate call, alongside grading.
+        # Each search iteration streams a fresh draft of the section.
+        stream_writer = get_stream_writer()
+        draft = await astream_llm(
+            gemini_pro,
+            [SystemMessage(content=system_instructions + section_writer_stream_format), HumanMessage(content=section_writer_inputs_formatted)],
+            lambda delta: stream_writer({"event": "section_token", "section": section.name, "iteration": search_iterations, "content": delta})
+        )
+        content = draft.content if isinstance(draft.content, str) else ""
+        section_sources, feedback = await asyncio.gather(
+            ainvoke_llm(planner_query_writer, [
+                SystemMessage(content=section_sources_instructions.format(section=content)),
+                HumanMessage(content=section_writer_inputs_formatted)
+            ], schema=SectionSources),
+            grade(content)
+        )
+        section_content = SectionWriter(content=content, sources=section_sources.sources)
+    else:
+        writer_messages = [
+            SystemMessage(content=system_instructions),
+            HumanMessage(content=section_writer_inputs_formatted)
+        ]
+        section_content = await ainvoke_llm(gemini_pro, writer_messages, schema=SectionWriter)
+        feedback = None
 
     section.content = section_content.content
     sources = [s.model_dump() for s in section_content.sources]
@@ -172,24 +328,13 @@ async def write_section(state: SectionState, config: RunnableConfig):
     
     section.sources = sources
 
-    section_grader_message = ("Grade the report and consider follow-up questions for missing information. "
-                              "If the grade is 'pass', return empty strings for all follow-up queries. "
-                              "If the grade is 'fail', provide specific search queries to gather missing information.")
-    
-    grader_instructions = section_grader_instructions.format(
-        topic=topic,
-        section_topic=section.description,
-        section=section_content,
-        number_of_follow_up_queries=max_follow_up_queries
-    )
-    model = planner_query_writer.with_structured_output(Feedback)
-    feedback = model.invoke([
-        SystemMessage(content=grader_instructions),
-        HumanMessage(content=section_grader_message)
-    ])
+    if feedback is None:
+        feedback = await grade(section_content)
 
     # If the section is passing or the max search depth is reached, publish the section to completed sections 
     if feedback.grade == "pass" or search_iterations >= max_search_iterations:
+        if config["configurable"].get("stream_sections"):
+            get_stream_writer()({"event": "section_complete", "section": section.name})
         # Publish the section to completed sections 
         return  Command(
         update={"completed_sections": [section]},
@@ -1,7 +1,12 @@
-from google import genai
-from google.genai.types import Tool, GenerateContentConfig, GoogleSearch
+import asyncio
 import os
+import time
 from logger import runner_logger as logger
+from report_writer.search_cache import get_search_cache
+from report_writer.clients import get_genai_client, get_google_search_tool
+from services.cassette import cassette
+from services.scheduler import get_blocking_scheduler, get_scheduler
+from report_writer.usage import record_search
 
 def generate_final_string(mapped_grounding_supports):
     final_lines = ["##Sources##\n"]
@@ -21,11 +26,107 @@ def generate_final_string(mapped_grounding_supports):
     
     return "\n".join(final_lines)
 
-def google_search(query , with_sources=True, prompt=None):
+DEFAULT_SEARCH_INSTRUCTIONS = " ## Search Instructions## Give the most relevant information first. Do a thorough search and provide all the information you can find. Always answer in English."
+SEARCH_MODEL_ID = "gemini-2.0-flash"
+# Grounded searches run on their own API key, so they are scheduled apart from the chat models
+SEARCH_SCHEDULER_NAME = f"search-{SEARCH_MODEL_ID}"
+NO_RESULTS_MESSAGES = (
+    "No search results found. Please try a different query.",
+    "Search response has no content. Please try a different query.",
+    "Search response content is empty. Please try a different query.",
+    "No text content found in search results. Please try a different query.",
+)
+
+def build_search_query(query, prompt=None):
     if prompt:
-        query = query + " " + prompt
+        return query + " " + prompt
+    return query + DEFAULT_SEARCH_INSTRUCTIONS
+
+def process_search_response(response, with_sources=True):
+    """Turn a grounded Gemini response into the google_search return shape.
+
+    Returns a (text, sources) tuple when with_sources is set, the plain text otherwise,
+    or an explanatory string when the response carries no usable content.
+    """
+    final_response = ""
+    # Check if response has candidates
+    if not response or not hasattr(response, 'candidates') or not response.candidates:
+        logger.warning("Google search response has no candidates")
+        return NO_RESULTS_MESSAGES[0]
+        
+    # Check if the first candidate has content
+    if not hasattr(response.candidates[0], 'content') or not response.candidates[0].content:
+        logger.warning("Google search response candidate has no content")
+        return NO_RESULTS_MESSAGES[1]
+        
+    # Check if content has parts
+    if not hasattr(response.candidates[0].content, 'parts') or not response.candidates[0].content.parts:
+        logger.warning("Google search response content has no parts")
+        return NO_RESULTS_MESSAGES[2]
+    
+    # Process all parts of the response
+    for each in response.candidates[0].content.parts:
+        if hasattr(each, 'text') and each.text:
+            final_response += each.text
+    
+    if with_sources:
+        sources = []
+        candidate = response.candidates[0]
+
+        mapped_grounding_supports = []
+
+        if hasattr(candidate, "grounding_metadata") and candidate.grounding_metadata:
+            # Extract sources from grounding chunks
+            for chunk in candidate.grounding_metadata.grounding_chunks or []:
+                if hasattr(chunk, "web") and chunk.web:
+                    sources.append({
+                        "title": chunk.web.title,
+                        "uri": chunk.web.uri
+                    })
+
+        if hasattr(candidate, "grounding_metadata") and candidate.grounding_metadata:
+            chunks = candidate.grounding_metadata.grounding_chunks or []
+            for support in candidate.grounding_metadata.grounding_supports or []:
+                support_mapping = {
+                    "confidence_scores": support.confidence_scores,
+                    "segment_text": support.segment.text,
+                    "sources": []
+                }
+                # Map each grounding support to corresponding chunk(s) using the indices
+                for index in support.grounding_chunk_indices:
+                    if index < len(chunks) and hasattr(chunks[index], "web") and chunks[index].web:
+                        support_mapping["sources"].append({
+                            "title": chunks[index].web.title,
+                            "uri": chunks[index].web.uri
+                        })
+                mapped_grounding_supports.append(support_mapping)
+    
+        grounding_metadata_string = generate_final_string(mapped_grounding_supports)
+
+        if not final_response:
+            logger.warning("No text content found in Google search response parts")
+            return NO_RESULTS_MESSAGES[3]
+        result = final_response + "\n\n" + grounding_metadata_string
+        return (result, sources)
     else:
-        query = query + " ## Search Instructions## Give the most relevant information first. Do a thorough search and provide all the information you can find. Always answer in English."
+        return final_response
+
+def is_cacheable_result(result, with_sources=True):
+    """Only genuine search answers are cached; error and no-result strings are not."""
+    if with_sources:
+        return isinstance(result, tuple)
+    return isinstance(result, str) and bool(result) and result not in NO_RESULTS_MESSAGES
+
+@cassette("google_search")
+def google_search(query , with_sources=True, prompt=None):
+    cache = get_search_cache()
+    if cache:
+        cached = cache.get(query, prompt, with_sources)
+        if cached is not None:
+            record_search("web", SEARCH_MODEL_ID, 0.0, cached=True)
+            return cached
+    original_query = query
+    query = build_search_query(query, prompt)
     try:
         # Initialize the client
         api_key = os.getenv("GOOGLE_API_KEY")
@@ -33,92 +134,90 @@ def google_search(query , with_sources=True, prompt=None):
             logger.error("Google API key not found in environment variables")
             return "Error: Google API key not configured properly."
             
-        client = genai.Client(api_key=api_key)
-        
-        # Set the model ID
-        model_id = "gemini-2.0-flash"
+        # Reuse the process-wide client and search tool
+        from google.genai.types import GenerateContentConfig
+        client = get_genai_client(api_key)
+        google_search_tool = get_google_search_tool()
         
-        # Create the Google Search tool
-        google_search_tool = Tool(
-            google_search=GoogleSearch()
+        # Generate content using the model, under the same limits as google_search_async
+        started = time.perf_counter()
+        response = get_blocking_scheduler(SEARCH_SCHEDULER_NAME).run(
+            lambda: client.models.generate_content(
+                model=SEARCH_MODEL_ID,
+                contents=query,
+                config=GenerateContentConfig(
+                    tools=[google_search_tool],
+                    response_modalities=["TEXT"],
+                )
+            ),
+            estimated_tokens=len(query) // 4 + 2048,
         )
-        
-        # Generate content using the model
-        response = client.models.generate_content(
-            model=model_id,
-            contents=query,
-            config=GenerateContentConfig(
-                tools=[google_search_tool],
-                response_modalities=["TEXT"],
-            )
+        latency = time.perf_counter() - started
+        usage = getattr(response, "usage_metadata", None)
+        record_search(
+            "web", SEARCH_MODEL_ID, latency,
+            getattr(usage, "prompt_token_count", None) or 0,
+            getattr(usage, "candidates_token_count", None) or 0,
         )
-        
-        # Process the response content with proper error handling
-        final_response = ""
-        # Check if response has candidates
-        if not response or not hasattr(response, 'candidates') or not response.candidates:
-            logger.warning("Google search response has no candidates")
-            return "No search results found. Please try a different query."
-            
-        # Check if the first candidate has content
-        if not hasattr(response.candidates[0], 'content') or not response.candidates[0].content:
-            logger.warning("Google search response candidate has no content")
-            return "Search response has no content. Please try a different query."
-            
-        # Check if content has parts
-        if not hasattr(response.candidates[0].content, 'parts') or not response.candidates[0].content.parts:
-            logger.warning("Google search response content has no parts")
-            return "Search response content is empty. Please try a different query."
-        
-        # Process all parts of the response
-        for each in response.candidates[0].content.parts:
-            if hasattr(each, 'text'):
-                final_response += each.text
-        
-        if with_sources:
-            sources = []
-            candidate = response.candidates[0]
-
-            mapped_grounding_supports = []
-            candidate = response.candidates[0]
-
-            if hasattr(candidate, "grounding_metadata") and candidate.grounding_metadata:
-                # Extract sources from grounding chunks
-                for chunk in candidate.grounding_metadata.grounding_chunks:
-                    if hasattr(chunk, "web") and chunk.web:
-                        sources.append({
-                            "title": chunk.web.title,
-                            "uri": chunk.web.uri
-                        })
-
-            if hasattr(candidate, "grounding_metadata") and candidate.grounding_metadata:
-                chunks = candidate.grounding_metadata.grounding_chunks
-                for support in candidate.grounding_metadata.grounding_supports:
-                    support_mapping = {
-                        "confidence_scores": support.confidence_scores,
-                        "segment_text": support.segment.text,
-                        "sources": []
-                    }
-                    # Map each grounding support to corresponding chunk(s) using the indices
-                    for index in support.grounding_chunk_indices:
-                        if index < len(chunks) and hasattr(chunks[index], "web") and chunks[index].web:
-                            support_mapping["sources"].append({
-                                "title": chunks[index].web.title,
-                                "uri": chunks[index].web.uri
-                            })
-                    mapped_grounding_supports.append(support_mapping)
-        
-            print("mapped_grounding_supports")
-            grounding_metadata_string = generate_final_string(mapped_grounding_supports)
-
-            if not final_response:
-                logger.warning("No text content found in Google search response parts")
-                return "No text content found in search results. Please try a different query."
-            result = final_response + "\n\n" + grounding_metadata_string
-            return (result, sources)
-        else:
-            return final_response
+        result = process_search_response(response, with_sources)
+        if cache and is_cacheable_result(result, with_sources):
+            cache.set(original_query, result, prompt, with_sources, latency=latency)
+        return result
         
     except Exception as e:
         logger.error(f"Error in google_search: {str(e)}")
         return f"An error occurred during the search: {str(e)}. Please try again later."
+
+@cassette("google_search")
+async def google_search_async(query, with_sources=True, prompt=None):
+    """Async counterpart of google_search built on the google-genai aio client.
+
+    Returns exactly what google_search would for the same arguments, without
+    blocking the event loop while Gemini runs the grounded search.
+    """
+    cache = get_search_cache()
+    if cache:
+        # SQLite calls block, so they run off the event loop
+        cached = await asyncio.to_thread(cache.get, query, prompt, with_sources)
+        if cached is not None:
+            record_search("web", SEARCH_MODEL_ID, 0.0, cached=True)
+            return cached
+    original_query = query
+    query = build_search_query(query, prompt)
+    try:
+        api_key = os.getenv("GOOGLE_API_KEY")
+        if not api_key:
+            logger.error("Google API key not found in environment variables")
+            return "Error: Google API key not configured properly."
+
+        from google.genai.types import GenerateContentConfig
+        client = get_genai_client(api_key)
+        google_search_tool = get_google_search_tool()
+
+        started = time.perf_counter()
+        response = await get_scheduler(SEARCH_SCHEDULER_NAME).run(
+            lambda: client.aio.models.generate_content(
+                model=SEARCH_MODEL_ID,
+                contents=query,
+                config=GenerateContentConfig(
+                    tools=[google_search_tool],
+                    response_modalities=["TEXT"],
+                )
+            ),
+            estimated_tokens=len(query) // 4 + 2048,
+        )
+        latency = time.perf_counter() - started
+        usage = getattr(response, "usage_metadata", None)
+        record_search(
+            "web", SEARCH_MODEL_ID, latency,
+            getattr(usage, "prompt_token_count", None) or 0,
+            getattr(usage, "candidates_token_count", None) or 0,
+        )
+        result = process_search_response(response, with_sources)
+        if cache and is_cacheable_result(result, with_sources):
+            await asyncio.to_thread(cache.set, original_query, result, prompt, with_sources, latency)
+        return result
+
+    except Exception as e:
+        logger.error(f"Error in google_search_async: {str(e)}")
+        return f"An error occurred during the search: {str(e)}. Please try again later."
@@ -0,0 +1,204 @@
+"""Disk-backed result cache for grounded Google searches.
+
+Entries are keyed by the normalized query, the prompt suffix and the with_sources
+flag, expire after a TTL and are evicted least-recently-used once the cache grows
+past its size bound.
+
+The file lives in the user's cache directory ($XDG_CACHE_HOME, else ~/.cache)
+unless SEARCH_CACHE_PATH says otherwise, and is shared by every worker process, so it is opened in WAL mode with a
+busy timeout (SEARCH_CACHE_BUSY_TIMEOUT_SECONDS). The cache is best effort: a
+SQLite error is logged and treated as a miss or a skipped store, never as a
+failed search, and a cache that cannot be opened stays off for the process.
+"""
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from logger import runner_logger as logger
+
+CACHE_DIR = os.path.join(os.getenv("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"), "report_writer")
+DEFAULT_CACHE_PATH = os.path.join(CACHE_DIR, "search_cache.sqlite3")
+DEFAULT_TTL_SECONDS = 24 * 60 * 60
+DEFAULT_MAX_ENTRIES = 5000
+DEFAULT_BUSY_TIMEOUT_SECONDS = 5.0
+
+
+def normalize_query(query: str) -> str:
+    """Lower-case a query and collapse its whitespace so trivial variants share a key."""
+    return re.sub(r"\s+", " ", query or "").strip().lower()
+
+
+def make_cache_key(query: str, prompt: str | None, with_sources: bool) -> str:
+    payload = json.dumps([normalize_query(query), prompt or "", bool(with_sources)])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class SearchCache:
+    """SQLite store for search results with a per-entry TTL and an LRU size bound.
+
+    Each entry keeps the response text, the structured grounding sources (when the
+    search was run with sources) and the latency of the original call, so the hit
+    counters can report how much search time the cache has saved.
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, ttl_seconds: float = DEFAULT_TTL_SECONDS, max_entries: int = DEFAULT_MAX_ENTRIES, busy_timeout: float = DEFAULT_BUSY_TIMEOUT_SECONDS):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "expired": 0, "stores": 0, "evictions": 0, "saved_seconds": 0.0, "errors": 0}
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=busy_timeout, check_same_thread=False)
+        if path != ":memory:":
+            # Readers no longer wait on the writer, and writers only wait on each other
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS search_cache (
+                key TEXT PRIMARY KEY,
+                query TEXT NOT NULL,
+                text TEXT NOT NULL,
+                sources TEXT,
+                latency REAL NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS search_cache_last_access ON search_cache (last_access)")
+        self._conn.commit()
+
+    def get(self, query: str, prompt: str | None = None, with_sources: bool = True):
+        """Return the cached google_search result for these arguments, or None on a miss or error."""
+        try:
+            return self._get(query, prompt, with_sources)
+        except sqlite3.Error as e:
+            self._failed("lookup", e)
+            return None
+
+    def set(self, query: str, result, prompt: str | None = None, with_sources: bool = True, latency: float = 0.0):
+        """Store a successful google_search result: a (text, sources) tuple or plain text.
+
+        A store that fails is logged and skipped.
+        """
+        try:
+            self._set(query, result, prompt, with_sources, latency)
+        except sqlite3.Error as e:
+            self._failed("store", e)
+
+    def _failed(self, operation: str, error: sqlite3.Error):
+        with self._lock:
+            self._stats["errors"] += 1
+            if self._conn.in_transaction:
+                self._conn.rollback()
+        logger.warning(f"Search cache {operation} failed, continuing without the cache: {str(error)}")
+
+    def _get(self, query: str, prompt: str | None, with_sources: bool):
+        key = make_cache_key(query, prompt, with_sources)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT text, sources, latency, created_at FROM search_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self._stats["misses"] += 1
+                return None
+            text, sources, latency, created_at = row
+            if self.ttl_seconds and now - created_at > self.ttl_seconds:
+                self._conn.execute("DELETE FROM search_cache WHERE key = ?", (key,))
+                self._conn.commit()
+                self._stats["expired"] += 1
+                self._stats["misses"] += 1
+                return None
+            self._conn.execute("UPDATE search_cache SET last_access = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self._stats["hits"] += 1
+            self._stats["saved_seconds"] += latency
+        if sources is None:
+            return text
+        return (text, json.loads(sources))
+
+    def _set(self, query: str, result, prompt: str | None, with_sources: bool, latency: float):
+        if isinstance(result, tuple):
+            text, sources = result
+            sources = json.dumps(sources)
+        else:
+            text, sources = result, None
+        key = make_cache_key(query, prompt, with_sources)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO search_cache (key, query, text, sources, latency, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, normalize_query(query), text, sources, latency, now, now),
+            )
+            self._stats["stores"] += 1
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        if not self.max_entries:
+            return
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM search_cache").fetchone()
+        overflow = count - self.max_entries
+        if overflow > 0:
+            self._conn.execute(
+                "DELETE FROM search_cache WHERE key IN (SELECT key FROM search_cache ORDER BY last_access ASC LIMIT ?)",
+                (overflow,),
+            )
+            self._stats["evictions"] += overflow
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM search_cache")
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        """Hit/miss counters since process start, plus the current entry count and hit rate."""
+        with self._lock:
+            stats = dict(self._stats)
+            try:
+                (stats["entries"],) = self._conn.execute("SELECT COUNT(*) FROM search_cache").fetchone()
+            except sqlite3.Error:
+                stats["entries"] = None
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+
+_search_cache = None
+_search_cache_failed = False
+_search_cache_lock = threading.Lock()
+
+
+def get_search_cache() -> SearchCache | None:
+    """Return the process-wide search cache, or None when SEARCH_CACHE_ENABLED is off or it cannot be opened."""
+    global _search_cache, _search_cache_failed
+    if _search_cache_failed or os.getenv("SEARCH_CACHE_ENABLED", "true").lower() not in ("1", "true", "yes"):
+        return None
+    if _search_cache is None:
+        with _search_cache_lock:
+            if _search_cache is None and not _search_cache_failed:
+                path = os.getenv("SEARCH_CACHE_PATH", DEFAULT_CACHE_PATH)
+                try:
+                    _search_cache = SearchCache(
+                        path=path,
+                        ttl_seconds=float(os.getenv("SEARCH_CACHE_TTL_SECONDS", DEFAULT_TTL_SECONDS)),
+                        max_entries=int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES)),
+                        busy_timeout=float(os.getenv("SEARCH_CACHE_BUSY_TIMEOUT_SECONDS", DEFAULT_BUSY_TIMEOUT_SECONDS)),
+                    )
+                except (sqlite3.Error, OSError) as e:
+                    # Remembered, so searches do not retry the open and log again
+                    _search_cache_failed = True
+                    logger.warning(f"Search cache could not be opened at {path}, searching without it: {str(e)}")
+                    return None
+                logger.info(f"Search cache opened at {_search_cache.path}")
+    return _search_cache
+
+
+def get_search_cache_stats() -> dict:
+    cache = get_search_cache()
+    return cache.stats() if cache else {}
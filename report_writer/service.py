@@ -6,6 +6,7 @@ from logger import cortex_logger as logger
 from typing import Dict, List, Any, AsyncGenerator
 from report_writer import gemini_pro
 from pydantic import BaseModel
+from services.cassette import cassette
 
 PROMPT = """
 Roles:
@@ -35,6 +36,7 @@ def generate_report_metadata(report: str, categories: list[str]) -> ReportMetada
     response = model.invoke(prompt)
     return response
 
+@cassette("docservice")
 async def retrieve_subqueries(queries: list[str], user_id: str, project_id: str) -> AsyncGenerator[Dict[str, Any], None]:
     url = f"{os.getenv('DOCSERVICE_BASE_URL')}/query"
     data = {
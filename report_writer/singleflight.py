@@ -0,0 +1,140 @@
+"""Single-flight coalescing of identical in-flight async calls.
+
+Sections fanned out with Send() run on the same event loop and often ask for the
+same search at the same moment. The first caller for a key starts the work; every
+caller that arrives while it is still running awaits the same task instead of
+issuing a duplicate request.
+"""
+import asyncio
+import re
+import threading
+from collections import defaultdict
+from typing import Any, Awaitable, Callable, Hashable, Sequence
+from services.loop_local import LoopLocal
+
+TRAILING_PUNCTUATION = ".,;:!? "
+
+
+def flight_key(query: str) -> str:
+    """Normalize a query so phrasings differing only in case, spacing or trailing punctuation share a flight.
+
+    Symbols inside the query are kept, so "C++ market share" and "C# market share" stay apart.
+    """
+    query = re.sub(r"\s+", " ", (query or "").lower()).strip()
+    return query.rstrip(TRAILING_PUNCTUATION).rstrip()
+
+
+class SingleFlight:
+    """Coalesces concurrent calls that share a key and counts how many were saved per report."""
+
+    def __init__(self):
+        # Tasks belong to one loop; scripts that call asyncio.run repeatedly get separate flights
+        self._inflight: LoopLocal[dict[Hashable, asyncio.Future]] = LoopLocal()
+        self._coalesced: dict[str, dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self._settled: dict[str, dict[Hashable, Any]] = {}
+        self._lock = threading.Lock()
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]], report_id: str | None = None, kind: str = "call") -> Any:
+        """Await fn() once for all concurrent callers that pass the same key.
+
+        The shared task is shielded, so a cancelled caller never cancels the work
+        other callers are waiting on. Exceptions propagate to every waiter.
+        """
+        inflight = self._inflight.get(dict)
+        task = inflight.get(key)
+        if task is not None and not task.done():
+            with self._lock:
+                self._coalesced[report_id or ""][kind] += 1
+            return await asyncio.shield(task)
+
+        task = asyncio.ensure_future(fn())
+        self._register(inflight, key, task)
+        return await asyncio.shield(task)
+
+    async def do_many(self, keys: Sequence[Hashable], fn: Callable[[list], Awaitable[dict]], report_id: str | None = None, kind: str = "call") -> list:
+        """Await one result per key, joining any flight already running for that key.
+
+        The keys nobody is fetching are fetched together by a single fn(missing_keys)
+        call, which returns a dict from key to result (keys it leaves out resolve to
+        None). Each of those keys becomes a flight of its own, so a later caller
+        sharing only some keys still joins them. Results come back in key order.
+
+        Results are also kept for report_id until pop_coalesced(report_id), so a
+        section of the same report that asks after the flight has finished reuses
+        them instead of fetching again.
+        """
+        loop = asyncio.get_running_loop()
+        inflight = self._inflight.get(dict)
+        futures: dict[Hashable, asyncio.Future] = {}
+        missing = []
+        with self._lock:
+            settled = dict(self._settled.get(report_id, {})) if report_id else {}
+        for key in dict.fromkeys(keys):
+            if key in settled:
+                with self._lock:
+                    self._coalesced[report_id][kind] += 1
+                futures[key] = loop.create_future()
+                futures[key].set_result(settled[key])
+                continue
+            task = inflight.get(key)
+            if task is not None and not task.done():
+                with self._lock:
+                    self._coalesced[report_id or ""][kind] += 1
+                futures[key] = task
+            else:
+                missing.append(key)
+
+        if missing:
+            batch = asyncio.ensure_future(fn(missing))
+            for key in missing:
+                futures[key] = loop.create_future()
+                self._register(inflight, key, futures[key])
+
+            def _settle(done_batch, missing=missing):
+                for key in missing:
+                    future = futures[key]
+                    if future.done():
+                        continue
+                    if done_batch.cancelled():
+                        future.cancel()
+                    elif done_batch.exception() is not None:
+                        future.set_exception(done_batch.exception())
+                    else:
+                        future.set_result(done_batch.result().get(key))
+
+            batch.add_done_callback(_settle)
+        results = list(await asyncio.shield(asyncio.gather(*(futures[key] for key in keys))))
+        if report_id:
+            with self._lock:
+                self._settled.setdefault(report_id, {}).update(zip(keys, results))
+        return results
+
+    def _register(self, inflight: dict, key: Hashable, task: asyncio.Future):
+        inflight[key] = task
+
+        def _forget(done_task, key=key):
+            if inflight.get(key) is done_task:
+                del inflight[key]
+            if not done_task.cancelled():
+                # Mark the exception as retrieved when no caller is left to await it
+                done_task.exception()
+
+        task.add_done_callback(_forget)
+
+    def coalesced(self, report_id: str | None = None) -> dict[str, int]:
+        """Number of calls served by another caller's flight for report_id, by kind and in total."""
+        with self._lock:
+            counts = dict(self._coalesced.get(report_id or "", {}))
+        counts["total"] = sum(counts.values())
+        return counts
+
+    def pop_coalesced(self, report_id: str | None = None) -> dict[str, int]:
+        """Return report_id's counts and forget them along with the results kept for it."""
+        counts = self.coalesced(report_id)
+        with self._lock:
+            self._coalesced.pop(report_id or "", None)
+            self._settled.pop(report_id, None)
+        return counts
+
+
+search_flights = SingleFlight()
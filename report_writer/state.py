@@ -133,5 +133,10 @@ class SectionWriter(BaseModel):
         ..., description="List of sources used in this section, populated incrementally as the content is generated."
     )
 
+class SectionSources(BaseModel):
+    sources: List[Source] = Field(
+        ..., description="List of sources cited in this section, one per citation number used in the content."
+    )
+
 class SectionOutputState(TypedDict):
     completed_sections: list[Section] # Final key we duplicate in outer state for Send() API
\ No newline at end of file
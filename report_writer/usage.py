@@ -0,0 +1,148 @@
+"""Token, latency and call accounting for report generation.
+
+LLM calls are captured by usage_callback, which run_deepdive attaches to the
+graph config. Search calls are recorded where they are made. Every record is
+attributed to:
+- the report (the graph's thread_id);
+- the graph node (langgraph_node);
+- the section being researched or written (set by @track_section).
+
+Records are aggregated per report, per node, per section and per model, and the
+totals are persisted into the report's deep_research document.
+"""
+import threading
+import time
+from collections import defaultdict
+from contextvars import ContextVar
+from functools import wraps
+from typing import Any, Dict
+from uuid import UUID
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.runnables.config import var_child_runnable_config
+
+_section: ContextVar[str | None] = ContextVar("usage_section", default=None)
+
+COUNTERS = ("calls", "cached_calls", "input_tokens", "output_tokens", "latency_seconds")
+
+
+def _counters() -> Dict[str, float]:
+    return dict.fromkeys(COUNTERS, 0)
+
+
+def track_section(func):
+    """Attribute usage inside an async section node to state["section"]."""
+    @wraps(func)
+    async def wrapper(state, *args, **kwargs):
+        token = _section.set(state["section"].name)
+        try:
+            return await func(state, *args, **kwargs)
+        finally:
+            _section.reset(token)
+    return wrapper
+
+
+def current_graph_context() -> tuple[str | None, str | None]:
+    """(report_id, node) of the graph node running in this context, if any."""
+    config = var_child_runnable_config.get() or {}
+    metadata = config.get("metadata", {})
+    report_id = metadata.get("thread_id") or config.get("configurable", {}).get("thread_id")
+    return report_id, metadata.get("langgraph_node")
+
+
+class UsageTracker:
+    """Process-wide usage aggregates keyed by report id."""
+
+    def __init__(self):
+        self._reports: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    def record(self, report_id: str | None, kind: str, model: str, node: str | None, section: str | None,
+               input_tokens: int = 0, output_tokens: int = 0, latency: float = 0.0, cached: bool = False):
+        if not report_id:
+            return
+        values = {
+            "calls": 0 if cached else 1,
+            "cached_calls": 1 if cached else 0,
+            "input_tokens": 0 if cached else input_tokens,
+            "output_tokens": 0 if cached else output_tokens,
+            "latency_seconds": latency,
+        }
+        with self._lock:
+            report = self._reports.setdefault(report_id, {
+                "total": _counters(),
+                "by_kind": defaultdict(_counters),
+                "by_node": defaultdict(_counters),
+                "by_section": defaultdict(_counters),
+                "by_model": defaultdict(_counters),
+            })
+            groups = [report["total"], report["by_kind"][kind], report["by_node"][node or "unknown"], report["by_model"][model]]
+            if section:
+                groups.append(report["by_section"][section])
+            for group in groups:
+                for name, value in values.items():
+                    group[name] += value
+
+    def get(self, report_id: str) -> dict:
+        with self._lock:
+            report = self._reports.get(report_id)
+            return _plain(report) if report else {}
+
+    def pop(self, report_id: str) -> dict:
+        """Return and forget report_id's usage since it was last popped."""
+        with self._lock:
+            report = self._reports.pop(report_id, None)
+            return _plain(report) if report else {}
+
+
+def _plain(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {key: _plain(item) for key, item in value.items()}
+    if isinstance(value, float):
+        return round(value, 4)
+    return value
+
+
+usage_tracker = UsageTracker()
+
+
+def record_search(kind: str, model: str, latency: float, input_tokens: int = 0, output_tokens: int = 0, cached: bool = False):
+    """Record a web or internal search made from the current graph node."""
+    report_id, node = current_graph_context()
+    usage_tracker.record(report_id, kind, model, node, _section.get(), input_tokens, output_tokens, latency, cached)
+
+
+class UsageCallbackHandler(BaseCallbackHandler):
+    """Records every chat model call made while a report graph runs."""
+
+    # Inline so the section context variable of the calling node is visible
+    run_inline = True
+
+    def __init__(self):
+        self._runs: Dict[UUID, tuple] = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, metadata=None, **kwargs):
+        metadata = metadata or {}
+        model = metadata.get("ls_model_name") or (kwargs.get("invocation_params") or {}).get("model", "unknown")
+        self._runs[run_id] = (time.perf_counter(), model, metadata.get("thread_id"), metadata.get("langgraph_node"), _section.get())
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        run = self._runs.pop(run_id, None)
+        if run is None:
+            return
+        started, model, report_id, node, section = run
+        input_tokens = output_tokens = 0
+        cached = False
+        for generations in response.generations:
+            for generation in generations:
+                message = getattr(generation, "message", None)
+                usage = getattr(message, "usage_metadata", None) or {}
+                input_tokens += usage.get("input_tokens", 0)
+                output_tokens += usage.get("output_tokens", 0)
+                cached = cached or bool(getattr(message, "response_metadata", {}).get("from_cache"))
+        usage_tracker.record(report_id, "llm", model, node, section, input_tokens, output_tokens, time.perf_counter() - started, cached)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._runs.pop(run_id, None)
+
+
+usage_callback = UsageCallbackHandler()
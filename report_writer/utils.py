@@ -1,22 +1,70 @@
+import asyncio
+import os
+import time
 from report_writer.service import retrieve_subqueries
-from report_writer.search import google_search
+from report_writer.search import google_search, google_search_async
+from report_writer.singleflight import search_flights, flight_key
+from report_writer.usage import record_search
 from logger import runner_logger as logger
 """Utility classes and functions for the report writer."""
 
-async def perform_internal_knowledge_search(queries, user_id: str, project_id: str): 
-    subquery_results = []
-    async for output in retrieve_subqueries(queries, user_id, project_id):
-        # Yield each piece of the response to stream downstream
-        subquery_results.append(output)
+DEFAULT_WEB_SEARCH_CONCURRENCY = 5
+
+async def perform_internal_knowledge_search(queries, user_id: str, project_id: str, report_id: str | None = None): 
+    """Query the document hub, coalescing each query with an identical one already in flight for this user.
+
+    The queries no other section is searching for go out together in one batched request.
+    """
+    queries_by_key = {}
+    for query in queries:
+        queries_by_key.setdefault(("internal", user_id, project_id, flight_key(query)), query)
+
+    async def retrieve(missing):
+        results = {key: [] for key in missing}
+        started = time.perf_counter()
+        async for output in retrieve_subqueries([queries_by_key[key] for key in missing], user_id, project_id):
+            key = ("internal", user_id, project_id, flight_key(output.get("query", "")))
+            # Output the service does not tie to one of the queries stays with the batch's first query
+            results.get(key, results[missing[0]]).append(output)
+        record_search("internal", "docservice", time.perf_counter() - started)
+        return results
+
+    responses = await search_flights.do_many(list(queries_by_key), retrieve, report_id, "internal")
+    subquery_results = [output for response in responses for output in response or []]
     reasoning_text = create_reasoning_text(subquery_results)
     return reasoning_text
 
 def perform_web_search(queries): 
+    search_results = [(query, google_search(query)) for query in queries]
+    return collect_web_search_results(search_results)
+
+async def perform_web_search_async(queries, max_concurrency: int | None = None, report_id: str | None = None):
+    """Run every query concurrently through google_search_async.
+
+    At most max_concurrency searches are in flight at once (WEB_SEARCH_CONCURRENCY
+    when not given). A query that another section is already searching for awaits
+    that search instead of starting its own, and is counted against report_id.
+    Returns the same (reasoning_text, unique_sources) pair as perform_web_search,
+    with results kept in query order.
+    """
+    if max_concurrency is None:
+        max_concurrency = int(os.getenv("WEB_SEARCH_CONCURRENCY", DEFAULT_WEB_SEARCH_CONCURRENCY))
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+    async def search(query):
+        async with semaphore:
+            return await google_search_async(query)
+
+    def coalesced_search(query):
+        return search_flights.do(("web", flight_key(query)), lambda: search(query), report_id, "web")
+
+    responses = await asyncio.gather(*(coalesced_search(query) for query in queries))
+    return collect_web_search_results(list(zip(queries, responses)))
+
+def collect_web_search_results(search_results):
     subquery_results = {}
     all_sources = []
-    for query in queries:
-        search_result = google_search(query)
-        
+    for query, search_result in search_results:
         # Handle different return types from google_search
         if isinstance(search_result, tuple) and len(search_result) == 2:
             # Normal case: (result, sources)
@@ -0,0 +1,172 @@
+"""Content-addressed storage for large graph state strings.
+
+Report graph state used to carry internal documents, search results and research
+context inline, so every checkpoint and every Send payload serialized the same
+megabytes again. Nodes now store such strings here and keep a compact reference
+(``blob:sha256:<digest>``) in state, resolving it only where the text is read.
+Identical content is stored once, so checkpoint size and write time no longer
+grow with research volume.
+
+Settings:
+- STATE_BLOB_STORE: ``mongo`` (default) keeps blobs in the state_blobs collection
+  of MONGODB_DATABASE_NAME. ``local`` keeps them under STATE_BLOB_DIR (default
+  .cache/blobs), for offline runs and benchmarks. ``off`` keeps every value inline.
+- STATE_BLOB_MIN_BYTES: smaller strings stay inline, since a reference would
+  save little.
+
+Each blob records the thread_ids (report graph threads) that stored it, so
+checkpoint retention can collect blobs thread by thread (see services.retention).
+
+Resolved blobs are kept in a small in-process cache, since sections of a report
+read the same documents. Values that are not references, such as those in
+checkpoints written before this change, resolve to themselves.
+"""
+import asyncio
+import datetime
+import hashlib
+import os
+import re
+from collections import OrderedDict
+from logger import runner_logger as logger
+
+DEFAULT_MIN_BYTES = 2048
+DEFAULT_BLOB_DIR = os.path.join(".cache", "blobs")
+RESOLVED_CACHE_SIZE = 64
+
+REF_PREFIX = "blob:sha256:"
+_REF = re.compile(r"blob:sha256:([0-9a-f]{64})")
+
+
+class MongoBlobBackend:
+    """Stores blobs as documents keyed by digest in the state_blobs collection."""
+
+    collection = "state_blobs"
+
+    async def put(self, digest: str, text: str, thread_id: str | None = None):
+        from services.mongo import get_async_database
+
+        now = datetime.datetime.now(datetime.timezone.utc)
+        # last_used_at (a BSON date) tells checkpoint retention that a blob is still being referenced
+        update = {"$setOnInsert": {"content": text, "size": len(text), "created_at": now}, "$set": {"last_used_at": now}}
+        if thread_id is not None:
+            update["$addToSet"] = {"thread_ids": thread_id}
+        await get_async_database()[self.collection].update_one({"_id": digest}, update, upsert=True)
+
+    async def get(self, digest: str) -> str | None:
+        from services.mongo import get_async_database
+
+        document = await get_async_database()[self.collection].find_one({"_id": digest}, {"content": 1})
+        return document["content"] if document else None
+
+
+class LocalBlobBackend:
+    """Stores blobs as files named by digest under a directory."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def _path(self, digest: str) -> str:
+        return os.path.join(self.directory, digest[:2], digest)
+
+    def _write(self, digest: str, text: str):
+        path = self._path(digest)
+        if os.path.exists(path):
+            os.utime(path)
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write then rename, so a concurrent reader never sees a partial blob
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(temporary, path)
+
+    def _read(self, digest: str) -> str | None:
+        try:
+            with open(self._path(digest), encoding="utf-8") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    async def put(self, digest: str, text: str, thread_id: str | None = None):
+        # Local blobs are for offline runs; retention only collects Mongo blobs
+        await asyncio.to_thread(self._write, digest, text)
+
+    async def get(self, digest: str) -> str | None:
+        return await asyncio.to_thread(self._read, digest)
+
+
+class BlobStore:
+    def __init__(self, backend, min_bytes: int):
+        self.backend = backend
+        self.min_bytes = min_bytes
+        self._resolved: OrderedDict[str, str] = OrderedDict()
+
+    def _remember(self, digest: str, text: str):
+        self._resolved[digest] = text
+        self._resolved.move_to_end(digest)
+        while len(self._resolved) > RESOLVED_CACHE_SIZE:
+            self._resolved.popitem(last=False)
+
+    async def put(self, text: str, thread_id: str | None = None) -> str:
+        """Store text for thread_id and return its reference, or text itself when it is small or not a string."""
+        if self.backend is None or not isinstance(text, str) or len(text) < self.min_bytes or is_blob_ref(text):
+            return text
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        # Always written through, since retention may have collected a blob this process still caches
+        await self.backend.put(digest, text, thread_id)
+        self._remember(digest, text)
+        return REF_PREFIX + digest
+
+    async def resolve(self, value):
+        """Return the text behind a reference; any other value is returned unchanged."""
+        match = _REF.fullmatch(value) if isinstance(value, str) else None
+        if match is None:
+            return value
+        digest = match.group(1)
+        text = self._resolved.get(digest)
+        if text is None:
+            if self.backend is None:
+                raise LookupError(f"Blob {digest} cannot be resolved with STATE_BLOB_STORE=off")
+            text = await self.backend.get(digest)
+            if text is None:
+                raise LookupError(f"Blob {digest} not found")
+            self._remember(digest, text)
+        else:
+            self._resolved.move_to_end(digest)
+        return text
+
+
+def is_blob_ref(value) -> bool:
+    return isinstance(value, str) and _REF.fullmatch(value) is not None
+
+
+_store: BlobStore | None = None
+
+
+def get_blob_store() -> BlobStore:
+    """Return the process-wide store, configured from the environment on first use."""
+    global _store
+    if _store is None:
+        mode = os.getenv("STATE_BLOB_STORE", "mongo").lower()
+        if mode == "off":
+            backend = None
+        elif mode == "local":
+            backend = LocalBlobBackend(os.getenv("STATE_BLOB_DIR", DEFAULT_BLOB_DIR))
+        else:
+            backend = MongoBlobBackend()
+        _store = BlobStore(backend, int(os.getenv("STATE_BLOB_MIN_BYTES", DEFAULT_MIN_BYTES)))
+        logger.info(f"State blob store: {mode}")
+    return _store
+
+
+async def aput_blob(text: str, thread_id: str | None = None) -> str:
+    """Store a large state string and return the reference to keep in state.
+
+    Pass the graph's thread_id so retention can collect the blob with its thread.
+    """
+    return await get_blob_store().put(text, thread_id)
+
+
+async def aresolve_blob(value):
+    """Resolve a state value that may be a blob reference."""
+    return await get_blob_store().resolve(value)
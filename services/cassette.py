@@ -0,0 +1,247 @@
+"""Record/replay cassettes for external calls.
+
+CASSETTE_MODE selects the behaviour:
+- ``off`` (default): calls go straight to the live service.
+- ``record``: calls go to the live service and every request/response pair is
+  written to CASSETTE_DIR.
+- ``replay``: recorded responses are served back without touching the network.
+  A request that was never recorded raises CassetteMissError.
+
+CASSETTE_REPLAY_LATENCY simulates latency on replay. Set it to ``recorded`` to
+sleep for the originally measured duration, or to a number of seconds to sleep a
+fixed amount. Leave it unset to return immediately.
+
+Model clients still need an API key value to be constructed in replay mode; any
+placeholder works.
+
+Cassettes are plain JSON, so a shared or checked-in cassette can only ever be
+data: LangChain messages and results are stored with dumpd, DataFrames with
+to_json, and tuples and timestamps in small tagged objects. Calls whose effect
+is a written file are not recorded, since replay could not reproduce it.
+"""
+import asyncio
+import hashlib
+import inspect
+import json
+import os
+import tempfile
+import datetime
+import time
+from io import StringIO
+from functools import wraps
+from typing import Any
+from langchain_core.load import dumpd, load
+from langchain_core.load.serializable import Serializable
+from langchain_core.messages import BaseMessage, messages_to_dict
+from langchain_core.outputs import ChatResult
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_CASSETTE_DIR = os.path.join(PROJECT_ROOT, "cassettes")
+
+
+class CassetteMissError(KeyError):
+    """Raised in replay mode when a request has no recorded response."""
+
+
+def get_cassette_mode() -> str:
+    mode = os.getenv("CASSETTE_MODE", "off").lower()
+    if mode not in ("off", "record", "replay"):
+        raise ValueError(f"CASSETTE_MODE must be one of off, record, replay; got {mode}")
+    return mode
+
+
+def _replay_delay(recorded_latency: float) -> float:
+    setting = os.getenv("CASSETTE_REPLAY_LATENCY", "").lower()
+    if not setting:
+        return 0.0
+    if setting == "recorded":
+        return recorded_latency
+    return float(setting)
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, BaseMessage):
+        return messages_to_dict([value])[0]
+    if hasattr(value, "model_dump"):
+        return value.model_dump(mode="json")
+    return str(value)
+
+
+def request_key(namespace: str, name: str, payload: Any) -> str:
+    serialized = json.dumps([namespace, name, payload], default=_default, sort_keys=True)
+    return hashlib.sha256(serialized.encode("utf-8")).hexdigest()
+
+
+# Marks values JSON has no type for: {TAG: kind, "value": ...}
+TAG = "__cassette__"
+
+
+def encode_response(value: Any) -> Any:
+    """Turn a recorded response into JSON-compatible data that decode_response restores."""
+    if value is None or isinstance(value, (str, bool, int, float)):
+        return value
+    if isinstance(value, list):
+        return [encode_response(item) for item in value]
+    if isinstance(value, tuple):
+        return {TAG: "tuple", "value": [encode_response(item) for item in value]}
+    if isinstance(value, dict):
+        if all(isinstance(key, str) for key in value) and TAG not in value:
+            return {key: encode_response(item) for key, item in value.items()}
+        return {TAG: "dict", "value": [[encode_response(key), encode_response(item)] for key, item in value.items()]}
+    if isinstance(value, Serializable):
+        return {TAG: "langchain", "value": dumpd(value)}
+    if isinstance(value, ChatResult):
+        return {TAG: "chat_result", "value": {"generations": dumpd(value.generations), "llm_output": encode_response(value.llm_output)}}
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        # Also covers pandas Timestamps
+        return {TAG: "datetime" if isinstance(value, datetime.datetime) else "date", "value": value.isoformat()}
+    module = type(value).__module__.split(".")[0]
+    if module == "pandas" and type(value).__name__ in ("DataFrame", "Series"):
+        # The table orient keeps dtypes and index time zones but needs string column labels
+        orient = "table" if type(value).__name__ == "DataFrame" and all(isinstance(c, str) for c in value.columns) else "split"
+        return {TAG: type(value).__name__, "orient": orient, "value": value.to_json(orient=orient, date_format="iso", date_unit="ns")}
+    if module == "numpy" and hasattr(value, "item"):
+        return value.item() if getattr(value, "ndim", 0) == 0 else value.tolist()
+    raise TypeError(f"Cannot record a {type(value).__name__} in a cassette")
+
+
+def decode_response(value: Any) -> Any:
+    if isinstance(value, list):
+        return [decode_response(item) for item in value]
+    if not isinstance(value, dict):
+        return value
+    kind = value.get(TAG)
+    if kind is None:
+        return {key: decode_response(item) for key, item in value.items()}
+    data = value["value"]
+    if kind == "tuple":
+        return tuple(decode_response(item) for item in data)
+    if kind == "dict":
+        return {decode_response(key): decode_response(item) for key, item in data}
+    if kind == "langchain":
+        return load(data)
+    if kind == "chat_result":
+        return ChatResult(generations=load(data["generations"]), llm_output=decode_response(data["llm_output"]))
+    if kind == "datetime":
+        return datetime.datetime.fromisoformat(data)
+    if kind == "date":
+        return datetime.date.fromisoformat(data)
+    if kind in ("DataFrame", "Series"):
+        import pandas as pd
+        return pd.read_json(StringIO(data), orient=value["orient"], typ="frame" if kind == "DataFrame" else "series")
+    raise ValueError(f"Unknown cassette value kind {kind}")
+
+
+class CassetteStore:
+    """One JSON file per recorded interaction, grouped by namespace."""
+
+    def __init__(self, directory: str | None = None):
+        self.directory = directory or os.getenv("CASSETTE_DIR", DEFAULT_CASSETTE_DIR)
+
+    def _path(self, namespace: str, key: str) -> str:
+        return os.path.join(self.directory, namespace, f"{key}.json")
+
+    def load(self, namespace: str, key: str) -> dict:
+        path = self._path(namespace, key)
+        if not os.path.exists(path):
+            raise CassetteMissError(f"No recorded response in {namespace} for key {key}")
+        with open(path, encoding="utf-8") as f:
+            record = json.load(f)
+        record["response"] = decode_response(record["response"])
+        return record
+
+    def save(self, namespace: str, key: str, name: str, request: Any, response: Any, latency: float):
+        path = self._path(namespace, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        record = {
+            "name": name,
+            "request": json.dumps(request, default=_default, sort_keys=True),
+            "response": encode_response(response),
+            "latency": latency,
+            "recorded_at": time.time(),
+        }
+        # Write to a temporary file first so concurrent readers never see a partial record
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(record, f)
+        os.replace(tmp_path, path)
+
+
+def _replay(store: CassetteStore, namespace: str, key: str) -> tuple[Any, float]:
+    record = store.load(namespace, key)
+    return record["response"], _replay_delay(record["latency"])
+
+
+def cassette(namespace: str):
+    """Decorator that records or replays a function's calls under namespace.
+
+    Works on plain functions, coroutine functions and async generator functions
+    (whose yielded items are recorded as a list). Arguments must be
+    JSON-serializable or have a stable str().
+    """
+    def decorator(func):
+        name = getattr(func, "__qualname__", func.__name__)
+
+        def key_for(args, kwargs):
+            request = {"args": list(args), "kwargs": kwargs}
+            return request, request_key(namespace, name, request)
+
+        if inspect.isasyncgenfunction(func):
+            @wraps(func)
+            async def async_gen_wrapper(*args, **kwargs):
+                mode = get_cassette_mode()
+                if mode == "off":
+                    async for item in func(*args, **kwargs):
+                        yield item
+                    return
+                store = CassetteStore()
+                request, key = key_for(args, kwargs)
+                if mode == "replay":
+                    items, delay = _replay(store, namespace, key)
+                    await asyncio.sleep(delay)
+                    for item in items:
+                        yield item
+                    return
+                started = time.perf_counter()
+                items = []
+                async for item in func(*args, **kwargs):
+                    items.append(item)
+                    yield item
+                store.save(namespace, key, name, request, items, time.perf_counter() - started)
+            return async_gen_wrapper
+
+        if inspect.iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                mode = get_cassette_mode()
+                if mode == "off":
+                    return await func(*args, **kwargs)
+                store = CassetteStore()
+                request, key = key_for(args, kwargs)
+                if mode == "replay":
+                    response, delay = _replay(store, namespace, key)
+                    await asyncio.sleep(delay)
+                    return response
+                started = time.perf_counter()
+                response = await func(*args, **kwargs)
+                store.save(namespace, key, name, request, response, time.perf_counter() - started)
+                return response
+            return async_wrapper
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            mode = get_cassette_mode()
+            if mode == "off":
+                return func(*args, **kwargs)
+            store = CassetteStore()
+            request, key = key_for(args, kwargs)
+            if mode == "replay":
+                response, delay = _replay(store, namespace, key)
+                time.sleep(delay)
+                return response
+            started = time.perf_counter()
+            response = func(*args, **kwargs)
+            store.save(namespace, key, name, request, response, time.perf_counter() - started)
+            return response
+        return wrapper
+    return decorator
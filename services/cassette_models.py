@@ -0,0 +1,167 @@
+"""Gemini chat and embedding models that record and replay through services.cassette.
+
+Kept apart from services.cassette so that modules which only need the cassette
+decorator do not import langchain_google_genai.
+"""
+import asyncio
+import json
+import re
+import time
+from typing import AsyncIterator, List, Optional
+from langchain_core.caches import BaseCache
+from langchain_core.load import dumps
+from langchain_core.messages import AIMessageChunk, BaseMessage, message_chunk_to_message, messages_to_dict
+from langchain_core.messages.tool import tool_call_chunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.runnables.config import run_in_executor
+from langchain_google_genai import ChatGoogleGenerativeAI, GoogleGenerativeAIEmbeddings
+from langchain_google_genai import chat_models as genai_chat_models
+from services.cassette import CassetteStore, _replay, cassette, get_cassette_mode, request_key
+from services.scheduler import in_scheduled_call
+
+# Roughly the size of the text chunks Gemini streams
+REPLAY_CHUNK_CHARS = 64
+_PIECE = re.compile(r"\s*\S+")
+
+
+def replay_chunks(generation: ChatGeneration) -> List[ChatGenerationChunk]:
+    """Split a complete generation into stream chunks that add back up to it.
+
+    Text is split at word boundaries. A message with tool calls is replayed as
+    one chunk, as Gemini streams them. Metadata and usage ride on the first chunk.
+    """
+    message = generation.message
+    text = message.content if isinstance(message.content, str) else ""
+    if getattr(message, "tool_calls", None) or not text:
+        tool_call_chunks = [
+            tool_call_chunk(name=call["name"], args=json.dumps(call["args"]), id=call.get("id"), index=index)
+            for index, call in enumerate(getattr(message, "tool_calls", None) or [])
+        ]
+        fields = message.model_dump(exclude={"type", "tool_calls", "invalid_tool_calls"})
+        return [ChatGenerationChunk(message=AIMessageChunk(**fields, tool_call_chunks=tool_call_chunks), generation_info=generation.generation_info)]
+    pieces = [""]
+    for piece in _PIECE.findall(text):
+        if len(pieces[-1]) >= REPLAY_CHUNK_CHARS:
+            pieces.append("")
+        pieces[-1] += piece
+    # Trailing whitespace the pattern does not match stays with the last piece
+    pieces[-1] += text[len("".join(pieces)):]
+    chunks = [ChatGenerationChunk(message=AIMessageChunk(content=piece)) for piece in pieces]
+    first = chunks[0]
+    first.message.response_metadata = dict(message.response_metadata)
+    first.message.usage_metadata = message.usage_metadata
+    first.message.additional_kwargs = dict(message.additional_kwargs)
+    first.generation_info = generation.generation_info
+    return chunks
+
+
+_library_retry_decorator = genai_chat_models._create_retry_decorator
+
+
+def _create_retry_decorator():
+    # The scheduler retries its own attempts; the library's retries would multiply them
+    if in_scheduled_call():
+        return lambda method: method
+    return _library_retry_decorator()
+
+
+# langchain-google-genai builds its tenacity retry per call and ignores max_retries
+genai_chat_models._create_retry_decorator = _create_retry_decorator
+
+
+def _live_kwargs(kwargs: dict) -> dict:
+    """Call kwargs for the Gemini client; scheduled calls also turn off the transport's retry."""
+    return {**kwargs, "retry": None} if in_scheduled_call() else kwargs
+
+
+class CassetteChatGoogleGenerativeAI(ChatGoogleGenerativeAI):
+    """ChatGoogleGenerativeAI that records and replays generations per CASSETTE_MODE.
+
+    Requests are keyed by model, messages, stop words and call kwargs (tools,
+    structured-output schemas).
+
+    Streaming goes through the response cache and cassettes too, as invoke
+    does: a cached answer, or one recorded or replayed from a cassette, is
+    replayed as a stream of chunks, and a live streamed answer is cached.
+
+    Calls made under services.scheduler are not retried by the client, since
+    the scheduler retries them.
+    """
+
+    def _cassette_request(self, messages: List[BaseMessage], stop: Optional[List[str]], kwargs: dict):
+        message_dicts = messages_to_dict(messages)
+        for message in message_dicts:
+            # Graph reducers assign random ids to messages; they must not change the key
+            message["data"].pop("id", None)
+        request = {"model": self.model, "messages": message_dicts, "stop": stop, "kwargs": kwargs}
+        return request, request_key("llm", self.model, request)
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        mode = get_cassette_mode()
+        if mode == "off":
+            return super()._generate(messages, stop=stop, run_manager=run_manager, **_live_kwargs(kwargs))
+        store = CassetteStore()
+        request, key = self._cassette_request(messages, stop, kwargs)
+        if mode == "replay":
+            response, delay = _replay(store, "llm", key)
+            time.sleep(delay)
+            return response
+        started = time.perf_counter()
+        response = super()._generate(messages, stop=stop, run_manager=run_manager, **_live_kwargs(kwargs))
+        store.save("llm", key, self.model, request, response, time.perf_counter() - started)
+        return response
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        mode = get_cassette_mode()
+        if mode == "off":
+            return await super()._agenerate(messages, stop=stop, run_manager=run_manager, **_live_kwargs(kwargs))
+        store = CassetteStore()
+        request, key = self._cassette_request(messages, stop, kwargs)
+        if mode == "replay":
+            response, delay = _replay(store, "llm", key)
+            await asyncio.sleep(delay)
+            return response
+        started = time.perf_counter()
+        response = await super()._agenerate(messages, stop=stop, run_manager=run_manager, **_live_kwargs(kwargs))
+        store.save("llm", key, self.model, request, response, time.perf_counter() - started)
+        return response
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs) -> AsyncIterator[ChatGenerationChunk]:
+        # BaseChatModel.astream does not consult the cache, so it is done here with invoke's key
+        cache = self.cache if isinstance(self.cache, BaseCache) else None
+        if cache is not None:
+            prompt, llm_string = dumps(messages), self._get_llm_string(stop=stop, **kwargs)
+            cached = await cache.alookup(prompt, llm_string)
+            if isinstance(cached, list) and cached:
+                for chunk in replay_chunks(cached[0]):
+                    yield chunk
+                return
+        if get_cassette_mode() != "off":
+            # Cassettes record whole generations; the one recorded or replayed is streamed back
+            result = await self._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+            generation = result.generations[0]
+            for chunk in replay_chunks(generation):
+                yield chunk
+        else:
+            generation = None
+            async for chunk in super()._astream(messages, stop=stop, run_manager=run_manager, **_live_kwargs(kwargs)):
+                generation = chunk if generation is None else generation + chunk
+                yield chunk
+            if generation is None:
+                return
+            generation = ChatGeneration(message=message_chunk_to_message(generation.message), generation_info=generation.generation_info)
+        if cache is not None:
+            await cache.aupdate(prompt, llm_string, [generation])
+
+
+class CassetteGoogleGenerativeAIEmbeddings(GoogleGenerativeAIEmbeddings):
+    """GoogleGenerativeAIEmbeddings whose document embeddings go through the "embeddings" cassette."""
+
+    def embed_documents(self, texts, *args, **kwargs):
+        return cassette("embeddings")(self._embed_documents)(self.model, list(texts), *args, **kwargs)
+
+    async def aembed_documents(self, texts, *args, **kwargs):
+        return await run_in_executor(None, self.embed_documents, texts, *args, **kwargs)
+
+    def _embed_documents(self, model, texts, *args, **kwargs):
+        return super().embed_documents(texts, *args, **kwargs)
@@ -0,0 +1,84 @@
+"""Process-wide LangGraph checkpointer and compiled graphs.
+
+Graphs and react agents used to open an AsyncMongoDBSaver (a new Motor client
+plus index checks) and recompile on every call. Instead, the FastAPI lifespan
+creates one AsyncMongoDBSaver on the shared async MongoDB client, and each graph
+is compiled once against it and reused by every request. Like the async client,
+the saver is bound to its event loop, so savers and compiled graphs are kept
+per loop. Checkpoints stay in the checkpointing_db database used so far.
+"""
+import logging
+from typing import Any, Callable
+from langgraph.checkpoint.mongodb import AsyncMongoDBSaver
+from services.loop_local import LoopLocal
+from services.mongo import get_async_mongo_client
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class SharedMongoDBSaver(AsyncMongoDBSaver):
+    """AsyncMongoDBSaver that can retry a failed index setup.
+
+    The base class memoizes setup in a future that is never resolved if setup
+    raises, which would hang every later call on a long-lived saver.
+    """
+
+    async def _setup(self):
+        future = self._setup_future
+        try:
+            await super()._setup()
+        except Exception as e:
+            if future is None and self._setup_future is not None and not self._setup_future.done():
+                # This call started the setup: fail its waiters and let the next call retry
+                failed, self._setup_future = self._setup_future, None
+                failed.set_exception(e)
+                failed.exception()
+            raise
+
+
+_savers: LoopLocal[AsyncMongoDBSaver] = LoopLocal()
+_graphs: LoopLocal[dict[str, Any]] = LoopLocal()
+
+
+def get_checkpointer() -> AsyncMongoDBSaver:
+    """Return the running event loop's checkpointer, creating it on first use."""
+    def create():
+        logger.info("Created shared MongoDB checkpointer")
+        return SharedMongoDBSaver(get_async_mongo_client())
+
+    return _savers.get(create)
+
+
+async def asetup_checkpointer() -> AsyncMongoDBSaver:
+    """Create the checkpointer and its indexes up front, so the first request does not wait for them.
+
+    A failure is logged rather than raised; setup is retried on first use.
+    """
+    saver = get_checkpointer()
+    try:
+        await saver._setup()
+    except Exception as e:
+        logger.warning(f"Checkpointer setup failed, will retry on first use: {str(e)}")
+    return saver
+
+
+def get_compiled_graph(name: str, build: Callable[[Any], Any], checkpointer=None):
+    """Return build(checkpointer), compiled once per event loop and cached under name.
+
+    With an explicit checkpointer (tests, benchmarks) the graph is built fresh
+    against it and not cached.
+    """
+    if checkpointer is not None:
+        return build(checkpointer)
+    graphs = _graphs.get(dict)
+    graph = graphs.get(name)
+    if graph is None:
+        graph = graphs[name] = build(get_checkpointer())
+    return graph
+
+
+async def aclose_checkpointer():
+    """Drop the running loop's checkpointer and compiled graphs. The MongoDB client is closed separately."""
+    _graphs.pop()
+    if _savers.pop() is not None:
+        logger.info("Released shared MongoDB checkpointer")
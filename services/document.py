@@ -1,20 +1,40 @@
 import logging
 from typing import List, Literal
-from services.mongo import MongoDBConfig
-from services.models import Document
+from services.mongo import get_async_database, get_database
+from services.models import Document, DocumentDigest
 from bson.objectid import ObjectId
 
 # Configure a logger for this module.
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+def _fingerprint_pipeline(user_id: str) -> list:
+    # Inserts move the count and newest _id, deletes the count, and finished extraction the completed count
+    return [
+        {"$match": {"user_id": user_id}},
+        {"$group": {
+            "_id": None,
+            "count": {"$sum": 1},
+            "latest": {"$max": "$_id"},
+            "completed": {"$sum": {"$cond": [{"$eq": ["$status", "completed"]}, 1, 0]}},
+        }},
+    ]
+
+
+def _fingerprint(result: list) -> tuple:
+    return (result[0]["count"], str(result[0]["latest"]), result[0]["completed"]) if result else (0, None, 0)
+
 class DocumentService:
     def __init__(self):
         # In-memory store for conversations; replace with a persistent store in production.
-        db_config = MongoDBConfig()
-        self.db = db_config.connect()
+        self.db = get_database()
         logger.info("DocumentService initialized and database connected.")
 
+    @property
+    def adb(self):
+        """The database on the running event loop's async client, for the a-prefixed methods."""
+        return get_async_database()
+
     def insert_document(self, document: Document) -> Document:
         # Insert into MongoDB 'documents' collection
         result = self.db["documents"].insert_one(document.model_dump())
@@ -32,6 +52,15 @@ class DocumentService:
         logger.info("Found %d documents for user '%s'", len(documents), user_id)
         return documents
 
+    def get_user_document_digests(self, user_id: str) -> List[DocumentDigest]:
+        """Retrieve only the prompt fields of a user's documents, without model validation."""
+        documents = self.db["documents"].find({"user_id": user_id}, DocumentDigest.projection())
+        return [DocumentDigest.from_mongo(doc) for doc in documents]
+
+    def get_user_documents_fingerprint(self, user_id: str) -> tuple:
+        """A cheap summary of a user's documents that changes when documents are added, removed or completed."""
+        return _fingerprint(list(self.db["documents"].aggregate(_fingerprint_pipeline(user_id))))
+
     def get_document_by_id(self, document_id: str) -> Document:
         """Retrieve a document by its ID."""
         logger.info("Retrieving document with id: %s", document_id)
@@ -49,4 +78,42 @@ class DocumentService:
         logger.info("Document with id %s deleted successfully", document_id)
         return True
 
+    async def ainsert_document(self, document: Document) -> Document:
+        """Async variant of insert_document."""
+        result = await self.adb["documents"].insert_one(document.model_dump())
+        document.id = str(result.inserted_id)
+        return document
+
+    async def aget_user_documents(self, user_id: str) -> List[Document]:
+        """Async variant of get_user_documents."""
+        logger.info("Retrieving documents for user_id: %s", user_id)
+        documents = await self.adb["documents"].find({"user_id": user_id}).to_list()
+        documents = [Document(**doc) for doc in documents]
+        logger.info("Found %d documents for user '%s'", len(documents), user_id)
+        return documents
 
+    async def aget_user_document_digests(self, user_id: str) -> List[DocumentDigest]:
+        """Async variant of get_user_document_digests."""
+        documents = await self.adb["documents"].find({"user_id": user_id}, DocumentDigest.projection()).to_list()
+        return [DocumentDigest.from_mongo(doc) for doc in documents]
+
+    async def aget_user_documents_fingerprint(self, user_id: str) -> tuple:
+        """Async variant of get_user_documents_fingerprint."""
+        return _fingerprint(await (await self.adb["documents"].aggregate(_fingerprint_pipeline(user_id))).to_list())
+
+    async def aget_document_by_id(self, document_id: str) -> Document:
+        """Async variant of get_document_by_id."""
+        logger.info("Retrieving document with id: %s", document_id)
+        result = await self.adb["documents"].find_one({"_id": ObjectId(document_id)})
+        if not result:
+            raise ValueError(f"Document with id {document_id} not found")
+        return Document(**result)
+
+    async def adelete_document_by_id(self, document_id: str) -> bool:
+        """Async variant of delete_document_by_id."""
+        logger.info("Deleting document with id: %s", document_id)
+        result = await self.adb["documents"].delete_one({"_id": ObjectId(document_id)})
+        if result.deleted_count == 0:
+            raise ValueError(f"Document with id {document_id} not found")
+        logger.info("Document with id %s deleted successfully", document_id)
+        return True
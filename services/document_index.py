@@ -0,0 +1,149 @@
+"""Per-user document indexes for choosing which internal documents a prompt sees.
+
+Planning and internal query prompts used to include every document the user had
+uploaded. Instead, a DocumentIndex (report_writer.context) is built from each
+user's documents. The documents most relevant to the topic, or to a section,
+are selected within a token budget.
+
+Documents are read with a projection of only the fields prompts use
+(DocumentDigest). Each user's index, and their full formatted digest, are cached
+per process. Documents are written by other services, so before an entry is
+reused it is checked against a cheap fingerprint of the user's documents in
+MongoDB (count, newest id, completed count), and rebuilt when that changed. A
+report's sections reuse one check for VERIFIED_REUSE_SECONDS.
+
+Settings:
+- INTERNAL_DOCUMENTS_TOKEN_BUDGET: tokens of document descriptions per prompt.
+- INTERNAL_DOCUMENTS_TOP_K: at most this many documents per prompt.
+- DOCUMENT_INDEX_TTL_SECONDS: the longest a user's cached index is reused
+  without reading their documents again (default six hours), for edits the
+  fingerprint cannot see.
+
+Graph nodes can override the first two with the internal_documents_token_budget
+and internal_documents_top_k configurable keys.
+"""
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from report_writer.context import DocumentIndex
+from report_writer.utils import format_documents
+from services.document import DocumentService
+from services.loop_local import LoopLocal
+
+DEFAULT_INTERNAL_DOCUMENTS_TOKEN_BUDGET = 4000
+DEFAULT_INTERNAL_DOCUMENTS_TOP_K = 10
+# Only a safety bound for edits the fingerprint cannot see; the fingerprint decides reuse
+DEFAULT_DOCUMENT_INDEX_TTL_SECONDS = 6 * 60 * 60
+MAX_INDEXED_USERS = 256
+# Sections of one report ask within moments of each other; they share one fingerprint check
+VERIFIED_REUSE_SECONDS = 2.0
+
+
+@dataclass
+class UserDocuments:
+    built_at: float
+    fingerprint: tuple
+    index: DocumentIndex
+    verified_at: float = 0.0
+    digest: str | None = None
+
+    def get_digest(self) -> str:
+        """Every document formatted for a prompt, formatted once."""
+        if self.digest is None:
+            self.digest = format_documents(self.index.documents)
+        return self.digest
+
+
+_cache: OrderedDict[str, UserDocuments] = OrderedDict()
+_build_locks: LoopLocal[dict[str, asyncio.Lock]] = LoopLocal()
+
+
+def _reusable(user_id: str) -> UserDocuments | None:
+    """The user's entry if it is within the TTL, whether or not it still needs a fingerprint check."""
+    entry = _cache.get(user_id)
+    if entry is None:
+        return None
+    if time.monotonic() - entry.built_at > float(os.getenv("DOCUMENT_INDEX_TTL_SECONDS", DEFAULT_DOCUMENT_INDEX_TTL_SECONDS)):
+        return None
+    return entry
+
+
+def _recently_verified(entry: UserDocuments | None) -> bool:
+    return entry is not None and time.monotonic() - entry.verified_at < VERIFIED_REUSE_SECONDS
+
+
+def _store(user_id: str, fingerprint: tuple, documents: list) -> UserDocuments:
+    now = time.monotonic()
+    entry = UserDocuments(now, fingerprint, DocumentIndex(documents), verified_at=now)
+    _cache[user_id] = entry
+    _cache.move_to_end(user_id)
+    while len(_cache) > MAX_INDEXED_USERS:
+        _cache.popitem(last=False)
+    return entry
+
+
+def _reuse(user_id: str, entry: UserDocuments, fingerprint: tuple) -> UserDocuments | None:
+    if entry.fingerprint != fingerprint:
+        return None
+    entry.verified_at = time.monotonic()
+    _cache.move_to_end(user_id)
+    return entry
+
+
+async def aget_cached_documents(user_id: str) -> UserDocuments:
+    """Return the user's cached documents, reading them when missing, expired or changed in MongoDB."""
+    entry = _reusable(user_id)
+    if _recently_verified(entry):
+        return entry
+    # Sections of one report ask at once; only the first checks and reads the documents
+    lock = _build_locks.get(dict).setdefault(user_id, asyncio.Lock())
+    async with lock:
+        entry = _reusable(user_id)
+        if _recently_verified(entry):
+            return entry
+        service = DocumentService()
+        # Taken before the read, so a change during the read shows up at the next check
+        fingerprint = await service.aget_user_documents_fingerprint(user_id)
+        if entry is not None and _reuse(user_id, entry, fingerprint):
+            return entry
+        return _store(user_id, fingerprint, await service.aget_user_document_digests(user_id))
+
+
+def get_cached_documents(user_id: str) -> UserDocuments:
+    """Sync variant of aget_cached_documents."""
+    entry = _reusable(user_id)
+    if _recently_verified(entry):
+        return entry
+    service = DocumentService()
+    fingerprint = service.get_user_documents_fingerprint(user_id)
+    if entry is not None and _reuse(user_id, entry, fingerprint):
+        return entry
+    return _store(user_id, fingerprint, service.get_user_document_digests(user_id))
+
+
+async def aget_document_index(user_id: str) -> DocumentIndex:
+    """Return the user's document index."""
+    return (await aget_cached_documents(user_id)).index
+
+
+async def aget_document_digest(user_id: str) -> str:
+    """Every document of the user, formatted for a prompt."""
+    return (await aget_cached_documents(user_id)).get_digest()
+
+
+def get_document_digest(user_id: str) -> str:
+    """Sync variant of aget_document_digest."""
+    return get_cached_documents(user_id).get_digest()
+
+
+async def aselect_internal_documents(user_id: str, query: str, token_budget: int | None = None, top_k: int | None = None) -> str:
+    """Format the user's documents most relevant to query, within the token budget."""
+    if token_budget is None:
+        token_budget = int(os.getenv("INTERNAL_DOCUMENTS_TOKEN_BUDGET", DEFAULT_INTERNAL_DOCUMENTS_TOKEN_BUDGET))
+    if top_k is None:
+        top_k = int(os.getenv("INTERNAL_DOCUMENTS_TOP_K", DEFAULT_INTERNAL_DOCUMENTS_TOP_K))
+    index = await aget_document_index(user_id)
+    documents = index.select(query, token_budget, top_k, lambda document: format_documents([document]))
+    return format_documents(documents)
@@ -0,0 +1,88 @@
+"""Lazy construction of model clients and heavy modules.
+
+Importing the app used to build every chat model and import langchain_google_genai,
+yfinance, pandas, matplotlib, reportlab and sec_api up front, in each uvicorn
+worker. Module-level models and utilities are now LazyObject placeholders: the
+first attribute access builds the real object, and every later access goes
+straight to it.
+
+Chat models come from a process-wide registry, so report_writer, zone and cortex
+share one client per model name.
+"""
+import importlib
+import os
+import threading
+from typing import Any, Callable
+
+_UNSET = object()
+
+
+class LazyObject:
+    """Stands in for the object factory() returns, building it on first attribute access."""
+
+    def __init__(self, factory: Callable[[], Any], name: str = ""):
+        object.__setattr__(self, "_factory", factory)
+        object.__setattr__(self, "_name", name)
+        object.__setattr__(self, "_target", _UNSET)
+        object.__setattr__(self, "_lock", threading.Lock())
+
+    def _resolve(self) -> Any:
+        target = object.__getattribute__(self, "_target")
+        if target is _UNSET:
+            with object.__getattribute__(self, "_lock"):
+                target = object.__getattribute__(self, "_target")
+                if target is _UNSET:
+                    target = object.__getattribute__(self, "_factory")()
+                    object.__setattr__(self, "_target", target)
+        return target
+
+    def __getattr__(self, name: str) -> Any:
+        # Probes such as hasattr(value, "__self__") must not build the object
+        if name.startswith("__") and name.endswith("__"):
+            raise AttributeError(name)
+        return getattr(self._resolve(), name)
+
+    def __setattr__(self, name: str, value: Any):
+        setattr(self._resolve(), name, value)
+
+    def __repr__(self) -> str:
+        target = object.__getattribute__(self, "_target")
+        if target is _UNSET:
+            return f"<lazy {object.__getattribute__(self, '_name')} (not built)>"
+        return repr(target)
+
+
+def resolve(value: Any) -> Any:
+    """Return the real object behind value, building it if needed; other values pass through.
+
+    Use this where a library checks types, e.g. isinstance(model, BaseChatModel).
+    """
+    return value._resolve() if isinstance(value, LazyObject) else value
+
+
+def lazy_import(module: str, name: str) -> LazyObject:
+    """Placeholder for module.name that imports module on first use."""
+    return LazyObject(lambda: getattr(importlib.import_module(module), name), f"{module}.{name}")
+
+
+_chat_models: dict[str, Any] = {}
+_chat_models_lock = threading.Lock()
+
+
+def get_chat_model(model: str):
+    """Return the shared Gemini chat model for model, creating it on first call."""
+    llm = _chat_models.get(model)
+    if llm is None:
+        with _chat_models_lock:
+            llm = _chat_models.get(model)
+            if llm is None:
+                from services.cassette_models import CassetteChatGoogleGenerativeAI
+                from services.llm_cache import get_llm_cache
+                llm = CassetteChatGoogleGenerativeAI(model=model, google_api_key=os.getenv("GEMINI_API_KEY_BETA"), cache=get_llm_cache(model))
+                _chat_models[model] = llm
+    return llm
+
+
+def lazy_chat_model(model: str) -> LazyObject:
+    """Placeholder for get_chat_model(model)."""
+    return LazyObject(lambda: get_chat_model(model), model)
@@ -0,0 +1,336 @@
+"""Local response cache for chat model calls.
+
+The cache is off unless LLM_CACHE_MODE is set, so live reports are never served
+earlier answers unasked. When on, the model factories attach a ModelCache to
+every chat model, and LangChain then consults it before each generation. Entries
+are keyed exactly on the model configuration, the call kwargs (which carry the
+structured-output schema as a tool) and the messages. They live in SQLite as LangChain JSON (never pickle), with a
+TTL and an LRU size bound.
+
+Settings:
+- LLM_CACHE_MODE: ``off`` (default), ``exact`` or ``semantic``. In ``semantic``
+  mode, a miss on the exact key falls back to the most similar stored prompt for
+  the same model configuration, as long as its embedding similarity reaches
+  LLM_CACHE_SIMILARITY_THRESHOLD.
+- LLM_CACHE_PATH, LLM_CACHE_TTL_SECONDS and LLM_CACHE_MAX_ENTRIES: where the
+  cache lives, how long entries last and how many are kept. The size bound is
+  enforced every LLM_CACHE_EVICTION_INTERVAL_SECONDS, so it can be overshot
+  briefly.
+- LLM_CACHE_BUSY_TIMEOUT_SECONDS: how long to wait on another worker holding the
+  SQLite write lock.
+- Per call: wrap the call in ``with bypass_llm_cache():`` to skip the cache both
+  ways.
+
+Every worker shares the file, so it is opened in WAL mode, and hits only rewrite
+last_access when it is more than LAST_ACCESS_RESOLUTION_SECONDS old. The cache
+never fails a model call: a lookup or store error is logged as a warning and
+treated as a miss or a skipped store.
+"""
+import hashlib
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Optional, Sequence
+from langchain_core.caches import BaseCache
+from langchain_core.load import dumps, loads
+from langchain_core.outputs import Generation
+from logger import runner_logger as logger
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_LLM_CACHE_PATH = os.path.join(PROJECT_ROOT, ".cache", "llm_cache.sqlite3")
+DEFAULT_TTL_SECONDS = 24 * 60 * 60
+DEFAULT_MAX_ENTRIES = 20000
+DEFAULT_SIMILARITY_THRESHOLD = 0.97
+DEFAULT_BUSY_TIMEOUT_SECONDS = 5.0
+DEFAULT_EVICTION_INTERVAL_SECONDS = 60.0
+LAST_ACCESS_RESOLUTION_SECONDS = 60.0
+
+_bypass: ContextVar[bool] = ContextVar("llm_cache_bypass", default=False)
+_cache_embedder = None
+
+
+@contextmanager
+def bypass_llm_cache():
+    """Skip cache lookups and stores for model calls made inside this block."""
+    token = _bypass.set(True)
+    try:
+        yield
+    finally:
+        _bypass.reset(token)
+
+
+def set_cache_embedder(embedder):
+    """Swap the embedder used by semantic mode (None restores the Gemini default)."""
+    global _cache_embedder
+    _cache_embedder = embedder
+
+
+def get_cache_embedder():
+    global _cache_embedder
+    if _cache_embedder is None:
+        from report_writer import initialize_langchain_embedding_model
+        _cache_embedder = initialize_langchain_embedding_model()
+    return _cache_embedder
+
+
+def prompt_key(prompt: str) -> tuple[str, str]:
+    """Return a normalized form of a serialized message list and the text used for embeddings.
+
+    Message ids are dropped: graph reducers assign random ids and they must not
+    change the key.
+    """
+    try:
+        messages = json.loads(prompt)
+    except ValueError:
+        return prompt, prompt
+    texts = []
+    for message in messages if isinstance(messages, list) else []:
+        kwargs = message.get("kwargs", {}) if isinstance(message, dict) else {}
+        kwargs.pop("id", None)
+        content = kwargs.get("content")
+        texts.append(content if isinstance(content, str) else json.dumps(content, sort_keys=True))
+    return json.dumps(messages, sort_keys=True), "\n".join(texts)
+
+
+def _from_cache(response: str) -> list[Generation] | None:
+    try:
+        generations = loads(response)
+    except (ValueError, TypeError):
+        # An unreadable row, e.g. one pickled by an earlier version, is a miss and gets overwritten
+        return None
+    for generation in generations:
+        message = getattr(generation, "message", None)
+        if message is not None:
+            # Lets usage accounting tell cached answers from billed calls
+            message.response_metadata["from_cache"] = True
+    return generations
+
+
+def _cosine(a: Sequence[float], b: Sequence[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+class LLMResponseStore:
+    """SQLite store of model generations, shared by every model's ModelCache."""
+
+    def __init__(self, path: str = DEFAULT_LLM_CACHE_PATH, ttl_seconds: float = DEFAULT_TTL_SECONDS, max_entries: int = DEFAULT_MAX_ENTRIES, mode: str = "exact", similarity_threshold: float = DEFAULT_SIMILARITY_THRESHOLD, busy_timeout: float = DEFAULT_BUSY_TIMEOUT_SECONDS, eviction_interval: float = DEFAULT_EVICTION_INTERVAL_SECONDS):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.mode = mode
+        self.similarity_threshold = similarity_threshold
+        self.eviction_interval = eviction_interval
+        self._last_eviction = 0.0
+        self._lock = threading.Lock()
+        self._stats: dict[str, dict[str, int]] = {}
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=busy_timeout, check_same_thread=False)
+        if path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS llm_cache (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                llm_hash TEXT NOT NULL,
+                embedding TEXT,
+                response TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS llm_cache_llm_hash ON llm_cache (llm_hash)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS llm_cache_last_access ON llm_cache (last_access)")
+        self._conn.commit()
+
+    def _count(self, model: str, event: str):
+        stats = self._stats.setdefault(model, {"hits": 0, "semantic_hits": 0, "misses": 0, "stores": 0, "bypassed": 0, "errors": 0})
+        stats[event] += 1
+
+    def count(self, model: str, event: str):
+        with self._lock:
+            self._count(model, event)
+
+    def failed(self, model: str, operation: str, error: Exception):
+        with self._lock:
+            self._count(model, "errors")
+            if self._conn.in_transaction:
+                self._conn.rollback()
+        logger.warning(f"LLM cache {operation} for {model} failed, continuing without the cache: {str(error)}")
+
+    def _touch(self, key: str, last_access: float, now: float):
+        # Hits would otherwise turn every read into a write on the shared file
+        if now - last_access > LAST_ACCESS_RESOLUTION_SECONDS:
+            self._conn.execute("UPDATE llm_cache SET last_access = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+
+    def _embed(self, text: str) -> list[float]:
+        return get_cache_embedder().embed_documents([text])[0]
+
+    def lookup(self, model: str, prompt: str, llm_string: str) -> Optional[Sequence[Generation]]:
+        normalized, text = prompt_key(prompt)
+        llm_hash = hashlib.sha256(llm_string.encode("utf-8")).hexdigest()
+        key = hashlib.sha256(f"{llm_hash}\n{normalized}".encode("utf-8")).hexdigest()
+        now = time.time()
+        oldest = now - self.ttl_seconds if self.ttl_seconds else 0
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, last_access FROM llm_cache WHERE key = ? AND created_at >= ?", (key, oldest)
+            ).fetchone()
+            if row is not None:
+                generations = _from_cache(row[0])
+                if generations is not None:
+                    self._touch(key, row[1], now)
+                    self._count(model, "hits")
+                    return generations
+            if self.mode != "semantic":
+                self._count(model, "misses")
+                return None
+            candidates = self._conn.execute(
+                "SELECT key, embedding, response, last_access FROM llm_cache WHERE llm_hash = ? AND created_at >= ? AND embedding IS NOT NULL",
+                (llm_hash, oldest),
+            ).fetchall()
+        # Embed outside the lock; it is a network call with the Gemini embedder
+        embedding = self._embed(text) if candidates else None
+        best = max(
+            ((_cosine(embedding, json.loads(stored)), stored_key, response, last_access) for stored_key, stored, response, last_access in candidates),
+            default=None,
+        )
+        generations = _from_cache(best[2]) if best is not None and best[0] >= self.similarity_threshold else None
+        with self._lock:
+            if generations is None:
+                self._count(model, "misses")
+                return None
+            self._count(model, "semantic_hits")
+            self._touch(best[1], best[3], now)
+        return generations
+
+    def update(self, model: str, prompt: str, llm_string: str, generations: Sequence[Generation]):
+        normalized, text = prompt_key(prompt)
+        llm_hash = hashlib.sha256(llm_string.encode("utf-8")).hexdigest()
+        key = hashlib.sha256(f"{llm_hash}\n{normalized}".encode("utf-8")).hexdigest()
+        embedding = json.dumps(self._embed(text)) if self.mode == "semantic" else None
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, model, llm_hash, embedding, response, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, model, llm_hash, embedding, dumps(list(generations)), now, now),
+            )
+            self._count(model, "stores")
+            self._conn.commit()
+            if now - self._last_eviction >= self.eviction_interval:
+                self._last_eviction = now
+                self._evict()
+                self._conn.commit()
+
+    def _evict(self):
+        """Trim the cache to max_entries, least recently used first. Run periodically, not per store."""
+        if not self.max_entries:
+            return
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()
+        overflow = count - self.max_entries
+        if overflow > 0:
+            self._conn.execute(
+                "DELETE FROM llm_cache WHERE key IN (SELECT key FROM llm_cache ORDER BY last_access ASC LIMIT ?)",
+                (overflow,),
+            )
+
+    def clear(self, model: str | None = None):
+        with self._lock:
+            if model is None:
+                self._conn.execute("DELETE FROM llm_cache")
+            else:
+                self._conn.execute("DELETE FROM llm_cache WHERE model = ?", (model,))
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        """Per-model counters since process start, each with its hit rate."""
+        with self._lock:
+            stats = {model: dict(counts) for model, counts in self._stats.items()}
+        for counts in stats.values():
+            hits = counts["hits"] + counts["semantic_hits"]
+            lookups = hits + counts["misses"]
+            counts["hit_rate"] = hits / lookups if lookups else 0.0
+        return stats
+
+
+class ModelCache(BaseCache):
+    """LangChain cache for one model, backed by the shared LLMResponseStore."""
+
+    def __init__(self, store: LLMResponseStore, model: str):
+        self.store = store
+        self.model = model
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[Sequence[Generation]]:
+        if _bypass.get():
+            self.store.count(self.model, "bypassed")
+            return None
+        try:
+            return self.store.lookup(self.model, prompt, llm_string)
+        except Exception as e:
+            # LangChain does not guard cache lookups, so a locked file would fail the call itself
+            self.store.failed(self.model, "lookup", e)
+            return None
+
+    def update(self, prompt: str, llm_string: str, return_val: Sequence[Generation]) -> None:
+        if _bypass.get():
+            return
+        try:
+            self.store.update(self.model, prompt, llm_string, return_val)
+        except Exception as e:
+            self.store.failed(self.model, "store", e)
+
+    def clear(self, **kwargs: Any) -> None:
+        self.store.clear(self.model)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_llm_response_store() -> LLMResponseStore | None:
+    """Return the process-wide response store, or None when LLM_CACHE_MODE is off or it cannot be opened."""
+    global _store
+    mode = os.getenv("LLM_CACHE_MODE", "off").lower() or "off"
+    if mode == "off":
+        return None
+    if mode not in ("exact", "semantic"):
+        raise ValueError(f"LLM_CACHE_MODE must be one of exact, semantic, off; got {mode}")
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                try:
+                    _store = LLMResponseStore(
+                        path=os.getenv("LLM_CACHE_PATH", DEFAULT_LLM_CACHE_PATH),
+                        ttl_seconds=float(os.getenv("LLM_CACHE_TTL_SECONDS", DEFAULT_TTL_SECONDS)),
+                        max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES)),
+                        mode=mode,
+                        similarity_threshold=float(os.getenv("LLM_CACHE_SIMILARITY_THRESHOLD", DEFAULT_SIMILARITY_THRESHOLD)),
+                        busy_timeout=float(os.getenv("LLM_CACHE_BUSY_TIMEOUT_SECONDS", DEFAULT_BUSY_TIMEOUT_SECONDS)),
+                        eviction_interval=float(os.getenv("LLM_CACHE_EVICTION_INTERVAL_SECONDS", DEFAULT_EVICTION_INTERVAL_SECONDS)),
+                    )
+                except sqlite3.Error as e:
+                    logger.warning(f"LLM response cache could not be opened, calling models without it: {str(e)}")
+                    return None
+                logger.info(f"LLM response cache opened at {_store.path} in {mode} mode")
+    return _store
+
+
+def get_llm_cache(model: str) -> ModelCache | None:
+    """Cache to pass to a chat model factory for model, or None when caching is off."""
+    store = get_llm_response_store()
+    return ModelCache(store, model) if store else None
+
+
+def get_llm_cache_stats() -> dict:
+    store = get_llm_response_store()
+    return store.stats() if store else {}
@@ -0,0 +1,48 @@
+"""Values kept per asyncio event loop.
+
+Clients, locks and futures belong to the loop that created them, so registries
+of them are kept per loop. Keying them on id(loop) let a new loop reuse a dead
+loop's id and pick up its objects, and entries were never dropped. LoopLocal
+holds the loop itself weakly and drops entries of loops that have been closed.
+"""
+import asyncio
+import threading
+import weakref
+from typing import Callable, Generic, TypeVar
+
+T = TypeVar("T")
+
+
+class LoopLocal(Generic[T]):
+    """One value per event loop, created on first use from the running loop."""
+
+    def __init__(self):
+        self._values: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, T] = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def get(self, factory: Callable[[], T]) -> T:
+        """The running loop's value, calling factory() to create it when missing."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            value = self._values.get(loop)
+            if value is None:
+                # Values often hold their loop, which would keep a weak key alive forever
+                for closed in [other for other in self._values if other.is_closed()]:
+                    del self._values[closed]
+                value = self._values[loop] = factory()
+            return value
+
+    def peek(self) -> T | None:
+        """The running loop's value, or None without creating it."""
+        with self._lock:
+            return self._values.get(asyncio.get_running_loop())
+
+    def pop(self) -> T | None:
+        """Forget and return the running loop's value."""
+        with self._lock:
+            return self._values.pop(asyncio.get_running_loop(), None)
+
+    def values(self) -> list[T]:
+        """The values of every loop still registered."""
+        with self._lock:
+            return list(self._values.values())
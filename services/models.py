@@ -1,5 +1,6 @@
+from dataclasses import dataclass, field
 from pydantic import BaseModel, Field, field_serializer
-from typing import Literal, List
+from typing import ClassVar, Literal, List
 from bson import ObjectId
     
 class DocumentFeatures(BaseModel):
@@ -37,3 +38,30 @@ class Document(DocumentFeatures):
         json_encoders = {
             ObjectId: str
         }
+
+
+@dataclass(slots=True)
+class DocumentDigest:
+    """The fields of a Document that internal-document prompts read.
+
+    Loaded with a projection and without model validation, for reading every
+    document a user has.
+    """
+    FIELDS: ClassVar[tuple] = ("name", "document_type", "domain", "description", "summary", "highlights", "queries")
+
+    id: str
+    name: str = ""
+    document_type: str = ""
+    domain: str = ""
+    description: str = ""
+    summary: str = ""
+    highlights: List[str] = field(default_factory=list)
+    queries: List[str] = field(default_factory=list)
+
+    @classmethod
+    def projection(cls) -> dict:
+        return {name: 1 for name in cls.FIELDS}
+
+    @classmethod
+    def from_mongo(cls, document: dict) -> "DocumentDigest":
+        return cls(id=str(document["_id"]), **{name: document[name] for name in cls.FIELDS if document.get(name) is not None})
@@ -1,8 +1,24 @@
+"""Process-wide MongoDB clients.
+
+Every service shares one pooled MongoClient, created by the FastAPI lifespan (or
+lazily on first use in scripts) and closed at shutdown. Async handlers use an
+AsyncMongoClient instead, so database round-trips do not block the event loop.
+Async clients are bound to the loop that created them, so there is one per event
+loop. Pool sizing and timeouts apply to both and come from MONGODB_MAX_POOL_SIZE,
+MONGODB_MIN_POOL_SIZE, MONGODB_MAX_IDLE_TIME_MS, MONGODB_CONNECT_TIMEOUT_MS,
+MONGODB_SERVER_SELECTION_TIMEOUT_MS, MONGODB_SOCKET_TIMEOUT_MS and
+MONGODB_WAIT_QUEUE_TIMEOUT_MS.
+"""
 import os
+import threading
 from dotenv import load_dotenv
 import pymongo
 import logging
+from pymongo import AsyncMongoClient
+from pymongo.asynchronous.database import AsyncDatabase
+from pymongo.database import Database
 from pymongo.mongo_client import MongoClient
+from services.loop_local import LoopLocal
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -11,6 +27,85 @@ logger = logging.getLogger(__name__)
 # Load environment variables from .env file
 load_dotenv()
 
+DEFAULT_MAX_POOL_SIZE = 50
+DEFAULT_MIN_POOL_SIZE = 0
+DEFAULT_MAX_IDLE_TIME_MS = 5 * 60 * 1000
+DEFAULT_CONNECT_TIMEOUT_MS = 10000
+DEFAULT_SERVER_SELECTION_TIMEOUT_MS = 10000
+DEFAULT_WAIT_QUEUE_TIMEOUT_MS = 10000
+
+_client: MongoClient | None = None
+_client_lock = threading.Lock()
+_async_clients: LoopLocal[AsyncMongoClient] = LoopLocal()
+
+
+def mongo_client_options() -> dict:
+    """Pool and timeout keyword arguments for MongoClient, read from the environment."""
+    options = {
+        "maxPoolSize": int(os.getenv("MONGODB_MAX_POOL_SIZE", DEFAULT_MAX_POOL_SIZE)),
+        "minPoolSize": int(os.getenv("MONGODB_MIN_POOL_SIZE", DEFAULT_MIN_POOL_SIZE)),
+        "maxIdleTimeMS": int(os.getenv("MONGODB_MAX_IDLE_TIME_MS", DEFAULT_MAX_IDLE_TIME_MS)),
+        "connectTimeoutMS": int(os.getenv("MONGODB_CONNECT_TIMEOUT_MS", DEFAULT_CONNECT_TIMEOUT_MS)),
+        "serverSelectionTimeoutMS": int(os.getenv("MONGODB_SERVER_SELECTION_TIMEOUT_MS", DEFAULT_SERVER_SELECTION_TIMEOUT_MS)),
+        "waitQueueTimeoutMS": int(os.getenv("MONGODB_WAIT_QUEUE_TIMEOUT_MS", DEFAULT_WAIT_QUEUE_TIMEOUT_MS)),
+    }
+    # No socket timeout unless one is configured, as before
+    socket_timeout = os.getenv("MONGODB_SOCKET_TIMEOUT_MS")
+    if socket_timeout:
+        options["socketTimeoutMS"] = int(socket_timeout)
+    return options
+
+
+def get_mongo_client() -> MongoClient:
+    """Return the shared client, creating it on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                options = mongo_client_options()
+                _client = MongoClient(os.getenv("MONGODB_URI"), **options)
+                logger.info(f"Created shared MongoDB client (maxPoolSize={options['maxPoolSize']})")
+    return _client
+
+
+def get_database() -> Database:
+    """Return the MONGODB_DATABASE_NAME database on the shared client."""
+    return get_mongo_client()[os.getenv("MONGODB_DATABASE_NAME")]
+
+
+def close_mongo_client():
+    """Close the shared client's pool; the next get_mongo_client call creates a new one."""
+    global _client
+    with _client_lock:
+        client, _client = _client, None
+    if client is not None:
+        client.close()
+        logger.info("Closed shared MongoDB client")
+
+
+def get_async_mongo_client() -> AsyncMongoClient:
+    """Return the running event loop's async client, creating it on first use."""
+    def create():
+        options = mongo_client_options()
+        logger.info(f"Created async MongoDB client (maxPoolSize={options['maxPoolSize']})")
+        return AsyncMongoClient(os.getenv("MONGODB_URI"), **options)
+
+    return _async_clients.get(create)
+
+
+def get_async_database() -> AsyncDatabase:
+    """Return the MONGODB_DATABASE_NAME database on the running loop's async client."""
+    return get_async_mongo_client()[os.getenv("MONGODB_DATABASE_NAME")]
+
+
+async def aclose_mongo_client():
+    """Close the running event loop's async client, if it has one."""
+    client = _async_clients.pop()
+    if client is not None:
+        await client.close()
+        logger.info("Closed async MongoDB client")
+
+
 class MongoDBConfig:
     def __init__(self):
         self.mongo_uri = os.getenv("MONGODB_URI")  # Default URI
@@ -19,9 +114,9 @@ class MongoDBConfig:
         self.db = None
 
     def connect(self):
-        """Connect to MongoDB."""
+        """Connect to MongoDB through the shared client."""
         try:
-            self.client = MongoClient(self.mongo_uri)
+            self.client = get_mongo_client()
             self.db = self.client[self.database_name]
             return self.db
         except pymongo.errors.ConnectionFailure as e:
@@ -29,6 +124,6 @@ class MongoDBConfig:
             raise
 
     def disconnect(self):
-        """Disconnect from MongoDB."""
-        if self.client:
-            self.client.close()
+        """Release this config's handle. The shared client stays open until close_mongo_client."""
+        self.client = None
+        self.db = None
@@ -0,0 +1,231 @@
+"""Context caching for large prompt prefixes that are sent again and again.
+
+Prompts that open with the same large block, such as a 10-K section, are split
+into that prefix and a short suffix. The prefix is registered once per
+PREFIX_CACHE_TTL_SECONDS, and later calls reuse the returned handle and send only
+the suffix.
+
+Settings:
+- PREFIX_CACHE_MODE: ``off`` (default) always sends the full prompt. ``gemini``
+  registers prefixes with Gemini context caching, which creates billed
+  server-side caches, and calls pass ``cached_content=<handle>``. ``local`` is an
+  in-process stand-in for tests and offline runs: handles are tracked and
+  counted the same way, but the full prompt is still sent.
+  Under CASSETTE_MODE record or replay, ``gemini`` behaves like ``local`` so that
+  recorded prompts do not depend on server-side handles.
+- PREFIX_CACHE_TTL_SECONDS: how long a registered prefix lives.
+- PREFIX_CACHE_MIN_TOKENS: prefixes below this estimated size are sent inline,
+  since Gemini refuses to cache small contents.
+
+If a prefix cannot be registered, or its handle is rejected, the call falls back
+to the full prompt. A failed registration is not retried for
+PREFIX_CACHE_FAILURE_TTL_SECONDS, since a model or prefix Gemini will not cache
+would otherwise cost a failing round trip on every call.
+"""
+import hashlib
+import math
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any
+from services.cassette import get_cassette_mode
+from services.scheduler import is_rate_limit_error
+from logger import runner_logger as logger
+
+DEFAULT_TTL_SECONDS = 60 * 60
+DEFAULT_MIN_TOKENS = 4096
+DEFAULT_FAILURE_TTL_SECONDS = 5 * 60
+# Handles are renewed this long before they expire, so a call never races the TTL
+REFRESH_MARGIN_SECONDS = 60
+
+
+def approximate_token_count(text: str) -> int:
+    """Rough Gemini token estimate (about four characters per token)."""
+    return math.ceil(len(text) / 4)
+
+
+@dataclass
+class CachedPrefix:
+    handle: str
+    tokens: int
+    expires_at: float
+
+
+class GeminiPrefixBackend:
+    """Registers prefixes with the Gemini caches API; calls send only the suffix."""
+
+    remote = True
+
+    def create(self, llm, prefix: str, ttl_seconds: float) -> str:
+        from google.genai.types import Content, CreateCachedContentConfig, Part
+        from report_writer.clients import get_genai_client
+
+        api_key = llm.google_api_key.get_secret_value() if llm.google_api_key else None
+        cache = get_genai_client(api_key).caches.create(
+            model=llm.model,
+            config=CreateCachedContentConfig(
+                contents=[Content(role="user", parts=[Part(text=prefix)])],
+                ttl=f"{int(ttl_seconds)}s",
+            ),
+        )
+        return cache.name
+
+
+class LocalPrefixBackend:
+    """Stand-in that issues local handles; calls still send the full prompt."""
+
+    remote = False
+
+    def create(self, llm, prefix: str, ttl_seconds: float) -> str:
+        return "local/" + hashlib.sha256(prefix.encode("utf-8")).hexdigest()[:16]
+
+
+class PrefixCache:
+    def __init__(self, backend, ttl_seconds: float, min_tokens: int, failure_ttl_seconds: float = DEFAULT_FAILURE_TTL_SECONDS):
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+        self.min_tokens = min_tokens
+        self.failure_ttl_seconds = failure_ttl_seconds
+        self._entries: dict[str, CachedPrefix] = {}
+        # Registrations that failed, by key, with when they may be retried
+        self._failures: dict[str, float] = {}
+        # Only held while a key is being registered
+        self._key_locks: dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self._stats: dict[str, dict[str, int]] = {}
+
+    def _count(self, model: str, counter: str, amount: int = 1):
+        with self._lock:
+            stats = self._stats.setdefault(model, {"registrations": 0, "hits": 0, "inline": 0, "fallbacks": 0, "cached_tokens": 0})
+            stats[counter] += amount
+
+    def _lookup(self, key: str) -> CachedPrefix | None:
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires_at - REFRESH_MARGIN_SECONDS > time.time():
+            return entry
+        return None
+
+    def get_handle(self, llm, prefix: str) -> CachedPrefix | None:
+        """Return the live handle for prefix on llm's model, registering it if needed.
+
+        Returns None when the prefix is too small to cache or registration fails,
+        or failed within the last failure_ttl_seconds.
+        """
+        tokens = approximate_token_count(prefix)
+        if tokens < self.min_tokens:
+            self._count(llm.model, "inline")
+            return None
+        key = hashlib.sha256(f"{llm.model}\x00{prefix}".encode("utf-8")).hexdigest()
+        with self._lock:
+            entry = self._lookup(key)
+            failed = self._failures.get(key, 0.0) > time.time()
+            key_lock = None if entry is not None or failed else self._key_locks.setdefault(key, threading.Lock())
+        if entry is not None:
+            self._count(llm.model, "hits")
+            return entry
+        if failed:
+            self._count(llm.model, "fallbacks")
+            return None
+
+        # Concurrent callers with the same prefix wait for one registration
+        with key_lock:
+            try:
+                with self._lock:
+                    entry = self._lookup(key)
+                    failed = self._failures.get(key, 0.0) > time.time()
+                if entry is not None:
+                    self._count(llm.model, "hits")
+                    return entry
+                if failed:
+                    self._count(llm.model, "fallbacks")
+                    return None
+                try:
+                    handle = self.backend.create(llm, prefix, self.ttl_seconds)
+                except Exception as e:
+                    logger.warning(f"Could not cache a {tokens}-token prompt prefix for {llm.model}, retrying in {self.failure_ttl_seconds:.0f}s: {str(e)}")
+                    with self._lock:
+                        self._failures[key] = time.time() + self.failure_ttl_seconds
+                    self._count(llm.model, "fallbacks")
+                    return None
+                entry = CachedPrefix(handle=handle, tokens=tokens, expires_at=time.time() + self.ttl_seconds)
+                with self._lock:
+                    now = time.time()
+                    self._entries = {k: v for k, v in self._entries.items() if v.expires_at > now}
+                    self._entries[key] = entry
+                    self._failures = {k: retry_at for k, retry_at in self._failures.items() if retry_at > now}
+                self._count(llm.model, "registrations")
+                logger.info(f"Cached a {tokens}-token prompt prefix for {llm.model} as {handle}")
+                return entry
+            finally:
+                # Waiters already hold the lock object; later callers find the entry or failure first
+                with self._lock:
+                    if self._key_locks.get(key) is key_lock:
+                        del self._key_locks[key]
+
+    def forget(self, handle: str):
+        with self._lock:
+            self._entries = {k: v for k, v in self._entries.items() if v.handle != handle}
+
+    def invoke(self, llm, prefix: str, suffix: str) -> Any:
+        """Call llm on prefix + suffix, serving the prefix from the cache when possible."""
+        entry = self.get_handle(llm, prefix)
+        if entry is None or not self.backend.remote:
+            if entry is not None:
+                self._count(llm.model, "cached_tokens", entry.tokens)
+            return llm.invoke(prefix + suffix)
+        try:
+            response = llm.invoke(suffix, cached_content=entry.handle)
+        except Exception as e:
+            if is_rate_limit_error(e):
+                raise
+            # The server may have dropped the cache early; send everything this time
+            logger.warning(f"Cached prefix {entry.handle} was rejected, sending the full prompt: {str(e)}")
+            self.forget(entry.handle)
+            self._count(llm.model, "fallbacks")
+            return llm.invoke(prefix + suffix)
+        self._count(llm.model, "cached_tokens", entry.tokens)
+        return response
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {model: dict(stats) for model, stats in self._stats.items()}
+
+
+_prefix_cache = None
+_prefix_cache_lock = threading.Lock()
+
+
+def get_prefix_cache() -> PrefixCache | None:
+    """Return the process-wide prefix cache, or None when PREFIX_CACHE_MODE is off."""
+    global _prefix_cache
+    mode = os.getenv("PREFIX_CACHE_MODE", "off").lower() or "off"
+    if mode == "off":
+        return None
+    if mode not in ("gemini", "local"):
+        raise ValueError(f"PREFIX_CACHE_MODE must be one of gemini, local, off; got {mode}")
+    if _prefix_cache is None:
+        with _prefix_cache_lock:
+            if _prefix_cache is None:
+                backend = GeminiPrefixBackend() if mode == "gemini" and get_cassette_mode() == "off" else LocalPrefixBackend()
+                _prefix_cache = PrefixCache(
+                    backend,
+                    ttl_seconds=float(os.getenv("PREFIX_CACHE_TTL_SECONDS", DEFAULT_TTL_SECONDS)),
+                    min_tokens=int(os.getenv("PREFIX_CACHE_MIN_TOKENS", DEFAULT_MIN_TOKENS)),
+                    failure_ttl_seconds=float(os.getenv("PREFIX_CACHE_FAILURE_TTL_SECONDS", DEFAULT_FAILURE_TTL_SECONDS)),
+                )
+                logger.info(f"Prompt prefix cache using {type(backend).__name__}")
+    return _prefix_cache
+
+
+def invoke_with_prefix(llm, prefix: str, suffix: str) -> Any:
+    """Invoke llm on prefix + suffix, caching prefix across calls when it is large enough."""
+    cache = get_prefix_cache()
+    if cache is None:
+        return llm.invoke(prefix + suffix)
+    return cache.invoke(llm, prefix, suffix)
+
+
+def get_prefix_cache_stats() -> dict:
+    cache = get_prefix_cache()
+    return cache.stats() if cache else {}
@@ -2,12 +2,13 @@ from typing import List
 from report_writer.graph import run_deepdive, run_section_builder
 import asyncio
 from logger import runner_logger as logger
-from services.document import DocumentService
-from report_writer.utils import format_documents
+from services.document_index import aget_document_digest, aselect_internal_documents, get_document_digest
 from langgraph.types import Command
 from report_writer.model import DeepResearch
 from report_writer.graph import get_completed_sections
 from report_writer.service import generate_report_metadata
+from report_writer.singleflight import search_flights
+from report_writer.usage import usage_tracker
 
 DEFAULT_REPORT_STRUCTURE = """Use this structure to create a report on the user-provided topic:
 
@@ -22,24 +23,53 @@ DEFAULT_REPORT_STRUCTURE = """Use this structure to create a report on the user-
    - Provide a concise summary of the report"""
 
 def get_internal_documents(user_id: str):
-    document_service = DocumentService()
-    documents = document_service.get_user_documents(user_id)
-    return format_documents(documents) 
+    return get_document_digest(user_id)
+
+async def aget_internal_documents(user_id: str, topic: str | None = None):
+    """Format the user's documents; with a topic, only those most relevant to it within the token budget."""
+    if topic is not None:
+        return await aselect_internal_documents(user_id, topic)
+    return await aget_document_digest(user_id)
+
+async def apersist_usage(report_id: str):
+    """Write the usage recorded for report_id by this worker into its deep_research document."""
+    usage = usage_tracker.pop(report_id)
+    if not usage:
+        return
+    try:
+        researcher = DeepResearch()
+        researcher.id = report_id
+        await researcher.aadd_usage(usage)
+        logger.info(f"Usage for report {report_id}: {usage['total']}")
+    except Exception as e:
+        logger.error(f"Failed to persist usage for report {report_id}: {str(e)}")
 
 def get_config(user_id: str, project_id: str, report_id: str):
     return {"configurable": {"user_id": user_id, "project_id": project_id, "thread_id": report_id, "report_structure": DEFAULT_REPORT_STRUCTURE, "number_of_queries": 3, "mode": "hybrid_rag", "max_search_iterations": 3, "max_follow_up_queries": 3, "max_section_words": 500}}
 
 async def start_planner(user_id: str, project_id: str, topic: str, report_id: str):
-    internal_documents = get_internal_documents(user_id)
+    internal_documents = await aget_internal_documents(user_id, topic)
     input = {"topic": topic, "internal_documents": internal_documents}
     config = get_config(user_id, project_id, report_id)
-    plan = await run_deepdive(input, config)
+    try:
+        plan = await run_deepdive(input, config)
+    finally:
+        coalesced = search_flights.pop_coalesced(report_id)
+        logger.info(f"Coalesced {coalesced['total']} duplicate searches while planning report {report_id}: {coalesced}")
+        # Tokens spent before a failure are still recorded, and the tracker entry is released
+        await apersist_usage(report_id)
     return plan
 
-async def continue_research(user_id: str, project_id: str, report_id: str, data: str | bool):
+async def continue_research(user_id: str, project_id: str, report_id: str, data: str | bool, on_stream=None):
     input = Command(resume=data)
     config = get_config(user_id, project_id, report_id)
-    response = await run_deepdive(input, config)
+    try:
+        response = await run_deepdive(input, config, on_stream=on_stream)
+    finally:
+        # Counters are per report, so they are dropped however the run ends
+        coalesced = search_flights.pop_coalesced(report_id)
+        logger.info(f"Coalesced {coalesced['total']} duplicate searches for report {report_id}: {coalesced}")
+        await apersist_usage(report_id)
     print("Response:", response)
     if isinstance(response, str):
         print("Response is a string")
@@ -53,10 +83,10 @@ async def continue_research(user_id: str, project_id: str, report_id: str, data:
             section_sources["sources"] = section.sources
             list_of_sources.append(section_sources)
 
-        unique_types = DeepResearch.get_unique_types_by_user_id(user_id)
+        unique_types = await DeepResearch.aget_unique_types_by_user_id(user_id)
         metadata = generate_report_metadata(response, unique_types)
         # Use the combined update method to perform a single database operation
-        researcher.update_report_completion(
+        await researcher.aupdate_report_completion(
             report=response,
             sources=list_of_sources,
             metadata=metadata,
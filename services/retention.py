@@ -0,0 +1,277 @@
+"""Retention and compaction for LangGraph checkpoints.
+
+Deep dives, cortex workflows and maestro conversations checkpoint every step
+under their thread_id, and nothing removed them, so the checkpoint collections
+grew without bound. A compaction pass applies this policy:
+
+- Compact: a thread whose report is completed, or which has been idle for
+  CHECKPOINT_COMPACT_IDLE_SECONDS (default one hour), keeps only its latest
+  checkpoint per namespace and that checkpoint's pending writes. The latest
+  checkpoint holds the full state, so reports can still be read and
+  conversations and plan reviews can still resume.
+- Expire: a thread idle for CHECKPOINT_TTL_DAYS (default 30) whose report is not
+  completed is treated as abandoned and deleted.
+- Collect: each state blob (see services.blob_store) lists the threads that
+  stored it. An expired thread is removed from its blobs, and a compacted thread
+  from the blobs its retained checkpoints no longer refer to. Blobs left with no
+  thread, and not used for the idle period, are deleted. Only the checkpoints of
+  threads handled in the pass are read, so a pass does not grow with the total
+  checkpoint volume. Blobs stored without thread ids are left alone.
+
+Activity is read from the ObjectId of each checkpoint document, so no extra
+fields are needed on what the saver writes. Only checkpoints older than the
+retained one are deleted, so a run that resumes during a pass is not affected.
+
+The FastAPI lifespan starts the loop in every worker. A lease document in
+job_leases lets one worker claim each pass, so passes run once every
+CHECKPOINT_RETENTION_INTERVAL_SECONDS (default one hour, 0 disables it) across
+the deployment. For a one-off pass or a dry run, which take no lease:
+    python -m services.retention --dry-run
+A dry run does not release threads from their blobs, so it only counts blobs
+that are unowned already.
+"""
+import argparse
+import asyncio
+import datetime
+import os
+import re
+import socket
+from dataclasses import asdict, dataclass
+from bson.objectid import ObjectId
+from pymongo.errors import DuplicateKeyError
+from services.blob_store import MongoBlobBackend
+from services.mongo import get_async_database, get_async_mongo_client
+from logger import runner_logger as logger
+
+DEFAULT_COMPACT_IDLE_SECONDS = 60 * 60
+DEFAULT_TTL_DAYS = 30
+DEFAULT_INTERVAL_SECONDS = 60 * 60
+BLOB_DELETE_BATCH = 1000
+# Workers check the lease this often per interval, so a pass starts at most a quarter interval late
+LEASE_POLLS_PER_INTERVAL = 4
+LEASE_COLLECTION = "job_leases"
+LEASE_ID = "checkpoint_retention"
+
+# Where the shared checkpointer keeps its data (AsyncMongoDBSaver defaults)
+CHECKPOINT_DB = "checkpointing_db"
+CHECKPOINT_COLLECTION = "checkpoints_aio"
+WRITES_COLLECTION = "checkpoint_writes_aio"
+
+_REF = re.compile(rb"blob:sha256:([0-9a-f]{64})")
+
+
+@dataclass
+class RetentionReport:
+    threads_scanned: int = 0
+    threads_compacted: int = 0
+    threads_expired: int = 0
+    checkpoints_deleted: int = 0
+    writes_deleted: int = 0
+    blobs_released: int = 0
+    blobs_deleted: int = 0
+    bytes_reclaimed: int = 0
+    dry_run: bool = False
+
+
+async def _measure(collection, query: dict) -> tuple[int, int]:
+    """Count and total BSON size of the documents matching query."""
+    result = await (await collection.aggregate([
+        {"$match": query},
+        {"$group": {"_id": None, "count": {"$sum": 1}, "bytes": {"$sum": {"$bsonSize": "$$ROOT"}}}},
+    ])).to_list()
+    return (result[0]["count"], result[0]["bytes"]) if result else (0, 0)
+
+
+async def _delete(collection, query: dict, dry_run: bool) -> tuple[int, int]:
+    count, size = await _measure(collection, query)
+    if count and not dry_run:
+        count = (await collection.delete_many(query)).deleted_count
+    return count, size
+
+
+async def _thread_namespaces(checkpoints) -> dict[str, dict]:
+    """Per thread: its last activity and, per namespace, the latest checkpoint id and checkpoint count."""
+    cursor = await checkpoints.aggregate([
+        {"$sort": {"thread_id": 1, "checkpoint_ns": 1, "checkpoint_id": -1}},
+        {"$group": {
+            "_id": {"thread_id": "$thread_id", "checkpoint_ns": "$checkpoint_ns"},
+            "latest": {"$first": "$checkpoint_id"},
+            "count": {"$sum": 1},
+            "last_write": {"$max": "$_id"},
+        }},
+    ], allowDiskUse=True)
+    threads: dict[str, dict] = {}
+    async for group in cursor:
+        thread = threads.setdefault(group["_id"]["thread_id"], {"last_active": group["last_write"].generation_time, "namespaces": {}})
+        thread["last_active"] = max(thread["last_active"], group["last_write"].generation_time)
+        thread["namespaces"][group["_id"]["checkpoint_ns"]] = (group["latest"], group["count"])
+    return threads
+
+
+async def _completed_threads(thread_ids) -> set[str]:
+    """Thread ids that belong to completed deep research reports."""
+    report_ids = [ObjectId(thread_id) for thread_id in thread_ids if ObjectId.is_valid(thread_id)]
+    if not report_ids:
+        return set()
+    cursor = get_async_database()["deep_research"].find({"_id": {"$in": report_ids}, "status": "completed"}, {"_id": 1})
+    return {str(document["_id"]) async for document in cursor}
+
+
+def _collect_refs(value, refs: set):
+    if isinstance(value, (bytes, str)):
+        refs.update(match.decode() for match in _REF.findall(value if isinstance(value, bytes) else value.encode("utf-8")))
+    elif isinstance(value, dict):
+        for item in value.values():
+            _collect_refs(item, refs)
+    elif isinstance(value, list):
+        for item in value:
+            _collect_refs(item, refs)
+
+
+async def _thread_refs(checkpoint_db, thread_id: str) -> set[str]:
+    """Blob digests referred to by what is left of one thread's checkpoints and writes."""
+    refs: set[str] = set()
+    async for document in checkpoint_db[CHECKPOINT_COLLECTION].find({"thread_id": thread_id}, {"checkpoint": 1, "metadata": 1}):
+        _collect_refs(document, refs)
+    async for document in checkpoint_db[WRITES_COLLECTION].find({"thread_id": thread_id}, {"value": 1}):
+        _collect_refs(document, refs)
+    return refs
+
+
+async def _release_blobs(thread_id: str, keep: set[str], report: RetentionReport):
+    """Remove thread_id from the blobs it stored, except those in keep."""
+    query = {"thread_ids": thread_id}
+    if keep:
+        query["_id"] = {"$nin": list(keep)}
+    blobs = get_async_database()[MongoBlobBackend.collection]
+    if report.dry_run:
+        report.blobs_released += await blobs.count_documents(query)
+        return
+    report.blobs_released += (await blobs.update_many(query, {"$pull": {"thread_ids": thread_id}})).modified_count
+
+
+async def _collect_blobs(cutoff: datetime.datetime, report: RetentionReport):
+    blobs = get_async_database()[MongoBlobBackend.collection]
+    # Blobs are only collected once unused for a while, since a running step may not have checkpointed its reference yet
+    unowned = [
+        document["_id"]
+        async for document in blobs.find({"thread_ids": {"$size": 0}, "last_used_at": {"$lt": cutoff}}, {"_id": 1})
+    ]
+    for start in range(0, len(unowned), BLOB_DELETE_BATCH):
+        count, size = await _delete(blobs, {"_id": {"$in": unowned[start:start + BLOB_DELETE_BATCH]}}, report.dry_run)
+        report.blobs_deleted += count
+        report.bytes_reclaimed += size
+
+
+async def acompact_checkpoints(dry_run: bool = False) -> RetentionReport:
+    """Run one retention pass and report what was (or, with dry_run, would be) reclaimed."""
+    idle_seconds = float(os.getenv("CHECKPOINT_COMPACT_IDLE_SECONDS", DEFAULT_COMPACT_IDLE_SECONDS))
+    ttl_days = float(os.getenv("CHECKPOINT_TTL_DAYS", DEFAULT_TTL_DAYS))
+    now = datetime.datetime.now(datetime.timezone.utc)
+    idle_cutoff = now - datetime.timedelta(seconds=idle_seconds)
+    ttl_cutoff = now - datetime.timedelta(days=ttl_days)
+
+    checkpoint_db = get_async_mongo_client()[CHECKPOINT_DB]
+    checkpoints = checkpoint_db[CHECKPOINT_COLLECTION]
+    writes = checkpoint_db[WRITES_COLLECTION]
+    report = RetentionReport(dry_run=dry_run)
+
+    threads = await _thread_namespaces(checkpoints)
+    completed = await _completed_threads(threads)
+    report.threads_scanned = len(threads)
+    for thread_id, thread in threads.items():
+        if thread_id not in completed and thread["last_active"] < ttl_cutoff:
+            count, size = await _delete(checkpoints, {"thread_id": thread_id}, dry_run)
+            write_count, write_size = await _delete(writes, {"thread_id": thread_id}, dry_run)
+            await _release_blobs(thread_id, set(), report)
+            report.threads_expired += 1
+        elif thread_id in completed or thread["last_active"] < idle_cutoff:
+            # A thread down to one checkpoint per namespace was compacted already, or never needed it
+            if all(checkpoint_count == 1 for _, checkpoint_count in thread["namespaces"].values()):
+                continue
+            count = size = write_count = write_size = 0
+            for namespace, (latest, checkpoint_count) in thread["namespaces"].items():
+                older = {"thread_id": thread_id, "checkpoint_ns": namespace, "checkpoint_id": {"$lt": latest}}
+                if checkpoint_count > 1:
+                    deleted, deleted_size = await _delete(checkpoints, older, dry_run)
+                    count, size = count + deleted, size + deleted_size
+                deleted, deleted_size = await _delete(writes, older, dry_run)
+                write_count, write_size = write_count + deleted, write_size + deleted_size
+            if not count and not write_count:
+                continue
+            # Only this thread's retained checkpoints are read to see which of its blobs it still needs
+            await _release_blobs(thread_id, await _thread_refs(checkpoint_db, thread_id), report)
+            report.threads_compacted += 1
+        else:
+            continue
+        report.checkpoints_deleted += count
+        report.writes_deleted += write_count
+        report.bytes_reclaimed += size + write_size
+
+    await _collect_blobs(idle_cutoff, report)
+    logger.info(f"Checkpoint retention{' (dry run)' if dry_run else ''}: {asdict(report)}")
+    return report
+
+
+async def aclaim_retention_pass(interval_seconds: float) -> bool:
+    """Claim the pass due in this interval for this worker. False when another worker already has it."""
+    now = datetime.datetime.now(datetime.timezone.utc)
+    try:
+        # Matches only once the previous claim's interval is over; otherwise the upsert collides with it
+        await get_async_database()[LEASE_COLLECTION].update_one(
+            {"_id": LEASE_ID, "next_run_at": {"$lte": now}},
+            {"$set": {
+                "next_run_at": now + datetime.timedelta(seconds=interval_seconds),
+                "claimed_by": f"{socket.gethostname()}:{os.getpid()}",
+                "claimed_at": now,
+            }},
+            upsert=True,
+        )
+    except DuplicateKeyError:
+        return False
+    return True
+
+
+async def run_retention_loop(interval_seconds: float | None = None):
+    """Run a retention pass every interval until cancelled, in whichever worker claims it.
+
+    Failed passes are logged and retried next interval.
+    """
+    if interval_seconds is None:
+        interval_seconds = float(os.getenv("CHECKPOINT_RETENTION_INTERVAL_SECONDS", DEFAULT_INTERVAL_SECONDS))
+    while True:
+        await asyncio.sleep(interval_seconds / LEASE_POLLS_PER_INTERVAL)
+        try:
+            if await aclaim_retention_pass(interval_seconds):
+                await acompact_checkpoints()
+        except Exception as e:
+            logger.error(f"Checkpoint retention pass failed: {str(e)}")
+
+
+def start_retention_task() -> asyncio.Task | None:
+    """Start the background retention loop, unless CHECKPOINT_RETENTION_INTERVAL_SECONDS is 0."""
+    interval_seconds = float(os.getenv("CHECKPOINT_RETENTION_INTERVAL_SECONDS", DEFAULT_INTERVAL_SECONDS))
+    if interval_seconds <= 0:
+        return None
+    return asyncio.create_task(run_retention_loop(interval_seconds))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dry-run", action="store_true", help="Report what would be reclaimed without deleting")
+    args = parser.parse_args()
+
+    async def run():
+        from services.mongo import aclose_mongo_client
+        try:
+            return await acompact_checkpoints(args.dry_run)
+        finally:
+            await aclose_mongo_client()
+
+    report = asyncio.run(run())
+    for field, value in asdict(report).items():
+        print(f"{field:<22}{value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,354 @@
+"""Rate-limit-aware scheduling of Gemini calls.
+
+Every model (and the grounded search client) gets a ModelScheduler that:
+- admits a call only when the model's request and token buckets allow it
+  (LLM_RPM / LLM_TPM, per model LLM_RPM_<MODEL> / LLM_TPM_<MODEL>);
+- caps in-flight calls with an AIMD limit that starts at LLM_CONCURRENCY. The
+  limit grows by one slot per window of successful calls, halves on a 429 and
+  shrinks gently when latency exceeds LLM_LATENCY_TARGET_SECONDS;
+- retries rate-limit and transient errors with full-jitter exponential backoff;
+- hands free slots to waiting interactive work (e.g. plan generation) before
+  background section research.
+
+Synchronous callers (e.g. agent tools) go through the model's BlockingScheduler,
+which shares the same buckets and retry policy.
+"""
+import asyncio
+import heapq
+import itertools
+import os
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from enum import IntEnum
+from functools import wraps
+from typing import Any, Awaitable, Callable
+from logger import runner_logger as logger
+from services.loop_local import LoopLocal
+
+DEFAULT_LLM_CONCURRENCY = 8
+DEFAULT_REQUESTS_PER_MINUTE = 1000
+DEFAULT_TOKENS_PER_MINUTE = 1_000_000
+DEFAULT_MAX_RETRIES = 5
+DEFAULT_BACKOFF_BASE_SECONDS = 1.0
+DEFAULT_BACKOFF_CAP_SECONDS = 30.0
+
+
+class Priority(IntEnum):
+    INTERACTIVE = 0
+    BACKGROUND = 10
+
+
+_priority: ContextVar[Priority] = ContextVar("scheduling_priority", default=Priority.BACKGROUND)
+_scheduled_call: ContextVar[bool] = ContextVar("scheduled_call", default=False)
+
+
+def in_scheduled_call() -> bool:
+    """Whether this code runs inside a scheduler attempt, which the scheduler itself retries."""
+    return _scheduled_call.get()
+
+
+@contextmanager
+def scheduling_priority(priority: Priority):
+    """Schedule model and search calls made inside this block at priority."""
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def with_priority(priority: Priority):
+    """Decorator running an async graph node's calls at priority."""
+    def decorator(func):
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            with scheduling_priority(priority):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def model_setting(name: str, model: str, default: float) -> float:
+    """Read NAME_<MODEL> (e.g. LLM_RPM_GEMINI_2_0_FLASH), then NAME, then default."""
+    override = os.getenv(name + "_" + re.sub(r"\W", "_", model.split("/")[-1]).upper())
+    return float(override or os.getenv(name, default))
+
+
+def model_concurrency(model: str) -> int:
+    """Maximum in-flight calls for model on one event loop."""
+    return int(model_setting("LLM_CONCURRENCY", model, DEFAULT_LLM_CONCURRENCY))
+
+
+def is_rate_limit_error(exc: BaseException) -> bool:
+    code = getattr(exc, "code", None) or getattr(exc, "status_code", None)
+    if code == 429 or type(exc).__name__ == "ResourceExhausted":
+        return True
+    message = str(exc)
+    return "429" in message or "RESOURCE_EXHAUSTED" in message
+
+
+def is_transient_error(exc: BaseException) -> bool:
+    """Errors worth retrying: rate limits, server-side failures and timeouts."""
+    if is_rate_limit_error(exc) or isinstance(exc, (asyncio.TimeoutError, ConnectionError)):
+        return True
+    code = getattr(exc, "code", None) or getattr(exc, "status_code", None)
+    if code in (500, 502, 503, 504):
+        return True
+    return type(exc).__name__ in ("ServiceUnavailable", "DeadlineExceeded", "InternalServerError", "ServerError", "TimeoutException", "ConnectError")
+
+
+def backoff(attempt: int) -> float:
+    """Full-jitter exponential backoff before retry attempt + 1."""
+    base = float(os.getenv("LLM_BACKOFF_BASE_SECONDS", DEFAULT_BACKOFF_BASE_SECONDS))
+    cap = float(os.getenv("LLM_BACKOFF_CAP_SECONDS", DEFAULT_BACKOFF_CAP_SECONDS))
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class TokenBucket:
+    """Continuously refilled bucket holding at most one minute's allowance."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0
+        self.tokens = per_minute
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _take(self, amount: float) -> float:
+        """Take amount if available and return 0, else return the seconds to wait."""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= amount:
+                self.tokens -= amount
+                return 0.0
+            return (amount - self.tokens) / self.rate
+
+    async def acquire(self, amount: float = 1.0):
+        if not self.capacity or amount <= 0:
+            return
+        # A single call larger than the bucket still goes through once the bucket is full
+        amount = min(amount, self.capacity)
+        while (wait := self._take(amount)) > 0:
+            await asyncio.sleep(wait)
+
+    def wait(self, amount: float = 1.0):
+        """Blocking counterpart of acquire, for synchronous callers."""
+        if not self.capacity or amount <= 0:
+            return
+        amount = min(amount, self.capacity)
+        while (wait := self._take(amount)) > 0:
+            time.sleep(wait)
+
+    def charge(self, amount: float):
+        """Account for usage beyond what was acquired up front (negative refunds)."""
+        with self._lock:
+            self.tokens = min(self.capacity, self.tokens - amount)
+
+
+class AdaptiveLimiter:
+    """Priority-ordered concurrency limit with additive increase, multiplicative decrease."""
+
+    def __init__(self, max_limit: int, min_limit: int = 1, latency_target: float | None = None):
+        self.max_limit = max(1, max_limit)
+        self.min_limit = max(1, min(min_limit, self.max_limit))
+        self.limit = float(self.max_limit)
+        self.latency_target = latency_target
+        self.in_flight = 0
+        self._waiters: list[tuple[int, int, asyncio.Future]] = []
+        self._order = itertools.count()
+
+    async def acquire(self, priority: Priority = Priority.BACKGROUND):
+        if self.in_flight < int(self.limit) and not self._waiters:
+            self.in_flight += 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (int(priority), next(self._order), future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            # The slot may have been granted just as the waiter was cancelled
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+
+    def release(self):
+        self.in_flight -= 1
+        self._wake()
+
+    def _wake(self):
+        while self._waiters and self.in_flight < int(self.limit):
+            _, _, future = heapq.heappop(self._waiters)
+            if future.done():
+                continue
+            self.in_flight += 1
+            future.set_result(None)
+
+    def on_success(self, latency: float):
+        if self.latency_target and latency > self.latency_target:
+            self.limit = max(self.min_limit, self.limit * 0.9)
+        else:
+            self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+        self._wake()
+
+    def on_rate_limited(self):
+        self.limit = max(self.min_limit, self.limit / 2)
+
+
+class ModelScheduler:
+    """Admission control, adaptive concurrency and retries for one model on one event loop."""
+
+    def __init__(self, model: str, requests: TokenBucket, tokens: TokenBucket, limiter: AdaptiveLimiter, max_retries: int = DEFAULT_MAX_RETRIES):
+        self.model = model
+        self.requests = requests
+        self.tokens = tokens
+        self.limiter = limiter
+        self.max_retries = max_retries
+        self.stats = {"calls": 0, "retries": 0, "rate_limited": 0, "failures": 0}
+
+    async def run(self, fn: Callable[[], Awaitable[Any]], priority: Priority | None = None, estimated_tokens: int = 0, retryable: Callable[[], bool] | None = None, used_tokens: Callable[[], int | None] | None = None) -> Any:
+        """Await fn() once the model's limits admit it, retrying rate-limit and transient errors.
+
+        fn is called again for every attempt. priority defaults to the one set by
+        scheduling_priority (BACKGROUND otherwise). retryable, when given, is asked
+        after a failure whether fn may be called again; a stream that already
+        emitted output says no. used_tokens, when given, reports the tokens the
+        successful call actually used, and the token bucket is charged (or
+        refunded) the difference from estimated_tokens.
+        """
+        priority = _priority.get() if priority is None else priority
+        self.stats["calls"] += 1
+        for attempt in range(self.max_retries + 1):
+            await self.limiter.acquire(priority)
+            try:
+                await self.requests.acquire(1)
+                await self.tokens.acquire(estimated_tokens)
+                started = time.perf_counter()
+                token = _scheduled_call.set(True)
+                try:
+                    result = await fn()
+                finally:
+                    _scheduled_call.reset(token)
+                self.limiter.on_success(time.perf_counter() - started)
+                if used_tokens is not None and (used := used_tokens()) is not None:
+                    self.tokens.charge(used - estimated_tokens)
+                return result
+            except Exception as exc:
+                if is_rate_limit_error(exc):
+                    self.stats["rate_limited"] += 1
+                    self.limiter.on_rate_limited()
+                if not is_transient_error(exc) or attempt == self.max_retries or (retryable and not retryable()):
+                    self.stats["failures"] += 1
+                    raise
+                delay = backoff(attempt)
+                self.stats["retries"] += 1
+                logger.warning(f"{self.model} call failed ({exc}); retry {attempt + 1}/{self.max_retries} in {delay:.1f}s, limit now {int(self.limiter.limit)}")
+            finally:
+                self.limiter.release()
+            await asyncio.sleep(delay)
+
+
+class BlockingScheduler:
+    """Rate limits and retries for one model's synchronous calls, shared by every thread.
+
+    Blocking calls take from the same request and token buckets as the model's
+    ModelSchedulers, so they count against LLM_RPM / LLM_TPM too. Their
+    concurrency is bounded by the calling threads, not by the adaptive limit.
+    """
+
+    def __init__(self, model: str, requests: TokenBucket, tokens: TokenBucket, max_retries: int = DEFAULT_MAX_RETRIES):
+        self.model = model
+        self.requests = requests
+        self.tokens = tokens
+        self.max_retries = max_retries
+        self.stats = {"calls": 0, "retries": 0, "rate_limited": 0, "failures": 0}
+        self._stats_lock = threading.Lock()
+
+    def _count(self, name: str):
+        with self._stats_lock:
+            self.stats[name] += 1
+
+    def run(self, fn: Callable[[], Any], estimated_tokens: int = 0) -> Any:
+        """Call fn() once the model's buckets admit it, retrying rate-limit and transient errors."""
+        self._count("calls")
+        for attempt in range(self.max_retries + 1):
+            try:
+                self.requests.wait(1)
+                self.tokens.wait(estimated_tokens)
+                token = _scheduled_call.set(True)
+                try:
+                    return fn()
+                finally:
+                    _scheduled_call.reset(token)
+            except Exception as exc:
+                if is_rate_limit_error(exc):
+                    self._count("rate_limited")
+                if not is_transient_error(exc) or attempt == self.max_retries:
+                    self._count("failures")
+                    raise
+                delay = backoff(attempt)
+                self._count("retries")
+                logger.warning(f"{self.model} call failed ({exc}); retry {attempt + 1}/{self.max_retries} in {delay:.1f}s")
+            time.sleep(delay)
+
+
+_buckets: dict[str, tuple[TokenBucket, TokenBucket]] = {}
+_schedulers: LoopLocal[dict[str, ModelScheduler]] = LoopLocal()
+_blocking_schedulers: dict[str, BlockingScheduler] = {}
+_lock = threading.Lock()
+
+
+def _model_buckets(model: str) -> tuple[TokenBucket, TokenBucket]:
+    """Request and token buckets for model, shared process-wide. Call with _lock held."""
+    if model not in _buckets:
+        _buckets[model] = (
+            TokenBucket(model_setting("LLM_RPM", model, DEFAULT_REQUESTS_PER_MINUTE)),
+            TokenBucket(model_setting("LLM_TPM", model, DEFAULT_TOKENS_PER_MINUTE)),
+        )
+    return _buckets[model]
+
+
+def get_scheduler(model: str) -> ModelScheduler:
+    """Scheduler for model on the running loop. Request and token buckets are shared process-wide."""
+    # Futures belong to one loop; scripts that call asyncio.run repeatedly get separate limiters
+    schedulers = _schedulers.get(dict)
+    with _lock:
+        scheduler = schedulers.get(model)
+        if scheduler is None:
+            requests, tokens = _model_buckets(model)
+            latency_target = model_setting("LLM_LATENCY_TARGET_SECONDS", model, 0) or None
+            limiter = AdaptiveLimiter(model_concurrency(model), latency_target=latency_target)
+            max_retries = int(model_setting("LLM_MAX_RETRIES", model, DEFAULT_MAX_RETRIES))
+            scheduler = schedulers[model] = ModelScheduler(model, requests, tokens, limiter, max_retries)
+    return scheduler
+
+
+def get_blocking_scheduler(model: str) -> BlockingScheduler:
+    """Process-wide scheduler for model's synchronous calls."""
+    with _lock:
+        scheduler = _blocking_schedulers.get(model)
+        if scheduler is None:
+            requests, tokens = _model_buckets(model)
+            max_retries = int(model_setting("LLM_MAX_RETRIES", model, DEFAULT_MAX_RETRIES))
+            scheduler = _blocking_schedulers[model] = BlockingScheduler(model, requests, tokens, max_retries)
+    return scheduler
+
+
+def get_scheduler_stats() -> dict:
+    """Call, retry and rate-limit counters with the current concurrency limit, per model."""
+    stats = {}
+    with _lock:
+        schedulers = [scheduler for loop_schedulers in _schedulers.values() for scheduler in list(loop_schedulers.values())]
+        schedulers += list(_blocking_schedulers.values())
+    for scheduler in schedulers:
+        model_stats = stats.setdefault(scheduler.model, {"calls": 0, "retries": 0, "rate_limited": 0, "failures": 0, "limit": 0})
+        for name, value in scheduler.stats.items():
+            model_stats[name] += value
+        if isinstance(scheduler, ModelScheduler):
+            model_stats["limit"] = int(scheduler.limiter.limit)
+    return stats
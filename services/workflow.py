@@ -1,16 +1,19 @@
+import asyncio
 import logging
-from services.mongo import MongoDBConfig
+import os
+from services.mongo import get_async_database, get_database
 from cortex.state import WorkflowMessage
 from pydantic import BaseModel, Field
 from bson.objectid import ObjectId
 from typing import Literal, List, Any, Optional, Union
 import datetime
-import pandas as pd
 
 # Configure a logger for this module.
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+DEFAULT_WORKFLOW_FLUSH_INTERVAL_SECONDS = 0.5
+
 class Workflow(BaseModel):
     model_config = {"arbitrary_types_allowed": True}
     
@@ -23,10 +26,14 @@ class Workflow(BaseModel):
 
 class WorkflowService:
     def __init__(self):
-        db_config = MongoDBConfig()
-        self.db = db_config.connect()
+        self.db = get_database()
         logger.info("WorkflowService initialized and database connected.")
 
+    @property
+    def adb(self):
+        """The database on the running event loop's async client, for the a-prefixed methods."""
+        return get_async_database()
+
     def insert_workflow(self, workflow: Workflow) -> Workflow:
         # Set updated_at timestamp in ISO format
         workflow.updated_at = datetime.datetime.now().isoformat()
@@ -40,6 +47,7 @@ class WorkflowService:
         
     def _convert_timestamps(self, obj: Any) -> Any:
         """Recursively convert Pandas Timestamps to ISO format strings."""
+        import pandas as pd
         if isinstance(obj, dict):
             # Handle Timestamp objects as keys
             return {k.isoformat() if isinstance(k, pd.Timestamp) else k: 
@@ -81,8 +89,8 @@ class WorkflowService:
             logger.error(f"Error retrieving workflow with ID {workflow_id}: {str(e)}")
             return None
     
-    def update_workflow(self, workflow: Workflow) -> Workflow:
-        # Update the workflow in MongoDB 'workflows' collection
+    def _replacement(self, workflow: Workflow) -> tuple[ObjectId, dict]:
+        """Stamp updated_at and return the workflow's _id and the document that replaces it."""
         if not workflow.id:
             raise ValueError("Workflow must have an id to be updated")
             
@@ -95,6 +103,11 @@ class WorkflowService:
         # Get the workflow data and convert any Pandas Timestamps
         workflow_data = workflow.model_dump(exclude={"id"})
         workflow_data = self._convert_timestamps(workflow_data)
+        return object_id, workflow_data
+
+    def update_workflow(self, workflow: Workflow) -> Workflow:
+        # Update the workflow in MongoDB 'workflows' collection
+        object_id, workflow_data = self._replacement(workflow)
         
         # Update the document in MongoDB
         result = self.db["workflows"].replace_one(
@@ -106,4 +119,120 @@ class WorkflowService:
             logger.warning(f"No workflow found with id {workflow.id}")
             
         logger.info(f"Updated workflow with id {workflow.id}")
-        return workflow
\ No newline at end of file
+        return workflow
+
+    async def ainsert_workflow(self, workflow: Workflow) -> Workflow:
+        """Async variant of insert_workflow."""
+        workflow.updated_at = datetime.datetime.now().isoformat()
+        result = await self.adb["workflows"].insert_one(workflow.model_dump())
+        workflow.id = str(result.inserted_id)
+        return workflow
+
+    async def aget_workflow_by_id(self, workflow_id: str) -> Union[Workflow, None]:
+        """Async variant of get_workflow_by_id."""
+        try:
+            workflow_data = await self.adb["workflows"].find_one({"_id": ObjectId(workflow_id)})
+            if workflow_data is None:
+                logger.warning(f"Workflow with ID {workflow_id} not found")
+                return None
+            workflow = Workflow(**workflow_data)
+            workflow.id = str(workflow.id)
+            return workflow
+        except Exception as e:
+            logger.error(f"Error retrieving workflow with ID {workflow_id}: {str(e)}")
+            return None
+
+    async def aupdate_workflow(self, workflow: Workflow) -> Workflow:
+        """Async variant of update_workflow."""
+        object_id, workflow_data = self._replacement(workflow)
+        result = await self.adb["workflows"].replace_one({"_id": object_id}, workflow_data)
+        if result.matched_count == 0:
+            logger.warning(f"No workflow found with id {workflow.id}")
+        logger.info(f"Updated workflow with id {workflow.id}")
+        return workflow
+
+    def _delta(self, messages: List[WorkflowMessage], fields: Optional[dict]) -> dict:
+        """Update document that pushes messages and sets fields plus updated_at."""
+        update = {"$set": {**self._convert_timestamps(fields or {}), "updated_at": datetime.datetime.now().isoformat()}}
+        if messages:
+            update["$push"] = {"messages": {"$each": [self._convert_timestamps(message.model_dump()) for message in messages]}}
+        return update
+
+    def append_messages(self, workflow_id: str, messages: List[WorkflowMessage], fields: Optional[dict] = None):
+        """Append messages to a stored workflow and set fields, without rewriting earlier messages."""
+        self.db["workflows"].update_one({"_id": ObjectId(workflow_id)}, self._delta(messages, fields))
+
+    async def aappend_messages(self, workflow_id: str, messages: List[WorkflowMessage], fields: Optional[dict] = None):
+        """Async variant of append_messages."""
+        await self.adb["workflows"].update_one({"_id": ObjectId(workflow_id)}, self._delta(messages, fields))
+
+    def writer(self, workflow_id: str, flush_interval: Optional[float] = None) -> "WorkflowWriter":
+        """Return a WorkflowWriter that batches appends to this workflow."""
+        return WorkflowWriter(self, workflow_id, flush_interval)
+
+
+class WorkflowWriter:
+    """Batches message appends and field updates for one workflow.
+
+    Changes are written at most once per flush window (WORKFLOW_FLUSH_INTERVAL_SECONDS)
+    with a single $push/$set. flush() writes everything pending immediately; use
+    ``async with`` so the last batch is flushed when the stream ends. A failed
+    background flush keeps its changes and retries with the next one.
+    """
+
+    def __init__(self, service: WorkflowService, workflow_id: str, flush_interval: Optional[float] = None):
+        self.service = service
+        self.workflow_id = str(workflow_id)
+        self.flush_interval = flush_interval if flush_interval is not None else float(os.getenv("WORKFLOW_FLUSH_INTERVAL_SECONDS", DEFAULT_WORKFLOW_FLUSH_INTERVAL_SECONDS))
+        self._messages: List[WorkflowMessage] = []
+        self._fields: dict = {}
+        self._timer: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+    def append(self, message: WorkflowMessage):
+        self._messages.append(message)
+        self._schedule()
+
+    def set(self, **fields):
+        self._fields.update(fields)
+        self._schedule()
+
+    def _schedule(self):
+        if self._timer is None:
+            self._timer = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.flush_interval)
+        # Past this point flush() no longer cancels us, so a write is never cut short
+        self._timer = None
+        try:
+            await self._write()
+        except Exception as e:
+            logger.error(f"Deferred flush of workflow {self.workflow_id} failed, will retry: {str(e)}")
+
+    async def _write(self):
+        # Writes are serialized so pushed messages keep their order
+        async with self._lock:
+            messages, fields = self._messages, self._fields
+            if not messages and not fields:
+                return
+            self._messages, self._fields = [], {}
+            try:
+                await self.service.aappend_messages(self.workflow_id, messages, fields)
+            except Exception:
+                self._messages = messages + self._messages
+                self._fields = {**fields, **self._fields}
+                raise
+
+    async def flush(self):
+        """Write every pending change now."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        await self._write()
+
+    async def __aenter__(self) -> "WorkflowWriter":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.flush()
@@ -0,0 +1,47 @@
+from report_writer.context import pack_context, pack_section_context, rank_snippets, split_queries, split_snippets
+from report_writer.utils import create_reasoning_text_web
+
+RESULTS = create_reasoning_text_web({
+    "solar capacity 2024": "Solar capacity grew by a third in 2024.\n\nAn unrelated note about shipping rates and freight.",
+    "wind capacity": "Wind capacity grew more slowly.\n\n##Sources##\nSegment Text: Offshore wind stalled - Confidence: [0.9]\nSources: [Energy Review]",
+})
+
+
+def test_split_queries_keeps_headers():
+    parts = split_queries(RESULTS)
+    assert [header.splitlines()[1] for header, _ in parts] == ["solar capacity 2024", "wind capacity"]
+    assert all("RESPONSE" in header for header, _ in parts)
+
+
+def test_split_snippets_pairs_segments_with_sources():
+    snippets = split_snippets(split_queries(RESULTS)[1][1])
+    assert snippets[-1] == "Segment Text: Offshore wind stalled - Confidence: [0.9]\nSources: [Energy Review]"
+
+
+def test_rank_snippets_prefers_matching_terms():
+    snippets = ["freight shipping rates", "solar capacity grew", "wind farms"]
+    assert rank_snippets(snippets, "solar capacity")[0] == 1
+
+
+def test_pack_context_returns_text_within_budget_unchanged():
+    assert pack_context(RESULTS, "solar", 10_000) == RESULTS
+
+
+def test_pack_context_keeps_query_header_of_kept_snippets():
+    packed = pack_context(RESULTS, "solar capacity", 40)
+    assert "solar capacity 2024" in packed
+    assert "Solar capacity grew by a third" in packed
+    assert "shipping" not in packed
+    assert packed.index("solar capacity 2024") < packed.index("Solar capacity grew")
+
+
+def test_pack_context_drops_duplicate_snippets():
+    text = "Solar capacity grew by a third in 2024.\n\nSolar capacity grew by a third in 2024.\n\n" + "filler words " * 50
+    packed = pack_context(text, "solar capacity", 30)
+    assert packed.count("Solar capacity grew") == 1
+
+
+def test_pack_section_context_hands_unused_budget_to_the_other_side():
+    web, internal = pack_section_context(RESULTS, "", "solar", 100)
+    assert internal == ""
+    assert web == pack_context(RESULTS, "solar", 100)
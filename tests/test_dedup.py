@@ -0,0 +1,31 @@
+import asyncio
+from report_writer.dedup import HashingEmbedder, cluster_queries, cosine_similarity, deduplicate_report_queries
+
+
+def test_cosine_similarity():
+    assert cosine_similarity([1.0, 0.0], [1.0, 0.0]) == 1.0
+    assert cosine_similarity([1.0, 0.0], [0.0, 1.0]) == 0.0
+    assert cosine_similarity([0.0, 0.0], [1.0, 0.0]) == 0.0
+
+
+def test_cluster_queries_maps_to_first_similar_representative():
+    queries = ["a", "b", "c"]
+    embeddings = [[1.0, 0.0], [0.99, 0.01], [0.0, 1.0]]
+    assert cluster_queries(queries, embeddings, 0.95) == {"a": "a", "b": "a", "c": "c"}
+
+
+def test_deduplicate_report_queries_rewrites_paraphrases_across_sections():
+    sections = {
+        "1": {"search_queries": ["EV battery prices 2024", "charging networks"], "internal_search_queries": ["battery suppliers"]},
+        "2": {"search_queries": ["ev battery prices 2024?", "EV battery prices 2024"], "internal_search_queries": ["battery suppliers"]},
+    }
+    result = asyncio.run(deduplicate_report_queries(sections, threshold=0.9, embedder=HashingEmbedder()))
+    assert result["1"]["search_queries"] == ["EV battery prices 2024", "charging networks"]
+    assert result["2"]["search_queries"] == ["EV battery prices 2024"]
+    assert result["2"]["internal_search_queries"] == ["battery suppliers"]
+
+
+def test_deduplicate_report_queries_keeps_distinct_queries():
+    sections = {"1": {"search_queries": ["solar capacity"]}, "2": {"search_queries": ["freight rates"]}}
+    result = asyncio.run(deduplicate_report_queries(sections, embedder=HashingEmbedder()))
+    assert result == sections
@@ -0,0 +1,162 @@
+import asyncio
+import gc
+import pytest
+from services import scheduler
+from services.loop_local import LoopLocal
+from services.scheduler import AdaptiveLimiter, BlockingScheduler, ModelScheduler, Priority, TokenBucket, in_scheduled_call
+
+
+class RateLimited(Exception):
+    code = 429
+
+
+class BadRequest(Exception):
+    code = 400
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(scheduler, "backoff", lambda attempt: 0.0)
+
+
+def make_scheduler(max_retries=3, limit=4):
+    return ModelScheduler("test", TokenBucket(0), TokenBucket(0), AdaptiveLimiter(limit), max_retries)
+
+
+def test_token_bucket_takes_until_empty_then_reports_wait():
+    bucket = TokenBucket(60)
+    assert bucket._take(60) == 0.0
+    assert bucket._take(1) == pytest.approx(1.0, abs=0.05)
+
+
+def test_token_bucket_charge_and_refund():
+    bucket = TokenBucket(600)
+    bucket._take(100)
+    bucket.charge(200)
+    assert bucket.tokens == pytest.approx(300, abs=5)
+    bucket.charge(-10_000)
+    assert bucket.tokens == 600
+
+
+def test_limiter_halves_on_rate_limit_and_grows_back():
+    limiter = AdaptiveLimiter(8)
+    limiter.on_rate_limited()
+    assert limiter.limit == 4
+    for _ in range(4):
+        limiter.on_success(0.1)
+    assert 4 < limiter.limit <= 5
+    for _ in range(200):
+        limiter.on_success(0.1)
+    assert limiter.limit == 8
+
+
+def test_limiter_shrinks_when_latency_exceeds_target():
+    limiter = AdaptiveLimiter(8, latency_target=1.0)
+    limiter.on_success(5.0)
+    assert limiter.limit == pytest.approx(7.2)
+
+
+def test_limiter_wakes_interactive_waiters_first():
+    async def main():
+        limiter = AdaptiveLimiter(1)
+        await limiter.acquire()
+        order = []
+
+        async def waiter(name, priority):
+            await limiter.acquire(priority)
+            order.append(name)
+            limiter.release()
+
+        background = asyncio.create_task(waiter("background", Priority.BACKGROUND))
+        await asyncio.sleep(0)
+        interactive = asyncio.create_task(waiter("interactive", Priority.INTERACTIVE))
+        await asyncio.sleep(0)
+        limiter.release()
+        await asyncio.gather(background, interactive)
+        return order
+
+    assert asyncio.run(main()) == ["interactive", "background"]
+
+
+def test_run_retries_transient_errors():
+    attempts = []
+
+    async def call():
+        attempts.append(in_scheduled_call())
+        if len(attempts) < 3:
+            raise RateLimited("429 Resource exhausted")
+        return "ok"
+
+    model = make_scheduler()
+    assert asyncio.run(model.run(call)) == "ok"
+    assert attempts == [True, True, True]
+    assert model.stats["retries"] == 2
+    assert model.stats["rate_limited"] == 2
+    assert model.limiter.in_flight == 0
+
+
+def test_run_does_not_retry_other_errors():
+    calls = []
+
+    async def call():
+        calls.append(1)
+        raise BadRequest("invalid argument")
+
+    model = make_scheduler()
+    with pytest.raises(BadRequest):
+        asyncio.run(model.run(call))
+    assert len(calls) == 1
+    assert model.stats["failures"] == 1
+
+
+def test_run_stops_retrying_when_not_retryable():
+    calls = []
+
+    async def call():
+        calls.append(1)
+        raise RateLimited("429")
+
+    with pytest.raises(RateLimited):
+        asyncio.run(make_scheduler().run(call, retryable=lambda: False))
+    assert len(calls) == 1
+
+
+def test_run_charges_actual_token_usage():
+    model = ModelScheduler("test", TokenBucket(0), TokenBucket(6000), AdaptiveLimiter(4))
+
+    async def call():
+        return "ok"
+
+    asyncio.run(model.run(call, estimated_tokens=1000, used_tokens=lambda: 3000))
+    assert model.tokens.tokens == pytest.approx(3000, abs=50)
+
+
+def test_blocking_scheduler_retries():
+    attempts = []
+
+    def call():
+        attempts.append(1)
+        if len(attempts) < 2:
+            raise ConnectionError("reset")
+        return "ok"
+
+    blocking = BlockingScheduler("test", TokenBucket(0), TokenBucket(0), max_retries=2)
+    assert blocking.run(call) == "ok"
+    assert blocking.stats["retries"] == 1
+
+
+def test_loop_local_keeps_one_value_per_loop_and_drops_closed_loops():
+    registry = LoopLocal()
+
+    async def value():
+        return registry.get(object)
+
+    async def same_loop():
+        return registry.get(object) is registry.get(object)
+
+    assert asyncio.run(same_loop())
+    first = asyncio.run(value())
+    second = asyncio.run(value())
+    assert first is not second
+    gc.collect()
+    assert len(registry.values()) <= 1
@@ -0,0 +1,86 @@
+import asyncio
+import pytest
+from report_writer.singleflight import SingleFlight, flight_key
+
+
+def test_flight_key_ignores_case_spacing_and_trailing_punctuation():
+    assert flight_key("  Solar   Capacity 2024?! ") == "solar capacity 2024"
+    assert flight_key("C++ market share") != flight_key("C# market share")
+
+
+def test_do_coalesces_concurrent_calls():
+    flights = SingleFlight()
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "result"
+
+    async def main():
+        return await asyncio.gather(*(flights.do("key", fetch, "report", "web") for _ in range(3)))
+
+    assert asyncio.run(main()) == ["result"] * 3
+    assert calls == [1]
+    assert flights.pop_coalesced("report") == {"web": 2, "total": 2}
+    assert flights.coalesced("report") == {"total": 0}
+
+
+def test_do_propagates_errors_to_every_waiter():
+    flights = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("down")
+
+    async def main():
+        return await asyncio.gather(flights.do("key", fail), flights.do("key", fail), return_exceptions=True)
+
+    assert all(isinstance(result, RuntimeError) for result in asyncio.run(main()))
+
+
+def test_do_many_batches_missing_keys_and_joins_running_ones():
+    flights = SingleFlight()
+    batches = []
+
+    async def fetch(keys):
+        batches.append(list(keys))
+        await asyncio.sleep(0.01)
+        return {key: key.upper() for key in keys}
+
+    async def main():
+        return await asyncio.gather(
+            flights.do_many(["a", "b"], fetch, "report", "internal"),
+            flights.do_many(["b", "c"], fetch, "report", "internal"),
+        )
+
+    assert asyncio.run(main()) == [["A", "B"], ["B", "C"]]
+    assert batches == [["a", "b"], ["c"]]
+
+
+def test_do_many_reuses_settled_results_until_popped():
+    flights = SingleFlight()
+    batches = []
+
+    async def fetch(keys):
+        batches.append(list(keys))
+        return {key: key.upper() for key in keys}
+
+    async def main():
+        await flights.do_many(["a"], fetch, "report")
+        await flights.do_many(["a", "b"], fetch, "report")
+        flights.pop_coalesced("report")
+        await flights.do_many(["a"], fetch, "report")
+
+    asyncio.run(main())
+    assert batches == [["a"], ["b"], ["a"]]
+
+
+def test_do_many_fails_every_key_of_a_failed_batch():
+    flights = SingleFlight()
+
+    async def fetch(keys):
+        raise RuntimeError("down")
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(flights.do_many(["a", "b"], fetch))
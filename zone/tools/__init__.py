@@ -1,3 +1,19 @@
-from .charting import ChartingTool
-from .analysis import ReportAnalysisTools
-from .annual_report_writer import ReportLabTool
\ No newline at end of file
+import importlib
+
+# Charting, PDF and analysis tools pull in matplotlib, mplfinance and reportlab, so
+# they are imported on first use instead of with the package
+_LAZY_ATTRIBUTES = {
+    "ChartingTool": ".charting",
+    "ReportAnalysisTools": ".analysis",
+    "ReportLabTool": ".annual_report_writer",
+}
+
+__all__ = list(_LAZY_ATTRIBUTES)
+
+
+def __getattr__(name):
+    if name not in _LAZY_ATTRIBUTES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_LAZY_ATTRIBUTES[name], __name__), name)
+    globals()[name] = value
+    return value
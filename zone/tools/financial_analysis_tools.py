@@ -9,14 +9,19 @@ from datetime import timedelta, datetime
 from typing import List, Annotated, Optional, Dict, Any
 from pydantic import Field
 from langchain_core.tools import tool
-from ..utilities import YFinanceUtils, SecUtils as SECUtils, FmpUtils as FMPUtils
+from services.lazy import lazy_import
 from logger import runner_logger as logger
 from dotenv import load_dotenv
 from zone import gemini_flash
-import pandas as pd
+from services.prefix_cache import get_prefix_cache, invoke_with_prefix
 load_dotenv()
 from langgraph.config import get_stream_writer
 
+# Imported on first tool call; see services.lazy
+YFinanceUtils = lazy_import("zone.utilities.yfinance_utils", "YFinanceUtils")
+SECUtils = lazy_import("zone.utilities.sec_utils", "SecUtils")
+FMPUtils = lazy_import("zone.utilities.fmp_utils", "FmpUtils")
+
 
 def combine_prompt(instruction: str, resource: str, table_str: str = None) -> str:
     """
@@ -27,6 +32,18 @@ def combine_prompt(instruction: str, resource: str, table_str: str = None) -> st
     return f"Resource: {resource}\n\nInstruction: {instruction}"
 
 
+def invoke_with_resource(instruction: str, resource: str, table_str: str = None):
+    """
+    Ask gemini_flash about a 10-K resource. With a prefix cache configured, the
+    resource is sent first so it can be cached as a prompt prefix and shared by
+    every tool that reads the same sections.
+    """
+    if get_prefix_cache() is None:
+        return gemini_flash.invoke(combine_prompt(instruction, resource, table_str))
+    suffix = f"{table_str}\n\nInstruction: {instruction}" if table_str else f"Instruction: {instruction}"
+    return invoke_with_prefix(gemini_flash, f"Resource: {resource}\n\n", suffix)
+
+
 def save_to_file(data: str, file_path: str) -> None:
     """
     Save the provided data into a file at file_path, ensuring the directory exists.
@@ -60,9 +77,7 @@ def analyze_income_stmt(
         """
     )
     section_text = SECUtils.get_10k_section(ticker_symbol, fyear, 7)
-    prompt = combine_prompt(instruction, section_text, df_string)
-    # Save the income statement to a file for reference 
-    response = gemini_flash.invoke(prompt)
+    response = invoke_with_resource(instruction, section_text, df_string)
     writer({"tool_status": f"Income statement analysis completed for {ticker_symbol}"})
     # Convert DataFrame to a serializable format
     # Reset the index to make timestamps regular columns
@@ -110,8 +125,7 @@ def analyze_balance_sheet(
         """
     )
     section_text = SECUtils.get_10k_section(ticker_symbol, fyear, 7)
-    prompt = combine_prompt(instruction, section_text, df_string)
-    response = gemini_flash.invoke(prompt) 
+    response = invoke_with_resource(instruction, section_text, df_string)
     writer({"tool_status": f"Balance sheet analysis completed for {ticker_symbol}"})
     # Convert DataFrame to a serializable format
     # Reset the index to make timestamps regular columns
@@ -158,8 +172,7 @@ def analyze_cash_flow(
         """
     )
     section_text = SECUtils.get_10k_section(ticker_symbol, fyear, 7)
-    prompt = combine_prompt(instruction, section_text, df_string)
-    response = gemini_flash.invoke(prompt) 
+    response = invoke_with_resource(instruction, section_text, df_string)
     writer({"tool_status": f"Cash flow analysis completed for {ticker_symbol}"})
     # Convert DataFrame to a serializable format
     # Reset the index to make timestamps regular columns
@@ -206,8 +219,7 @@ def analyze_segment_stmt(
         """
     )
     section_text = SECUtils.get_10k_section(ticker_symbol, fyear, 7)
-    prompt = combine_prompt(instruction, section_text, df_string)
-    response = gemini_flash.invoke(prompt) 
+    response = invoke_with_resource(instruction, section_text, df_string)
     writer({"tool_status": f"Segment analysis completed for {ticker_symbol}"})
     # Convert DataFrame to a serializable format
     # Reset the index to make timestamps regular columns
@@ -256,8 +268,7 @@ def income_summarization(
         """
     )
     section_text = SECUtils.get_10k_section(ticker_symbol, fyear, 7)
-    prompt = combine_prompt(instruction, section_text)
-    response = gemini_flash.invoke(prompt) 
+    response = invoke_with_resource(instruction, section_text)
     writer({"tool_status": f"Income summarization completed for {ticker_symbol}"})
     output = {
         "output" : response.content,
@@ -288,7 +299,7 @@ def get_risk_assessment(
     writer({"tool_status": f"Retrieving risk factors for {ticker_symbol}"})
     company_name = YFinanceUtils.get_stock_info(ticker_symbol).get("shortName", "N/A")
     risk_factors = SECUtils.get_10k_section(ticker_symbol, fyear, "1A")
-    section_text = f"Company Name: {company_name}\n\nRisk Factors:\n{risk_factors}\n\n"
+    section_text = f"Risk Factors:\n{risk_factors}"
     instruction = dedent(
         """
         From the risk factors provided, identify and summarize the top 3 key risks. 
@@ -296,8 +307,7 @@ def get_risk_assessment(
         Present your analysis in a continuous paragraph without bullet points.
         """
     )
-    prompt = combine_prompt(instruction, section_text)
-    response = gemini_flash.invoke(prompt) 
+    response = invoke_with_resource(instruction, section_text, f"Company Name: {company_name}")
     writer({"tool_status": f"Risk assessment completed for {ticker_symbol}"})
     output = {
         "output" : response.content,
@@ -381,8 +391,7 @@ def analyze_business_highlights(
         Describe the performance highlights for each business line by providing one summarizing sentence and one explanatory sentence for each segment.
         """
     )
-    prompt = combine_prompt(instruction, section_text)
-    response = gemini_flash.invoke(prompt) 
+    response = invoke_with_resource(instruction, section_text)
     writer({"tool_status": f"Business highlights analysis completed for {ticker_symbol}"})
     output = {
         "output" : response.content,
@@ -416,17 +425,15 @@ def analyze_company_description(
     company_name = company_info.get("shortName", "N/A")
     business_summary = SECUtils.get_10k_section(ticker_symbol, fyear, 1)
     section_7 = SECUtils.get_10k_section(ticker_symbol, fyear, 7)
-    section_text = f"Company Name: {company_name}\n\nBusiness Summary:\n{business_summary}\n\nMD&A:\n{section_7}"
+    section_text = f"Business Summary:\n{business_summary}\n\nMD&A:\n{section_7}"
     instruction = dedent(
         """
         Provide a comprehensive overview of the company, including its founding, industry, core strengths, competitive advantages, market position, and recent strategic initiatives. 
         Limit the description to 300 words.
         """
     )
-    step_prompt = combine_prompt(instruction, section_text)
     instruction2 = "Summarize the above analysis in less than 130 words."
-    prompt = combine_prompt(instruction2, step_prompt)
-    response = gemini_flash.invoke(prompt) 
+    response = invoke_with_resource(f"{instruction}\n\nInstruction: {instruction2}", section_text, f"Company Name: {company_name}")
     writer({"tool_status": f"Company description completed for {ticker_symbol}"})
     output = {
         "output" : response.content,
@@ -502,6 +509,7 @@ def _format_bvps(ticker_symbol, date_str):
 
 def _convert_timestamps(obj: Any) -> Any:
     """Recursively convert Pandas Timestamps to ISO format strings."""
+    import pandas as pd
     if isinstance(obj, dict):
         return {k if not isinstance(k, pd.Timestamp) else k.isoformat(): _convert_timestamps(v) for k, v in obj.items()}
     elif isinstance(obj, list):
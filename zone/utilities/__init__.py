@@ -1,4 +1,20 @@
-from .yfinance_utils import YFinanceUtils
-from .sec_utils import SecUtils
-from .fmp_utils import FmpUtils
-from .text_utils import TextUtils
+import importlib
+
+# The utilities pull in yfinance, pandas and sec_api, so they are imported on first
+# use instead of with the package
+_LAZY_ATTRIBUTES = {
+    "YFinanceUtils": ".yfinance_utils",
+    "SecUtils": ".sec_utils",
+    "FmpUtils": ".fmp_utils",
+    "TextUtils": ".text_utils",
+}
+
+__all__ = list(_LAZY_ATTRIBUTES)
+
+
+def __getattr__(name):
+    if name not in _LAZY_ATTRIBUTES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_LAZY_ATTRIBUTES[name], __name__), name)
+    globals()[name] = value
+    return value
@@ -6,6 +6,7 @@ from datetime import datetime, timedelta
 from functools import wraps
 from typing import Annotated, List
 from dotenv import load_dotenv
+from services.cassette import cassette
 
 # Load environment variables
 load_dotenv()
@@ -39,6 +40,7 @@ def init_fmp_api(func):
         return func(*args, **kwargs)
     return wrapper
 
+@decorate_all_methods(cassette("fmp"))
 @decorate_all_methods(init_fmp_api)
 class FmpUtils:
     """Utility class to interact with the Financial Modeling Prep API."""
@@ -4,6 +4,7 @@ from functools import wraps
 from sec_api import ExtractorApi, QueryApi, RenderApi
 from dotenv import load_dotenv
 from logger import agent_logger as logger
+from services.cassette import cassette
 
 load_dotenv()
 
@@ -37,6 +38,7 @@ class SecUtils:
     """
 
     @staticmethod
+    @cassette("sec")
     @init_sec_api
     def get_10k_metadata(ticker: str, start_date: str, end_date: str):
         """
@@ -100,6 +102,7 @@ class SecUtils:
         return f"No 10-K filing found for {ticker}"
 
     @staticmethod
+    @cassette("sec")
     @init_sec_api
     def get_10k_section(
         ticker_symbol: str,
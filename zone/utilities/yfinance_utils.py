@@ -2,6 +2,7 @@ import yfinance as yf
 import pandas as pd
 from functools import wraps
 from typing import Optional, Callable, Any
+from services.cassette import cassette
 
 # Decorator to initialize the Ticker object
 def init_ticker(func: Callable) -> Callable:
@@ -20,6 +21,7 @@ def decorate_all_methods(decorator):
         return cls
     return decorate
 
+@decorate_all_methods(cassette("yfinance"))
 @decorate_all_methods(init_ticker)
 class YFinanceUtils:
     